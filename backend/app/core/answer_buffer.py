@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from app.core.config import db
+from app.core.constants import ANSWER_FLUSH_SEC, ANSWER_FLUSH_MAX, LATE_ANSWER_MARGIN_SEC
+from app.core.metrics import ANSWER_FLUSH_SIZE
+from app.core.scoring import score_late_answers
+from app.core.round_answers import count_round_answers
+
+logger = logging.getLogger(__name__)
+
+# Llave de un buffer: (trivia_id, round_count)
+RoundKey = Tuple[str, int]
+
+class AnswerBuffer:
+    """
+    Clase Singleton que acumula las respuestas aceptadas en un buffer por ronda y las escribe en la colección
+    de respuestas con un solo bulk_write (group commit)
+
+    "add" espera a que termine la escritura que incluye la respuesta, así quien responde solo recibe la
+    confirmación cuando la respuesta ya esta guardada, igual que con una escritura individual. Los buffers
+    se escriben cada ANSWER_FLUSH_SEC (ver "run"), apenas juntan ANSWER_FLUSH_MAX respuestas, o con
+    "flush_round" antes de calcular los puntos de una ronda. Con miles de respuestas por segundo, cada
+    escritura lleva cientos de respuestas en vez de una.
+
+    La ronda de una respuesta puede estar a cargo de otro proceso, que la cierra sin esperar este buffer. Si
+    la escritura termina cerca o después del termino de la ronda, antes de confirmar las respuestas se
+    puntúan las que su cierre no alcanzó a ver (ver "score_late_answers"). Las respuestas escritas de cada ronda se
+    suman a su contador con una escritura por ronda (ver "count_round_answers").
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "AnswerBuffer":
+        if cls._instance is None:
+            cls._instance = super(AnswerBuffer, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._collection: AsyncIOMotorCollection = db["answers"]
+        self._buffers: Dict[RoundKey, List[Tuple[dict, asyncio.Future]]] = {}
+        self._writing: Dict[RoundKey, Set[asyncio.Future]] = {}
+        self._endtimes: Dict[RoundKey, float] = {}
+        self._score_late = score_late_answers
+        self._count_answers = count_round_answers
+        self._size = 0
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return self._size
+
+    async def add(self, answer: dict, round_endtime: float) -> None:
+        """
+        Agrega la respuesta al buffer de su ronda (que termina en el epoch "round_endtime") y espera a que
+        sea escrita. Levanta DuplicateKeyError si el jugador ya tenia una respuesta en la ronda.
+        """
+        key = (answer["trivia_id"], answer["round_count"])
+        self._endtimes[key] = round_endtime
+        written = asyncio.get_running_loop().create_future()
+        self._buffers.setdefault(key, []).append((answer, written))
+        self._size += 1
+        if self._size >= ANSWER_FLUSH_MAX:
+            self._wakeup.set()
+        await written
+
+    async def flush(self, keys: Optional[Iterable[RoundKey]] = None) -> None:
+        """
+        Escribe los buffers indicados (todos por defecto) con un solo bulk_write, sin orden, así una
+        respuesta duplicada solo rechaza esa respuesta
+        """
+        keys = [key for key in (self._buffers if keys is None else keys) if key in self._buffers]
+        if not keys:
+            return
+        batch = []
+        done = asyncio.get_running_loop().create_future()
+        endtimes = {}
+        for key in keys:
+            batch.extend(self._buffers.pop(key))
+            endtimes[key] = self._endtimes.pop(key)
+            self._writing.setdefault(key, set()).add(done)
+        self._size -= len(batch)
+        ANSWER_FLUSH_SIZE.observe(len(batch))
+
+        errors = {}
+        try:
+            await self._collection.bulk_write([InsertOne(answer) for answer, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                errors = {index: e for index in range(len(batch))}
+            for error in e.details.get("writeErrors", []):
+                if error["code"] == 11000:
+                    errors[error["index"]] = DuplicateKeyError(error["errmsg"], error["code"], error)
+                else:
+                    errors[error["index"]] = OperationFailure(error["errmsg"], error["code"], error)
+        except Exception as e:
+            logger.error("Error al escribir %s respuestas: %s", len(batch), e)
+            errors = {index: e for index in range(len(batch))}
+        finally:
+            for key in keys:
+                self._writing[key].discard(done)
+                if not self._writing[key]:
+                    del self._writing[key]
+            done.set_result(None)
+
+        written_users: Dict[RoundKey, List[str]] = {}
+        for index, (answer, _) in enumerate(batch):
+            if index not in errors:
+                written_users.setdefault((answer["trivia_id"], answer["round_count"]), []).append(answer["user_id"])
+
+        # Respuestas escritas cerca o después del termino de su ronda, que su cierre pudo no ver
+        for key, user_ids in written_users.items():
+            if time.time() >= endtimes[key] - LATE_ANSWER_MARGIN_SEC:
+                await self._score_late(*key, user_ids)
+
+        for index, (_, written) in enumerate(batch):
+            # Un request cancelado mientras esperaba ya no tiene a quien confirmar
+            if written.done():
+                continue
+            if index in errors:
+                written.set_exception(errors[index])
+            else:
+                written.set_result(None)
+
+        # Se cuentan una vez confirmadas, así la confirmación no espera el conteo
+        for key, user_ids in written_users.items():
+            try:
+                await self._count_answers(*key, len(user_ids))
+            except Exception as e:
+                logger.error("Error al contar %s respuestas de la ronda %s: %s", len(user_ids), key, e)
+
+    async def flush_round(self, trivia_id: str, round_count: int) -> None:
+        """
+        Escribe el buffer de la ronda y espera las escrituras en curso que incluyan respuestas de la ronda
+        """
+        key = (trivia_id, round_count)
+        writing = list(self._writing.get(key, []))
+        await self.flush([key])
+        if writing:
+            await asyncio.wait(writing)
+
+    async def run(self) -> None:
+        """
+        Ciclo principal. Escribe los buffers cada ANSWER_FLUSH_SEC, o antes si juntan ANSWER_FLUSH_MAX respuestas.
+        Mientras una escritura esta en curso, las respuestas nuevas se acumulan para la siguiente.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), ANSWER_FLUSH_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
@@ -2,9 +2,11 @@ from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.core.constants import LOGIN_PATH, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.cache import LRUCache
+from app.core.constants import LOGIN_PATH, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_SIZE
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=LOGIN_PATH)
+token_cache = LRUCache(TOKEN_CACHE_SIZE)
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """
@@ -19,9 +21,9 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+def decode_access_token(token: str) -> dict:
     """
-    Decoder de JWT
+    Decoder de JWT: verifica la firma y expiración del token y retorna sus datos
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,13 +34,27 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         role: str = payload.get("role")
+        user_id: str = payload.get("uid")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    return {"email": email, "role": role}
+    return {"email": email, "role": role, "id": user_id, "exp": payload.get("exp")}
 
-def admin_required(current_user: str = Depends(get_current_user)) -> dict:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Retorna los datos del usuario autenticado
+
+    Los tokens ya verificados se guardan en "token_cache" hasta su expiración, así las consultas repetidas
+    de un mismo cliente no vuelven a verificar la firma ni a decodificar el token.
+    """
+    current_user = token_cache.get(token)
+    if current_user is None:
+        current_user = decode_access_token(token)
+        token_cache.set(token, current_user, expires_at=current_user["exp"])
+    return current_user
+
+async def admin_required(current_user: str = Depends(get_current_user)) -> dict:
     """
     Validador de role admin
     """
@@ -49,7 +65,7 @@ def admin_required(current_user: str = Depends(get_current_user)) -> dict:
         )
     return current_user
 
-def player_or_admin_required(current_user: str = Depends(get_current_user)) -> dict:
+async def player_or_admin_required(current_user: str = Depends(get_current_user)) -> dict:
     """
     Validador de role admin o player
     """
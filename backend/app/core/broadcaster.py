@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from app.core.constants import STREAM_POLL_SEC
+
+logger = logging.getLogger(__name__)
+
+# poll(key, state) -> (eventos nuevos, nuevo estado, eventos que describen el estado actual)
+PollFunction = Callable[[Hashable, Any], Awaitable[Tuple[List[dict], Any, List[dict]]]]
+
+class Channel:
+    def __init__(self):
+        self.queues: Set[asyncio.Queue] = set()
+        self.snapshot: List[dict] = []
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+class Broadcaster:
+    """
+    Clase Singleton que reparte eventos a todos los clientes suscritos a una misma llave (ej: una Trivia)
+
+    Cada llave con suscriptores tiene un canal y una sola tarea que consulta el origen de los eventos con la
+    función "poll", ya sea cada STREAM_POLL_SEC o apenas se llama "wake" (ej: cuando el motor de rondas de
+    este proceso abre o cierra una ronda). Así la cantidad de lecturas no depende de la cantidad de clientes.
+    Un suscriptor nuevo recibe primero el "snapshot" del canal, los eventos que describen el estado actual.
+    Un evento con "final" en True cierra el canal.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "Broadcaster":
+        if cls._instance is None:
+            cls._instance = super(Broadcaster, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._channels: Dict[Hashable, Channel] = {}
+
+    def subscribe(self, key: Hashable, poll: PollFunction) -> asyncio.Queue:
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = Channel()
+            channel.task = asyncio.create_task(self._watch(key, channel, poll))
+        queue = asyncio.Queue()
+        for event in channel.snapshot:
+            queue.put_nowait(event)
+        channel.queues.add(queue)
+        return queue
+
+    def unsubscribe(self, key: Hashable, queue: asyncio.Queue) -> None:
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        channel.queues.discard(queue)
+        if not channel.queues:
+            del self._channels[key]
+            channel.task.cancel()
+
+    def wake(self, key: Hashable) -> None:
+        """
+        Fuerza una consulta inmediata del canal, si tiene suscriptores
+        """
+        channel = self._channels.get(key)
+        if channel is not None:
+            channel.wakeup.set()
+
+    def subscribers(self) -> int:
+        return sum(len(channel.queues) for channel in self._channels.values())
+
+    async def _watch(self, key: Hashable, channel: Channel, poll: PollFunction) -> None:
+        state = None
+        while True:
+            channel.wakeup.clear()
+            try:
+                events, state, channel.snapshot = await poll(key, state)
+            except Exception as e:
+                logger.error("Error al consultar los eventos de %s: %s", key, e)
+                events = []
+            for event in events:
+                for queue in channel.queues:
+                    queue.put_nowait(event)
+            if any(event.get("final") for event in events):
+                if self._channels.get(key) is channel:
+                    del self._channels[key]
+                return
+            try:
+                await asyncio.wait_for(channel.wakeup.wait(), STREAM_POLL_SEC)
+            except asyncio.TimeoutError:
+                pass
@@ -1,5 +1,8 @@
+import asyncio
+import logging
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.metrics import MongoCommandListener, MongoPoolListener
 
 """
 Ultra simple conexión con MongoDB usando Motor.
@@ -7,13 +10,65 @@ Ultra simple conexión con MongoDB usando Motor.
 Dado el contexto del proyecto no se ha implementado un driver mas avanzado
 (como mongoose).Solo se usan modelos de pydantic para la validación de campos,
 no se han implementado schemas.
+
+El pool de conexiones y los timeouts se configuran con variables de entorno (ver MONGO_CLIENT_ENV). Si una
+variable no esta definida se usa el valor del URI o, en su defecto, el del driver (ej: maxPoolSize=100).
 """
 
+logger = logging.getLogger(__name__)
+
+# Variable de entorno -> (opción de MongoClient, tipo)
+MONGO_CLIENT_ENV = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_CONNECTING": ("maxConnecting", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_SOCKET_TIMEOUT_MS": ("socketTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+}
+
+def mongo_client_options() -> dict:
+    """
+    Retorna las opciones de MongoClient definidas en las variables de entorno de MONGO_CLIENT_ENV
+    """
+    options = {"appname": os.getenv("MONGO_APP_NAME", "talatrivia-backend")}
+    for env_name, (option, option_type) in MONGO_CLIENT_ENV.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = option_type(value)
+    return options
+
+
 MONGO_URI = str(os.getenv("MONGO_URI", ""))
-client = AsyncIOMotorClient(MONGO_URI)
+MONGO_WARMUP_CONNECTIONS = int(os.getenv("MONGO_WARMUP_CONNECTIONS", 10))
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    event_listeners=[MongoCommandListener(), MongoPoolListener()],
+    **mongo_client_options()
+)
 
 TEST_MODE = int(os.getenv("TEST_MODE", 0))
 if TEST_MODE == 1:
     db = client["testdatabase"]
 else:
     db = client["mydatabase"]
+
+async def connect_db(connections: int = MONGO_WARMUP_CONNECTIONS) -> None:
+    """
+    Verifica la conexión con un ping y abre "connections" conexiones del pool con pings simultaneos, así los
+    primeros requests no pagan el handshake (TCP, TLS y autenticación) de cada conexión.
+    Si MongoDB no responde, el ping falla tras serverSelectionTimeoutMS y la app no inicia.
+    """
+    await client.admin.command("ping")
+    if connections > 1:
+        await asyncio.gather(*[client.admin.command("ping") for _ in range(connections)])
+    logger.info("Conexión con MongoDB verificada, %s conexiones abiertas", MongoPoolListener().open_connections)
+
+def close_db() -> None:
+    """
+    Cierra las conexiones del pool y los threads de monitoreo del driver. El cliente no se puede volver a usar.
+    """
+    client.close()
@@ -2,7 +2,35 @@ import os
 TRIVIA_STATUS = ["ended", "playing", "waiting_start"]
 QUESTION_STATUS = ["answered", "not answer"]
 ROLES = ["player", "admin"]
-TRIVIA_CHECK_SEC_INTERVAL = 3
+TRIVIA_CHECK_SEC_INTERVAL = 30
+TRIVIA_READY_EVENT = "trivia_ready"
+SCHEDULER_MAX_CONCURRENCY = 500
+SCHEDULER_LAG_SAMPLES = 10000
+SCHEDULER_RETRY_SEC = 1
+SCHEDULER_RETRY_MAX_SEC = 30
+LEASE_TTL_SEC = int(os.getenv("LEASE_TTL_SEC", 15))
+LEASE_HEARTBEAT_SEC = int(os.getenv("LEASE_HEARTBEAT_SEC", 5))
+LEASE_ADOPT_BATCH = 100
+EXPEDITE_CHECK_SEC = 0.5
+MIGRATION_BATCH = 100
+TASK_HISTORY_SIZE = 1000
+TASK_CLASS_LIMITS = {"start_trivia": 50}
+ROUND_CACHE_TTL_SEC = float(os.getenv("ROUND_CACHE_TTL_SEC", 1))
+STREAM_POLL_SEC = float(os.getenv("STREAM_POLL_SEC", 1))
+STREAM_KEEPALIVE_SEC = 15
+LONG_POLL_TIMEOUT_SEC = 25
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL_SEC = 60
+TOKEN_CACHE_SIZE = 10000
+ANSWER_BUFFER_ENABLED = int(os.getenv("ANSWER_BUFFER", 0)) == 1
+ANSWER_FLUSH_SEC = float(os.getenv("ANSWER_FLUSH_SEC", 0.05))
+ANSWER_FLUSH_MAX = 5000
+LATE_ANSWER_MARGIN_SEC = 1
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
 LOGIN_PATH = "/login"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 3000
@@ -0,0 +1,40 @@
+import logging
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+class EventBus:
+    """
+    Clase Singleton para publicar eventos internos del backend
+
+    Permite desacoplar los servicios (que detectan un cambio de estado) de los works
+    (que reaccionan a ese cambio) sin generar imports circulares. Los handlers
+    suscritos a un evento son ejecutados en orden al publicar el evento.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "EventBus":
+        if cls._instance is None:
+            cls._instance = super(EventBus, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._handlers: Dict[str, List[Callable]] = {}
+
+    def subscribe(self, event: str, handler: Callable) -> None:
+        handlers = self._handlers.setdefault(event, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def unsubscribe(self, event: str, handler: Callable) -> None:
+        handlers = self._handlers.get(event, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    async def publish(self, event: str, *args, **kwargs) -> None:
+        for handler in list(self._handlers.get(event, [])):
+            try:
+                await handler(*args, **kwargs)
+            except Exception as e:
+                logger.error("Error en handler del evento %s: %s", event, e)
@@ -0,0 +1,61 @@
+import logging
+from typing import Dict, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.core.config import db
+
+"""
+Registro de los indices de cada colección
+
+Cada consulta frecuente de los servicios tiene un indice que la respalda, así no recorre la colección completa.
+Los indices se crean al iniciar la app con "ensure_indexes" (crear un indice que ya existe no hace nada) y usan el
+nombre por defecto de MongoDB, el mismo de los indices creados por versiones anteriores. Al agregar una consulta
+que filtre por otros campos, se debe agregar su indice aquí y su caso en tests/test_indexes.py
+"""
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # get_user_by_email. Único: también evita que dos registros simultaneos creen el mismo email
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "trivias": [
+        # check_trivias (Trivias en espera sin invitados pendientes) y resume_interrupted_trivias (solo "status")
+        IndexModel([("status", ASCENDING), ("pending_joins", ASCENDING)]),
+        # join_trivia y get_trivia_joined
+        IndexModel([("joined_users", ASCENDING), ("status", ASCENDING)]),
+        # Invitaciones y Trivias jugadas por un usuario
+        IndexModel([("user_ids_invitations", ASCENDING), ("status", ASCENDING)]),
+        # Preguntas en uso, antes de editar o eliminar una pregunta
+        IndexModel([("question_ids", ASCENDING)]),
+        # expedite_requested_rounds. Disperso: solo indexa las pocas Trivias marcadas
+        IndexModel([("expedite_round", ASCENDING)], sparse=True),
+    ],
+    "answers": [
+        # Una respuesta por jugador y ronda. También respalda las consultas por Trivia y por ronda
+        IndexModel([("trivia_id", ASCENDING), ("round_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    ],
+    "scores": [
+        # Puntaje acumulado de cada jugador. Único: requerido por el $merge que suma cada ronda
+        IndexModel([("trivia_id", ASCENDING), ("user_id", ASCENDING)], unique=True),
+    ],
+    "leases": [
+        # Renovación y liberación de los leases de un proceso
+        IndexModel([("owner", ASCENDING)]),
+    ],
+}
+
+async def ensure_indexes(database: AsyncIOMotorDatabase = db) -> None:
+    """
+    Crea los indices de INDEXES que aun no existan
+
+    Si un indice no se puede crear (ej: emails repetidos que impiden el indice único), se informa el error
+    y se continua con el resto, así la app inicia igual.
+    """
+    for collection_name, indexes in INDEXES.items():
+        try:
+            await database[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error("No se pudieron crear los indices de '%s': %s", collection_name, e)
@@ -0,0 +1,143 @@
+import os
+import socket
+from datetime import datetime, timedelta
+from uuid import uuid4
+from typing import List, Set
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.core.config import db
+from app.core.constants import LEASE_TTL_SEC
+
+class LeaseManager:
+    """
+    Clase Singleton para administrar leases (arriendos) almacenados en MongoDB
+
+    Un lease asigna un recurso (el ciclo de revisión de trivias o una Trivia en juego) a un solo proceso,
+    identificado por "owner_id". El dueño debe renovar sus leases periódicamente (heartbeat); si deja de
+    hacerlo, el lease expira y cualquier otro proceso lo puede tomar. Así varios procesos (uvicorn --workers)
+    o nodos pueden compartir la misma DB sin iniciar ni puntuar dos veces la misma Trivia.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "LeaseManager":
+        if cls._instance is None:
+            cls._instance = super(LeaseManager, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.owner_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._collection: AsyncIOMotorCollection = db["leases"]
+        self._owned: Set[str] = set()
+
+    def owns(self, name: str) -> bool:
+        return name in self._owned
+
+    async def acquire(self, name: str) -> bool:
+        """
+        Toma el lease si no existe, si ya es nuestro o si expiró. Retorna False si otro proceso lo tiene.
+        """
+        now = datetime.utcnow()
+        try:
+            await self._collection.update_one(
+                {"_id": name, "$or": [{"owner": self.owner_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner_id, "expires_at": now + timedelta(seconds=LEASE_TTL_SEC)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            self._owned.discard(name)
+            return False
+        self._owned.add(name)
+        return True
+
+    async def acquire_many(self, names: List[str]) -> Set[str]:
+        """
+        Toma varios leases con un solo bulk_write, con las mismas condiciones de "acquire" para cada uno
+        (ej: al retomar miles de Trivias tras un reinicio). Retorna los que se pudieron tomar.
+        """
+        if not names:
+            return set()
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne(
+                {"_id": name, "$or": [{"owner": self.owner_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner_id, "expires_at": now + timedelta(seconds=LEASE_TTL_SEC)}},
+                upsert=True
+            )
+            for name in names
+        ]
+        failed = set()
+        try:
+            await self._collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise
+            # DuplicateKeyError: otro proceso tiene el lease
+            failed = {names[error["index"]] for error in e.details.get("writeErrors", [])}
+        acquired = set(names) - failed
+        self._owned = (self._owned - failed) | acquired
+        return acquired
+
+    async def release(self, name: str) -> None:
+        self._owned.discard(name)
+        await self._collection.delete_one({"_id": name, "owner": self.owner_id})
+
+    async def expire(self, names: List[str]) -> None:
+        """
+        Deja de renovar los leases y los marca como expirados y sin dueño, sin eliminarlos, así el heartbeat de
+        cualquier proceso (incluido este) retoma sus recursos como si este proceso se hubiera caído.
+        """
+        self._owned.difference_update(names)
+        await self._collection.update_many(
+            {"_id": {"$in": names}, "owner": self.owner_id},
+            {"$set": {"owner": None, "expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+
+    async def release_all(self) -> None:
+        """
+        Marca como expirados todos los leases del proceso (ej: al apagarse), así otros procesos
+        los toman en su próximo heartbeat sin esperar LEASE_TTL_SEC.
+        """
+        self._owned.clear()
+        await self._collection.update_many(
+            {"owner": self.owner_id},
+            {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+
+    async def renew(self) -> List[str]:
+        """
+        Heartbeat: extiende los leases que el proceso tiene a cargo con una sola escritura. Solo se renuevan los
+        leases de "_owned", así un lease expirado a propósito ("expire") o ya liberado no vuelve a la vida.
+        Retorna los leases que se perdieron (tomados por otro proceso tras expirar).
+        """
+        if not self._owned:
+            return []
+        names = list(self._owned)
+        expires_at = datetime.utcnow() + timedelta(seconds=LEASE_TTL_SEC)
+        await self._collection.update_many(
+            {"_id": {"$in": names}, "owner": self.owner_id},
+            {"$set": {"expires_at": expires_at}}
+        )
+
+        owned_cursor = self._collection.find({"_id": {"$in": names}, "owner": self.owner_id}, {"_id": 1})
+        still_owned = {lease["_id"] async for lease in owned_cursor}
+        lost = [name for name in names if name not in still_owned]
+        self._owned.difference_update(lost)
+        return lost
+
+    async def find_expired(self, prefix: str, limit: int) -> List[str]:
+        """
+        Retorna nombres de leases expirados que comienzan con "prefix"
+        """
+        cursor = self._collection.find(
+            {"_id": {"$regex": f"^{prefix}"}, "expires_at": {"$lt": datetime.utcnow()}},
+            {"_id": 1}
+        ).limit(limit)
+        return [lease["_id"] async for lease in cursor]
+
+    async def clear_expired(self, names: List[str]) -> None:
+        """
+        Elimina leases expirados cuyo recurso ya no necesita dueño (ej: Trivias ya terminadas)
+        """
+        await self._collection.delete_many({"_id": {"$in": names}, "expires_at": {"$lt": datetime.utcnow()}})
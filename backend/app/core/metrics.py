@@ -0,0 +1,334 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from pymongo import monitoring
+from pymongo.common import MAX_POOL_SIZE
+
+"""
+Métricas del backend en formato de texto de Prometheus, expuestas en el endpoint /metrics.
+
+Se implementa un registro mínimo (Counter, Gauge, Histogram) en vez de depender de prometheus_client.
+Registrar un valor es una suma sobre un diccionario en memoria, por lo que el costo en los caminos
+críticos (rondas, respuestas, requests) es despreciable. El texto solo se arma cuando se consulta /metrics.
+Los listeners de MongoDB registran valores desde los threads de Motor y del driver, por lo que cada métrica
+protege sus valores con un lock.
+"""
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 50)
+BATCH_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+def _format_labels(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        MetricsRegistry().register(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+class Gauge(Metric):
+    """
+    Gauge cuyo valor se calcula al momento de consultar /metrics, con la función entregada en "set_function"
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines.append(f"{self.name} {self._function() if self._function else 0}")
+        return lines
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = [
+                (labelvalues, list(counts), total, count)
+                for labelvalues, (counts, total, count) in self._values.items()
+            ]
+        for labelvalues, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labelvalues)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Clase Singleton que agrupa todas las métricas y genera el texto de /metrics
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "MetricsRegistry":
+        if cls._instance is None:
+            cls._instance = super(MetricsRegistry, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latencia de los requests HTTP por ruta.", ("method", "route")
+)
+REQUEST_MONGO_ROUND_TRIPS = Histogram(
+    "http_request_mongo_round_trips", "Comandos enviados a MongoDB por request.", ("route",), ROUND_TRIP_BUCKETS
+)
+MONGO_COMMANDS = Counter("mongo_commands_total", "Comandos enviados a MongoDB.", ("command",))
+ROUNDS_OPENED = Counter("trivia_rounds_opened_total", "Rondas abiertas.")
+ROUNDS_CLOSED = Counter("trivia_rounds_closed_total", "Rondas cerradas y puntuadas.")
+ROUND_SCHEDULE_LAG = Histogram(
+    "trivia_round_schedule_lag_seconds", "Retraso del cierre de una ronda respecto a su round_endtime."
+)
+ROUND_SCORING_DURATION = Histogram(
+    "trivia_round_scoring_seconds", "Duración de calculate_round_points."
+)
+ANSWERS_ACCEPTED = Counter("trivia_answers_total", "Respuestas aceptadas.")
+ANSWER_FLUSH_SIZE = Histogram(
+    "trivia_answer_flush_size", "Respuestas escritas en cada bulk_write del AnswerBuffer.", buckets=BATCH_BUCKETS
+)
+ACTIVE_TRIVIAS = Gauge("trivia_active", "Trivias en juego a cargo de este proceso.")
+ACTIVE_PLAYERS = Gauge("trivia_active_players", "Jugadores en las Trivias en juego a cargo de este proceso.")
+MONGO_POOL_SIZE = Gauge("mongo_pool_connections", "Conexiones abiertas en el pool de MongoDB.")
+MONGO_POOL_CHECKED_OUT = Gauge("mongo_pool_checked_out", "Conexiones del pool de MongoDB en uso.")
+MONGO_POOL_WAITING = Gauge("mongo_pool_wait_queue", "Operaciones esperando una conexión del pool de MongoDB.")
+MONGO_POOL_MAX_SIZE = Gauge("mongo_pool_max_size", "Limite de conexiones del pool de MongoDB (maxPoolSize).")
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool de MongoDB.",
+    buckets=POOL_WAIT_BUCKETS
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongo_pool_checkout_failures_total", "Operaciones que no obtuvieron una conexión del pool.", ("reason",)
+)
+
+
+"""
+Conteo de comandos a MongoDB por request
+
+Motor ejecuta cada operación de pymongo en un pool de threads, dentro de una copia del contexto de quien
+la llama, así el CommandListener (que corre en el thread) puede sumar el comando al contador del request en curso.
+"""
+
+request_round_trips: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar(
+    "request_round_trips", default=None
+)
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        MONGO_COMMANDS.inc(1, event.command_name)
+        counter = request_round_trips.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """
+    Clase Singleton que lleva el estado del pool de conexiones de MongoDB: conexiones abiertas y en uso,
+    operaciones en la cola de espera y la espera de cada una. Con esto se puede dimensionar maxPoolSize contra
+    la concurrencia real: si la cola de espera crece seguido, el pool es chico para la carga.
+
+    Los eventos llegan desde los threads de Motor y del driver, por lo que el estado se protege con un lock.
+    Si MongoDB tiene varios nodos, los valores suman los pools de todos.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "MongoPoolListener":
+        if cls._instance is None:
+            cls._instance = super(MongoPoolListener, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._lock = threading.Lock()
+        self.max_pool_size = 0
+        self.open_connections = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.checkout_wait = 0.0
+        self.checkout_failures = 0
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        # "options" solo incluye las opciones distintas a las del driver
+        with self._lock:
+            self.max_pool_size = event.options.get("maxPoolSize", MAX_POOL_SIZE)
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+        MONGO_POOL_CHECKOUT_FAILURES.inc(1, event.reason)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        wait = event.duration or 0
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self.checkouts += 1
+            self.checkout_wait += wait
+        MONGO_POOL_CHECKOUT_WAIT.observe(wait)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def get_stats(self) -> dict:
+        """
+        Retorna el estado actual del pool, el máximo de la cola de espera y las esperas para obtener una conexión
+        """
+        with self._lock:
+            return {
+                "max_pool_size": self.max_pool_size,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "wait_queue": self.waiting,
+                "max_wait_queue": self.max_waiting,
+                "checkouts": self.checkouts,
+                "mean_checkout_wait_ms": round(self.checkout_wait / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "checkout_failures": self.checkout_failures,
+            }
+
+
+MONGO_POOL_SIZE.set_function(lambda: MongoPoolListener().open_connections)
+MONGO_POOL_CHECKED_OUT.set_function(lambda: MongoPoolListener().checked_out)
+MONGO_POOL_WAITING.set_function(lambda: MongoPoolListener().waiting)
+MONGO_POOL_MAX_SIZE.set_function(lambda: MongoPoolListener().max_pool_size)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra la latencia y los comandos a MongoDB de cada request, agrupados por
+    la ruta (plantilla) que atendió el request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = request_round_trips.set(counter)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_round_trips.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - start, scope["method"], route)
+            REQUEST_MONGO_ROUND_TRIPS.observe(counter[0], route)
@@ -0,0 +1,65 @@
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+from app.core.constants import STREAM_BATCH_SIZE
+
+"""
+Paginación por llave (keyset) y exportación NDJSON de colecciones completas
+
+Las páginas se ordenan por "_id" y cada una parte después del ultimo "_id" de la anterior (el cursor), así
+pedir la página 1000 cuesta lo mismo que pedir la primera, a diferencia de "skip". El cursor de la siguiente
+página se entrega en el header X-Next-Cursor; sin header no hay mas páginas.
+"""
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def after_query(query: dict, after: Optional[str]) -> dict:
+    """
+    Agrega al filtro la condición de partir después del cursor "after" (un "_id")
+    """
+    if after is None:
+        return query
+    if not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="El cursor de paginación no es valido")
+    return {**query, "_id": {"$gt": ObjectId(after)}}
+
+async def find_page(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    projection: Optional[dict],
+    limit: int,
+    after: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retorna hasta "limit" documentos después del cursor "after", junto al cursor de la siguiente página
+    (None si no hay mas documentos). Se lee un documento extra solo para saber si hay otra página.
+    """
+    cursor = collection.find(after_query(query, after), projection).sort("_id", 1).limit(limit + 1)
+    documents = await cursor.to_list(limit + 1)
+    if len(documents) > limit:
+        documents = documents[:limit]
+        return documents, str(documents[-1]["_id"])
+    return documents, None
+
+def stream_ndjson(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    projection: Optional[dict],
+    to_model: Callable[[dict], BaseModel],
+    after: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """
+    Recorre todos los documentos después del cursor "after" y retorna cada uno como una linea JSON (NDJSON),
+    a medida que el cursor de Motor los entrega. Solo se mantiene en memoria un lote de STREAM_BATCH_SIZE
+    documentos, sin importar el tamaño de la colección.
+    El cursor se valida antes de iniciar el stream, así un cursor invalido retorna un error 400.
+    """
+    cursor = collection.find(after_query(query, after), projection).sort("_id", 1).batch_size(STREAM_BATCH_SIZE)
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for document in cursor:
+            yield to_model(document).model_dump_json().encode() + b"\n"
+
+    return lines()
@@ -0,0 +1,37 @@
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from app.core.config import db
+from app.core.scheduler import RoundScheduler
+
+"""
+Conteo de las respuestas de cada ronda, para cerrarla apenas respondan todos sus jugadores
+
+Con varios procesos, las respuestas de una ronda llegan a cualquiera de ellos, pero solo el proceso a cargo de
+la Trivia (dueño de su lease) tiene el cierre de la ronda agendado en su RoundScheduler. Por eso cada ronda lleva
+en la Trivia la cantidad de jugadores ("players", al abrirla) y de respuestas escritas ("answers", con $inc).
+El proceso cuyas respuestas completan la ronda adelanta su cierre si esta a cargo de la Trivia; si no, marca la
+Trivia ("expedite_round") y el proceso a cargo adelanta el cierre en su próxima revisión (ver
+"expedite_requested_rounds").
+"""
+
+trivia_collection: AsyncIOMotorCollection = db["trivias"]
+round_scheduler = RoundScheduler()
+
+async def count_round_answers(trivia_id: str, round_count: int, answers: int) -> None:
+    """
+    Suma "answers" respuestas escritas al contador de la ronda "round_count" y, si con ellas ya respondieron
+    todos los jugadores, adelanta el cierre de la ronda (o lo pide al proceso a cargo de la Trivia)
+    """
+    trivia = await trivia_collection.find_one_and_update(
+        {"_id": ObjectId(trivia_id), "rounds.round_count": round_count},
+        {"$inc": {"rounds.$.answers": answers}},
+        projection={"rounds": {"$elemMatch": {"round_count": round_count}}},
+        return_document=ReturnDocument.AFTER
+    )
+    round_data = (trivia or {}).get("rounds", [{}])[0]
+    # Las rondas abiertas antes de existir el contador no tienen "players" y esperan su termino
+    if "players" not in round_data or "correct_answer" in round_data or round_data["answers"] < round_data["players"]:
+        return
+    if not round_scheduler.expedite(trivia_id, round_count):
+        await trivia_collection.update_one({"_id": ObjectId(trivia_id)}, {"$set": {"expedite_round": round_count}})
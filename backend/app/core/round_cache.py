@@ -0,0 +1,129 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Set
+from app.core.constants import ROUND_CACHE_TTL_SEC
+from app.core.scheduler import utc_timestamp
+
+class ActiveRoundCache:
+    """
+    Clase Singleton que mantiene en memoria la ronda activa de cada Trivia en juego
+
+    Cada entrada guarda el estado de la Trivia, la pregunta de la ronda activa, los invitados y el conjunto
+    de jugadores que ya respondieron, así la consulta de la pregunta activa no necesita leer la Trivia.
+    La versión de una entrada es su numero de ronda: el motor de rondas invalida la entrada al abrir una
+    ronda nueva y "submit_answer" agrega al jugador solo si la entrada sigue en la misma ronda.
+
+    Como las Trivias pueden estar a cargo de otro proceso (leases) y las respuestas pueden llegar a otro
+    proceso, cada entrada expira tras ROUND_CACHE_TTL_SEC y se vuelve a cargar desde la DB. Si muchas
+    consultas llegan a la vez sin entrada, solo una lee la DB y el resto espera su resultado.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "ActiveRoundCache":
+        if cls._instance is None:
+            cls._instance = super(ActiveRoundCache, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._entries: Dict[str, dict] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._invalidated_while_loading: Set[str] = set()
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, trivia_id: str, loader: Callable[[str], Awaitable[dict]]) -> dict:
+        """
+        Retorna la entrada de la Trivia. Si no existe o expiró, la carga con "loader", que debe retornar
+        la entrada (ver "build_entry") o levantar una excepción si la Trivia no existe.
+        """
+        entry = self._entries.get(trivia_id)
+        if entry is not None and entry["expires_at"] > time.monotonic():
+            return entry
+
+        loading = self._loading.get(trivia_id)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[trivia_id] = loading
+        try:
+            entry = await loader(trivia_id)
+            # Si la entrada fue invalidada durante la carga, lo leído puede ser anterior al cambio
+            if trivia_id not in self._invalidated_while_loading:
+                self._entries[trivia_id] = entry
+            loading.set_result(entry)
+        except Exception as e:
+            loading.set_exception(e)
+            # Evita el aviso de excepción no consultada cuando ninguna otra consulta esperaba la carga
+            loading.exception()
+            raise
+        finally:
+            del self._loading[trivia_id]
+            self._invalidated_while_loading.discard(trivia_id)
+        self._sweep()
+        return entry
+
+    def add_answer(self, trivia_id: str, round_count: int, user_id: str) -> int:
+        """
+        Registra que el jugador respondió la ronda, solo si la entrada sigue en esa ronda.
+        Retorna la cantidad de jugadores que respondieron la ronda según la entrada (0 si no hay entrada de esa ronda).
+        """
+        entry = self._entries.get(trivia_id)
+        if entry is None or entry["round_count"] != round_count:
+            return 0
+        entry["answered"].add(user_id)
+        return len(entry["answered"])
+
+    def invalidate(self, trivia_id: str) -> None:
+        self._entries.pop(trivia_id, None)
+        if trivia_id in self._loading:
+            self._invalidated_while_loading.add(trivia_id)
+
+    def _sweep(self) -> None:
+        """
+        Elimina las entradas expiradas (ej: de Trivias terminadas), a lo mas una vez por ROUND_CACHE_TTL_SEC
+        """
+        now = time.monotonic()
+        if now - self._last_sweep < ROUND_CACHE_TTL_SEC:
+            return
+        self._last_sweep = now
+        for trivia_id in [key for key, entry in self._entries.items() if entry["expires_at"] <= now]:
+            del self._entries[trivia_id]
+
+def build_entry(trivia: dict, answered: Iterable[str] = ()) -> dict:
+    """
+    Arma la entrada del cache a partir de la Trivia, cuyas rondas deben venir limitadas a la ultima, y de los
+    jugadores que ya respondieron la ronda activa ("answered").
+    La ronda activa es la ultima ronda, mientras aun no tenga "correct_answer". Si la Trivia no esta en juego
+    o no tiene ronda activa, la entrada queda sin pregunta ("question" es None).
+    """
+    rounds = trivia.get("rounds") or []
+    round_data = rounds[-1] if rounds and "correct_answer" not in rounds[-1] else None
+    entry = {
+        "status": trivia["status"],
+        "round_count": round_data["round_count"] if round_data else 0,
+        "user_ids_invitations": set(trivia["user_ids_invitations"]),
+        "total_rounds": trivia["total_rounds"],
+        "question": None,
+        "round_endtime": None,
+        "answered": set(),
+        "expires_at": time.monotonic() + ROUND_CACHE_TTL_SEC,
+    }
+    if trivia["status"] != "playing" or round_data is None:
+        return entry
+
+    entry["question"] = {
+        "id": round_data["id"],
+        "question": round_data["question"],
+        "possible_answers": [
+            f"{index}) {answer}" for index, answer in enumerate(round_data["possible_answers"], start=1)
+        ],
+        "difficulty": round_data["difficulty"],
+        "round_count": round_data["round_count"],
+    }
+    entry["round_endtime"] = utc_timestamp(round_data["round_endtime"])
+    entry["answered"] = set(answered)
+    return entry
@@ -0,0 +1,180 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+from app.core.constants import (
+    SCHEDULER_MAX_CONCURRENCY,
+    SCHEDULER_LAG_SAMPLES,
+    SCHEDULER_RETRY_SEC,
+    SCHEDULER_RETRY_MAX_SEC
+)
+from app.core.metrics import ROUND_SCHEDULE_LAG
+
+logger = logging.getLogger(__name__)
+
+def utc_timestamp(value: datetime) -> float:
+    """
+    Convierte un datetime UTC "naive" (como los generados con datetime.utcnow()) a epoch en segundos
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class RoundScheduler:
+    """
+    Clase Singleton que administra los plazos (deadlines) de todas las rondas en juego
+
+    Mantiene un min-heap ordenado por el tiempo absoluto de termino de cada ronda, de modo que una
+    sola tarea atiende a todas las Trivias activas. Cada entrada se identifica por una llave (la ID de
+    la Trivia) y un token (el numero de ronda). Re-agendar una llave deja obsoleta la entrada anterior,
+    la cual es descartada al salir del heap.
+
+    Al vencer un plazo se ejecuta el handler entregado a "run" con (key, token, data). Si el handler falla
+    (ej: un error transitorio de la DB), la misma entrada se re-agenda con espera exponencial (desde
+    SCHEDULER_RETRY_SEC hasta SCHEDULER_RETRY_MAX_SEC), así la Trivia no queda detenida. Por esto el handler
+    debe poder repetirse. También se registra el retraso de cada ejecución (momento real de ejecución menos
+    el plazo) para exponerlo como estadística.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs) -> "RoundScheduler":
+        if cls._instance is None:
+            cls._instance = super(RoundScheduler, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._heap = []
+        self._entries: Dict[Hashable, tuple] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._running = set()
+        self._retries: Dict[Hashable, int] = {}
+        self._semaphore = asyncio.Semaphore(SCHEDULER_MAX_CONCURRENCY)
+        self._lags = deque(maxlen=SCHEDULER_LAG_SAMPLES)
+        self._fired = 0
+        self._failed = 0
+        self._max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def schedule(self, key: Hashable, deadline: float, token: Any = None, data: Any = None) -> None:
+        """
+        Agenda (o re-agenda) la llave para ser ejecutada en el epoch "deadline"
+        """
+        seq = next(self._counter)
+        self._entries[key] = (deadline, seq, token, data)
+        heapq.heappush(self._heap, (deadline, seq, key))
+        if self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        self._retries.pop(key, None)
+
+    def get_token(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        return entry[2] if entry else None
+
+    def pending_data(self) -> Iterator[Any]:
+        """
+        Retorna la "data" de cada entrada pendiente
+        """
+        return (entry[3] for entry in self._entries.values())
+
+    def expedite(self, key: Hashable, token: Any) -> bool:
+        """
+        Adelanta a "ahora" el plazo de una llave, solo si su token sigue siendo el indicado.
+        Retorna False si la entrada ya no existe o corresponde a otro token (ej: otra ronda).
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[2] != token:
+            return False
+        self.schedule(key, min(entry[0], time.time()), token, entry[3])
+        return True
+
+    async def run(self, handler: Callable) -> None:
+        """
+        Ciclo principal. Espera hasta el plazo mas cercano, o hasta que se agende uno anterior.
+        """
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, seq, key = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if entry is None or entry[1] != seq:
+                    continue
+                del self._entries[key]
+                task = asyncio.create_task(self._dispatch(handler, key, deadline, entry[2], entry[3]))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch(self, handler: Callable, key: Hashable, deadline: float, token: Any, data: Any) -> None:
+        async with self._semaphore:
+            lag = max(0.0, time.time() - deadline)
+            self._lags.append(lag)
+            ROUND_SCHEDULE_LAG.observe(lag)
+            self._fired += 1
+            self._max_lag = max(self._max_lag, lag)
+            try:
+                await handler(key, token, data)
+            except Exception as e:
+                self._failed += 1
+                self._retry(key, token, data, e)
+            else:
+                self._retries.pop(key, None)
+
+    def _retry(self, key: Hashable, token: Any, data: Any, error: Exception) -> None:
+        """
+        Re-agenda una entrada cuyo handler falló, con espera exponencial. Si mientras tanto la llave fue
+        re-agendada (ej: el handler alcanzó a abrir la siguiente ronda), no se reintenta.
+        """
+        if key in self._entries:
+            self._retries.pop(key, None)
+            return
+        retries = self._retries.get(key, 0) + 1
+        self._retries[key] = retries
+        delay = min(SCHEDULER_RETRY_MAX_SEC, SCHEDULER_RETRY_SEC * 2 ** (retries - 1))
+        logger.error(
+            "Error al procesar el plazo de %s (%s), reintento %s en %s s: %s", key, token, retries, delay, error
+        )
+        self.schedule(key, time.time() + delay, token, data)
+
+    def get_stats(self) -> dict:
+        """
+        Estadísticas del scheduler. Los percentiles de retraso se calculan sobre las ultimas
+        SCHEDULER_LAG_SAMPLES ejecuciones y se expresan en milisegundos.
+        """
+        lags = sorted(self._lags)
+
+        def percentile(p: float) -> float:
+            if not lags:
+                return 0.0
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))] * 1000, 3)
+
+        return {
+            "pending": len(self._entries),
+            "running": len(self._running),
+            "fired": self._fired,
+            "failed": self._failed,
+            "retrying": len(self._retries),
+            "lag_ms": {
+                "mean": round(sum(lags) / len(lags) * 1000, 3) if lags else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(self._max_lag * 1000, 3),
+            }
+        }
@@ -0,0 +1,95 @@
+import logging
+from typing import List, Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from app.core.config import db
+
+"""
+Puntaje de las respuestas de una ronda
+
+El cierre de una ronda (calculate_round_points) marca la ronda como cerrada ("closed") y luego puntúa todas sus
+respuestas. Una respuesta aceptada a tiempo cuya escritura termina después de esa marca (ej: la escribió el
+AnswerBuffer de otro proceso) no alcanza a ser puntuada por el cierre, por lo que quien la escribe la puntúa con
+"score_late_answers". Ambos caminos pueden puntuar la misma respuesta: las agregaciones se pueden repetir sin
+sumar dos veces.
+"""
+
+logger = logging.getLogger(__name__)
+
+trivia_collection: AsyncIOMotorCollection = db["trivias"]
+answers_collection: AsyncIOMotorCollection = db["answers"]
+
+def answers_match(trivia_id: str, round_data: dict, user_ids: Optional[List[str]]) -> dict:
+    match = {"trivia_id": trivia_id, "round_id": round_data["id"]}
+    if user_ids is not None:
+        match["user_id"] = {"$in": user_ids}
+    return match
+
+def round_score_pipeline(trivia_id: str, round_data: dict, user_ids: Optional[List[str]] = None) -> List[dict]:
+    """
+    Agregación que calcula, en la DB, el puntaje de cada respuesta de una ronda (o solo de los jugadores
+    "user_ids") y lo guarda en la misma respuesta ("score") con $merge.
+
+    La puntuación es igual a la dificultad de la pregunta si la respuesta es correcta, o 0 si es incorrecta.
+    Los jugadores que no respondieron no tienen respuesta y su puntaje en la ronda es 0.
+    """
+    return [
+        {"$match": answers_match(trivia_id, round_data, user_ids)},
+        {"$project": {"score": {"$cond": [
+            {"$eq": ["$answer_index", round_data["correct_answer_index"] + 1]}, round_data["difficulty"], 0
+        ]}}},
+        {"$merge": {"into": "answers", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ]
+
+def round_totals_pipeline(trivia_id: str, round_data: dict, user_ids: Optional[List[str]] = None) -> List[dict]:
+    """
+    Agregación que suma el puntaje de cada respuesta (ya calculado) de una ronda al puntaje acumulado del
+    jugador en la Trivia, guardado en la colección "scores", con $merge.
+
+    Cada acumulado guarda las rondas ya sumadas ("rounds"), así repetir la agregación (ej: al reintentar el
+    cierre de la ronda) no suma dos veces la misma ronda. Solo se escriben las respuestas con puntos.
+    """
+    round_count = round_data["round_count"]
+    return [
+        {"$match": {**answers_match(trivia_id, round_data, user_ids), "score": {"$gt": 0}}},
+        {"$project": {
+            "_id": 0, "trivia_id": 1, "user_id": 1, "score": 1, "rounds": {"$literal": [round_count]}
+        }},
+        {"$merge": {
+            "into": "scores",
+            "on": ["trivia_id", "user_id"],
+            "whenMatched": [{"$set": {
+                "score": {"$cond": [
+                    {"$in": [round_count, "$rounds"]}, "$score", {"$add": ["$score", "$$new.score"]}
+                ]},
+                "rounds": {"$setUnion": ["$rounds", "$$new.rounds"]}
+            }}],
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+async def score_answers(trivia_id: str, round_data: dict, user_ids: Optional[List[str]] = None) -> None:
+    """
+    Puntúa las respuestas de una ronda (todas, o solo las de "user_ids") y suma sus puntos al acumulado
+    de cada jugador
+    """
+    await answers_collection.aggregate(round_score_pipeline(trivia_id, round_data, user_ids)).to_list(None)
+    await answers_collection.aggregate(round_totals_pipeline(trivia_id, round_data, user_ids)).to_list(None)
+
+async def score_late_answers(trivia_id: str, round_count: int, user_ids: List[str]) -> None:
+    """
+    Se llama después de escribir respuestas de la ronda "round_count" cerca o después de su termino. Si la
+    ronda ya fue marcada como cerrada, su cierre pudo no ver estas respuestas, así que se puntúan aquí. Si
+    aun no esta cerrada, su cierre las puntuará.
+
+    Un error solo se informa: la respuesta ya esta guardada y no se debe rechazar.
+    """
+    try:
+        trivia = await trivia_collection.find_one(
+            {"_id": ObjectId(trivia_id)},
+            {"rounds": {"$elemMatch": {"round_count": round_count, "closed": True}}}
+        )
+        if trivia and trivia.get("rounds"):
+            await score_answers(trivia_id, trivia["rounds"][0], user_ids)
+    except Exception as e:
+        logger.error("Error al puntuar %s respuestas tardías de la Trivia %s: %s", len(user_ids), trivia_id, e)
@@ -1,6 +1,12 @@
 import asyncio
+import logging
+import time
+from collections import deque
 from fastapi import HTTPException
-from typing import Callable
+from typing import Callable, Optional
+from app.core.constants import TASK_HISTORY_SIZE, TASK_CLASS_LIMITS
+
+logger = logging.getLogger(__name__)
 
 class TaskManager:
     """
@@ -8,6 +14,11 @@ class TaskManager:
 
     Con start_task es posible iniciar cualquier trabajo asíncrono definido como
     una función Callable. Cada work debe tener una ID única.
+
+    Las tareas terminadas se retiran automáticamente de las tareas activas y se guardan en un
+    historial acotado (TASK_HISTORY_SIZE), así la memoria no crece con la cantidad de tareas ejecutadas.
+    Cada tarea pertenece a una clase ("task_class"); las clases listadas en TASK_CLASS_LIMITS tienen
+    un máximo de tareas ejecutándose a la vez, el resto espera en cola.
     """
     _instance = None
 
@@ -19,48 +30,115 @@ class TaskManager:
 
     def _initialize(self):
         self._tasks = {}
+        self._info = {}
+        self._history = deque(maxlen=TASK_HISTORY_SIZE)
+        self._semaphores = {}
+
+    def _semaphore(self, task_class: str) -> Optional[asyncio.Semaphore]:
+        if task_class not in TASK_CLASS_LIMITS:
+            return None
+        if task_class not in self._semaphores:
+            self._semaphores[task_class] = asyncio.Semaphore(TASK_CLASS_LIMITS[task_class])
+        return self._semaphores[task_class]
+
+    async def _worker(self, info: dict, func: Callable, *args, **kwargs) -> None:
+        semaphore = self._semaphore(info["task_class"])
+        if semaphore is None:
+            await self._run(info, func, *args, **kwargs)
+            return
+        async with semaphore:
+            await self._run(info, func, *args, **kwargs)
 
-    async def _worker(self, task_id: str, func: Callable, *args, **kwargs) -> None:
-        print(f"Worker {task_id} iniciado.", flush=True)
+    async def _run(self, info: dict, func: Callable, *args, **kwargs) -> None:
+        task_id = info["task_id"]
+        info["started_at"] = time.time()
+        logger.info("Worker %s iniciado.", task_id)
         try:
             await func(*args, **kwargs)
-            print(f"Worker {task_id} completado.", flush=True)
+            logger.info("Worker %s completado.", task_id)
         except asyncio.CancelledError:
-            print(f"Worker {task_id} cancelado.", flush=True)
+            logger.info("Worker %s cancelado.", task_id)
             raise
         except Exception as e:
-            print(f"Worker {task_id} falló con error: {e}", flush=True)
+            logger.error("Worker %s falló con error: %s", task_id, e)
             raise
 
-    async def start_task(self, task_id: str, func: Callable, *args, **kwargs) -> dict:
+    def _reap(self, info: dict, task: asyncio.Task) -> None:
+        """
+        Callback de termino de una tarea: la retira de las tareas activas y la guarda en el historial
+        """
+        task_id = info["task_id"]
+        if self._tasks.get(task_id) is task:
+            del self._tasks[task_id]
+            del self._info[task_id]
+
+        if task.cancelled():
+            info["status"] = "cancelada"
+        elif task.exception():
+            info["status"] = "fallida"
+            info["error"] = str(task.exception())
+        else:
+            info["status"] = "completada"
+        info["finished_at"] = time.time()
+        info["duration_sec"] = round(info["finished_at"] - (info["started_at"] or info["created_at"]), 3)
+        self._history.append(info)
+
+    async def start_task(self, task_id: str, func: Callable, *args, task_class: str = None, **kwargs) -> dict:
         if task_id in self._tasks:
             raise HTTPException(status_code=400, detail="La tarea ya está en ejecución")
 
-        task = asyncio.create_task(self._worker(task_id, func, *args, **kwargs))
+        info = {
+            "task_id": task_id,
+            "task_class": task_class or task_id,
+            "status": "en ejecución",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_sec": None,
+            "error": None
+        }
+        task = asyncio.create_task(self._worker(info, func, *args, **kwargs))
         self._tasks[task_id] = task
+        self._info[task_id] = info
+        task.add_done_callback(lambda done_task: self._reap(info, done_task))
         return {"status": f"Tarea {task_id} iniciada"}
 
-    async def get_task_status(self, task_id: str) -> dict:
-        if task_id not in self._tasks:
-            raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    def has_task(self, task_id: str) -> bool:
+        return task_id in self._tasks
 
-        task = self._tasks[task_id]
-        if task.done():
-            if task.cancelled():
-                status = "cancelada"
-            elif task.exception():
-                status = f"fallida: {task.exception()}"
-            else:
-                status = "completada"
+    def _running_info(self, task_id: str) -> dict:
+        info = dict(self._info[task_id])
+        if info["started_at"] is None:
+            info["status"] = "en cola"
         else:
-            status = "en ejecución"
+            info["duration_sec"] = round(time.time() - info["started_at"], 3)
+        return info
+
+    async def get_task_status(self, task_id: str) -> dict:
+        if task_id in self._tasks:
+            return self._running_info(task_id)
+
+        for info in reversed(self._history):
+            if info["task_id"] == task_id:
+                return dict(info)
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
 
-        return {"task_id": task_id, "status": status}
+    async def list_tasks(self) -> dict:
+        """
+        Retorna las tareas activas y las del historial, separadas en fallidas y terminadas
+        """
+        history = [dict(info) for info in self._history]
+        return {
+            "running": [self._running_info(task_id) for task_id in self._tasks],
+            "failed": [info for info in history if info["status"] == "fallida"],
+            "finished": [info for info in history if info["status"] != "fallida"]
+        }
 
     async def stop_task(self, task_id: str) -> dict:
         if task_id not in self._tasks:
             raise HTTPException(status_code=404, detail="Tarea no encontrada")
 
         task = self._tasks.pop(task_id)
+        del self._info[task_id]
         task.cancel()
         return {"status": f"Tarea {task_id} cancelada"}
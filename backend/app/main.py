@@ -1,34 +1,81 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from app.core.config import connect_db, close_db
+from app.core.metrics import MetricsMiddleware, MetricsRegistry
+from app.core.indexes import ensure_indexes
 from app.works.trivia_runner import start_check_trivias_task, stop_check_trivias_task
+from app.works.trivia_manager import (
+    start_round_scheduler_task,
+    stop_round_scheduler_task,
+    start_answer_buffer_task,
+    stop_answer_buffer_task
+)
 from app.routes.user_routes import router as user_router
 from app.routes.question_routes import router as question_routes
 from app.routes.trivia_routes import router as trivia_routes
+from app.routes.admin_routes import router as admin_routes
 from app.db_populator import router as db_populator
 
-# FUTURE: Si todos los jugadores responden una ronda y aun hay tiempo, la ronda termina y pasa a la siguiente
 # FUTURE: Reemplazar el uso de IDs por emails para invitar jugadores a una Trivia
 
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(name)s - %(message)s")
+
+async def startup_event():
+    await connect_db()
+    await ensure_indexes()
+    await start_answer_buffer_task()
+    await start_round_scheduler_task()
+    await start_check_trivias_task()
+
+async def shutdown_event():
+    await stop_check_trivias_task()
+    await stop_round_scheduler_task()
+    await stop_answer_buffer_task()
+    close_db()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la app: verifica la conexión con MongoDB y abre el pool antes de recibir requests,
+    inicia las tareas de fondo y, al terminar, las detiene y cierra las conexiones.
+    """
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
 app = FastAPI(
     title="TalaTrivia API",
     description="API de TalaTrivia, el mejor juego del mundo mundial",
     version="0.4.2",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(user_router)
 app.include_router(question_routes)
 app.include_router(trivia_routes)
+app.include_router(admin_routes)
 
 # Ruta para facilitar prueba del proyecto
 app.include_router(db_populator)
 
-@app.on_event("startup")
-async def startup_event():
-    await start_check_trivias_task()
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    await stop_check_trivias_task()
-
 @app.get("/")
 async def root():
     return {"message": "Bienvenido a la API de TalaTrivia!"}
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Métricas del backend",
+    description="Retorna las métricas del backend en formato de texto de Prometheus: latencia y comandos a\
+        MongoDB por ruta, rondas abiertas y cerradas, retraso del scheduler, duración del cálculo de puntos,\
+        respuestas recibidas, Trivias y jugadores activos\
+        y estado del pool de conexiones a MongoDB.",
+)
+async def metrics():
+    return PlainTextResponse(MetricsRegistry().render(), media_type="text/plain; version=0.0.4")
@@ -34,6 +34,40 @@ class QuestionInDB(Question):
     )
 
 
+"""
+Modelos usados para informar el resultado de una importación masiva de preguntas (POST /questions/import)
+"""
+
+class QuestionImportError(BaseModel):
+    row: int = Field(
+        ...,
+        description="Numero de linea del archivo donde parte la fila con error (la primera linea es 1).",
+        example=12
+    )
+    error: str = Field(
+        ...,
+        description="Motivo por el que la fila no fue importada.",
+        example="difficulty: Input should be less than or equal to 3"
+    )
+
+class QuestionImportResult(BaseModel):
+    inserted: int = Field(
+        ...,
+        description="Cantidad de preguntas importadas.",
+        example=499998
+    )
+    failed: int = Field(
+        ...,
+        description="Cantidad de filas que no fueron importadas.",
+        example=2
+    )
+    errors: List[QuestionImportError] = Field(
+        [],
+        description="Errores por fila, ordenados por linea. Se informan hasta 1000 errores.",
+        example=[{"row": 12, "error": "difficulty: Input should be less than or equal to 3"}]
+    )
+
+
 class QuestionUpdate(Question):
     question: Optional[str] = Field(
         None,
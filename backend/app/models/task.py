@@ -0,0 +1,59 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class TaskInfo(BaseModel):
+    task_id: str = Field(
+        ...,
+        description="El identificador único de la tarea.",
+        example="start_trivia_640f92a18b545c7b5f34f4b0"
+    )
+    task_class: str = Field(
+        ...,
+        description="La clase de la tarea. Las tareas de una misma clase comparten el límite de concurrencia.",
+        example="start_trivia"
+    )
+    status: str = Field(
+        ...,
+        description="El estado de la tarea. Puede ser 'en cola', 'en ejecución', 'completada', 'fallida' o\
+            'cancelada'.",
+        example="completada"
+    )
+    created_at: float = Field(
+        ...,
+        description="Momento (epoch en segundos) en que se creó la tarea.",
+        example=1732462200.0
+    )
+    started_at: Optional[float] = Field(
+        None,
+        description="Momento (epoch en segundos) en que la tarea comenzó su ejecución.",
+        example=1732462200.5
+    )
+    finished_at: Optional[float] = Field(
+        None,
+        description="Momento (epoch en segundos) en que terminó la tarea.",
+        example=1732462201.2
+    )
+    duration_sec: Optional[float] = Field(
+        None,
+        description="Duración de la ejecución en segundos. En tareas activas es el tiempo que llevan ejecutándose.",
+        example=0.7
+    )
+    error: Optional[str] = Field(
+        None,
+        description="El error de la tarea, solo en tareas fallidas.",
+        example="Trivia no encontrada"
+    )
+
+class TaskList(BaseModel):
+    running: List[TaskInfo] = Field(
+        [],
+        description="Las tareas en cola o en ejecución."
+    )
+    failed: List[TaskInfo] = Field(
+        [],
+        description="Las tareas fallidas del historial reciente."
+    )
+    finished: List[TaskInfo] = Field(
+        [],
+        description="Las tareas completadas o canceladas del historial reciente."
+    )
@@ -118,13 +118,40 @@ class TriviaInDB(Trivia):
 
 
 """
-Modelo usado para hacer rollback de una Trivia que ha sido interrumpida durante
-su status "playing".
+Modelo usado para listar Trivias sin sus rondas, jugadores ni puntajes (vista "summary" de GET /trivias/).
 """
 
-class TriviaRollback(Trivia):
-    status: Literal[tuple(TRIVIA_STATUS)]
-    total_rounds: int
+class TriviaSummary(BaseModel):
+    id: str = Field(
+        ...,
+        description="El identificador único de la Trivia en la base de datos.",
+        example="640f92a18b545c7b5f34f4b0"
+    )
+    name: constr(min_length=1) = Field(
+        ...,
+        description="El nombre de la Trivia.",
+        example="Geografía Mundial"
+    )
+    description: str = Field(
+        ...,
+        description="Una descripción breve de la Trivia, explicando su temática o reglas.",
+        example="Trivia sobre capitales de países y geografía mundial."
+    )
+    status: Literal[tuple(TRIVIA_STATUS)] = Field(
+        ...,
+        description="El estado actual de la Trivia. Puede ser 'ended', 'playing' o 'waiting_start'.",
+        example="waiting_start"
+    )
+    total_rounds: int = Field(
+        ...,
+        description="El número total de rondas en la Trivia.",
+        example=5
+    )
+    round_time_sec: Optional[int] = Field(
+        60,
+        description="El tiempo asignado por ronda en segundos.",
+        example=90
+    )
 
 
 """
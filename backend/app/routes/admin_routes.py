@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Path
+from app.core.auth import admin_required
+from app.core.metrics import MongoPoolListener
+from app.core.scheduler import RoundScheduler
+from app.core.task_manager import TaskManager
+from app.models.task import TaskInfo, TaskList
+
+router = APIRouter()
+round_scheduler = RoundScheduler()
+task_manager = TaskManager()
+mongo_pool_listener = MongoPoolListener()
+
+@router.get(
+    "/admin/scheduler",
+    response_model=dict,
+    summary="(Admin) Estadísticas del scheduler de rondas",
+    description="Retorna la cantidad de plazos pendientes y en ejecución del scheduler de rondas, junto a\
+        las estadísticas de retraso (momento real de cierre menos 'round_endtime') en milisegundos.",
+    tags=["Admin"]
+)
+async def get_scheduler_stats_endpoint(current_role: dict = Depends(admin_required)):
+    return round_scheduler.get_stats()
+
+@router.get(
+    "/admin/mongo_pool",
+    response_model=dict,
+    summary="(Admin) Estadísticas del pool de conexiones de MongoDB",
+    description="Retorna el limite del pool (maxPoolSize), las conexiones abiertas y en uso, las operaciones\
+        en la cola de espera (actual y máximo), la espera promedio para obtener una conexión en milisegundos\
+        y las operaciones que no obtuvieron conexión. Sirve para dimensionar MONGO_MAX_POOL_SIZE.",
+    tags=["Admin"]
+)
+async def get_mongo_pool_stats_endpoint(current_role: dict = Depends(admin_required)):
+    return mongo_pool_listener.get_stats()
+
+@router.get(
+    "/admin/tasks",
+    response_model=TaskList,
+    summary="(Admin) Listar las tareas del backend",
+    description="Retorna las tareas en ejecución, junto al historial reciente de tareas fallidas y terminadas\
+        con sus duraciones.",
+    tags=["Admin"]
+)
+async def get_tasks_endpoint(current_role: dict = Depends(admin_required)):
+    return await task_manager.list_tasks()
+
+@router.get(
+    "/admin/tasks/{task_id}",
+    response_model=TaskInfo,
+    summary="(Admin) Obtener el estado de una tarea",
+    description="Retorna el estado de una tarea activa o presente en el historial reciente.",
+    tags=["Admin"]
+)
+async def get_task_status_endpoint(
+    task_id: str = Path(
+        ...,
+        description="El identificador único de la tarea.",
+    ),
+    current_role: dict = Depends(admin_required)
+):
+    return await task_manager.get_task_status(task_id)
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Path
-from typing import List
-from app.models.question import Question, QuestionInDB, QuestionUpdate
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from app.models.question import Question, QuestionInDB, QuestionUpdate, QuestionImportResult
 from app.services.question_service import (
     create_question,
     get_all_questions,
+    stream_all_questions,
     delete_question,
-    update_question
+    update_question,
+    import_questions
 )
 from app.core.auth import admin_required
+from app.core.constants import PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
@@ -26,16 +31,54 @@ async def create_question_endpoint(
 ):
     return await create_question(question)
 
+@router.post(
+    "/questions/import",
+    response_model=QuestionImportResult,
+    summary="(Admin) Importar preguntas de forma masiva",
+    description="Importa las preguntas de un archivo NDJSON (una pregunta JSON por linea, con los campos de\
+        POST /questions/) o CSV (format=csv, con encabezado: question, answer, difficulty y columnas\
+        distractor_1, distractor_2...). El archivo se envía como cuerpo del request y se procesa como stream,\
+        por bloques. Las filas invalidas no detienen la importación: se informan con su numero de linea.",
+    tags=["Questions"],
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/x-ndjson": {"schema": {"type": "string"}},
+        "text/csv": {"schema": {"type": "string"}},
+    }}}
+)
+async def import_questions_endpoint(
+    request: Request,
+    input_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="Formato del archivo."),
+    current_role: dict = Depends(admin_required)
+):
+    return await import_questions(request.stream(), input_format)
+
 @router.get(
     "/questions/",
     response_model=List[QuestionInDB],
     summary="(Admin) Obtener todas las Preguntas",
-    description="Devuelve una lista con todas las preguntas registradas en el sistema. \
-        Incluye las posibles respuestas, dificultad y solución.",
+    description="Devuelve una página de las preguntas registradas en el sistema, ordenadas por ID. \
+        Incluye las posibles respuestas, dificultad y solución. Si hay mas preguntas, el header X-Next-Cursor\
+        trae el cursor para pedir la siguiente página con 'after'. Con format=ndjson se exportan todas las\
+        preguntas (desde 'after') como un stream NDJSON, una pregunta por linea.",
     tags=["Questions"]
 )
-async def get_all_questions_endpoint(current_role: dict = Depends(admin_required)):
-    return await get_all_questions()
+async def get_all_questions_endpoint(
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Cantidad máxima de preguntas de la página."),
+    after: Optional[str] = Query(
+        None, description="Cursor de la página (header X-Next-Cursor de la página anterior)."
+    ),
+    output_format: Literal["json", "ndjson"] = Query(
+        "json", alias="format", description="'ndjson' exporta todas las preguntas como un stream, sin paginar."
+    ),
+    current_role: dict = Depends(admin_required)
+):
+    if output_format == "ndjson":
+        return StreamingResponse(stream_all_questions(after), media_type="application/x-ndjson")
+    questions, next_cursor = await get_all_questions(limit, after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return questions
 
 @router.delete(
     "/questions/{question_id}",
@@ -1,20 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, Path, Form
-from typing import List, Union
-from app.models.trivia import Trivia, TriviaInDB, TriviaProtected
+from fastapi import APIRouter, HTTPException, Depends, Path, Form, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional, Union
+from app.models.trivia import Trivia, TriviaInDB, TriviaProtected, TriviaSummary
 from app.services.trivia_service import (
     create_trivia,
     delete_trivia,
     get_all_trivias,
+    stream_all_trivias,
     join_trivia,
     leave_trivia,
     get_trivia_details,
     get_question_for_trivia,
+    wait_question_for_trivia,
     submit_answer,
-    get_trivia_ranking
+    get_trivia_ranking,
+    subscribe_trivia_events
 )
 from app.models.question import DisplayedQuestion
 from app.models.user import UserRanking
 from app.core.auth import admin_required, player_or_admin_required
+from app.core.constants import PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
@@ -54,13 +60,32 @@ async def delete_trivia_endpoint(
 
 @router.get(
     "/trivias/",
-    response_model=List[TriviaInDB],
+    response_model=List[Union[TriviaInDB, TriviaSummary]],
     summary="(Admin) Obtener todas las Trivias",
-    description="Devuelve una lista con todas las Trivias registradas en el sistema.",
+    description="Devuelve una página de las Trivias registradas en el sistema, ordenadas por ID. Si hay mas\
+        Trivias, el header X-Next-Cursor trae el cursor para pedir la siguiente página con 'after'. Con\
+        view=summary no se incluyen rondas, jugadores ni puntajes. Las rondas no incluyen las respuestas ni el\
+        puntaje de cada ronda, que se obtienen con GET /trivias/{trivia_id}. Con format=ndjson se exportan todas\
+        las Trivias (desde 'after') como un stream NDJSON, una Trivia por linea.",
     tags=["Trivias"]
 )
-async def get_all_trivias_endpoint(current_role: dict = Depends(admin_required)):
-    trivias = await get_all_trivias()
+async def get_all_trivias_endpoint(
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Cantidad máxima de Trivias de la página."),
+    after: Optional[str] = Query(
+        None, description="Cursor de la página (header X-Next-Cursor de la página anterior)."
+    ),
+    view: Literal["full", "summary"] = Query("full", description="'summary' omite rondas, jugadores y puntajes."),
+    output_format: Literal["json", "ndjson"] = Query(
+        "json", alias="format", description="'ndjson' exporta todas las Trivias como un stream, sin paginar."
+    ),
+    current_role: dict = Depends(admin_required)
+):
+    if output_format == "ndjson":
+        return StreamingResponse(stream_all_trivias(after, view), media_type="application/x-ndjson")
+    trivias, next_cursor = await get_all_trivias(limit, after, view)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return trivias
 
 @router.post(
@@ -78,7 +103,7 @@ async def join_trivia_endpoint(
     ),
     current_user: dict = Depends(player_or_admin_required),
 ):
-    return await join_trivia(trivia_id, current_user["email"])
+    return await join_trivia(trivia_id, current_user)
 
 @router.post(
     "/trivias/{trivia_id}/leave",
@@ -96,7 +121,7 @@ async def leave_trivia_endpoint(
     ),
     current_user: dict = Depends(player_or_admin_required),
 ):
-    return await leave_trivia(trivia_id, current_user["email"])
+    return await leave_trivia(trivia_id, current_user)
 
 @router.get(
     "/trivias/{trivia_id}",
@@ -114,7 +139,7 @@ async def get_trivia_details_endpoint(
     ),
     current_user: dict = Depends(player_or_admin_required),
 ):
-    return await get_trivia_details(trivia_id, current_user["email"])
+    return await get_trivia_details(trivia_id, current_user)
 
 @router.get(
     "/trivias/{trivia_id}/question",
@@ -122,7 +147,9 @@ async def get_trivia_details_endpoint(
     summary="Obtener la pregunta actual de una Trivia que este en juego.",
     description="El usuario puede obtener la pregunta y posibles respuestas de la ronda activa de una Trivia.\
         También retorna otra información como la dificultad de la ronda, el tiempo restante para responder\
-        (en segundos), un aviso si el jugador ya ha respondido en esta ronda y otra metadata.",
+        (en segundos), un aviso si el jugador ya ha respondido en esta ronda y otra metadata.\
+        Con 'wait_for_round' la consulta espera (long-poll) hasta que se abra esa ronda, termine la Trivia o pasen\
+        25 segundos, y luego retorna la pregunta activa.",
     tags=["Trivias"]
 )
 async def get_question_for_trivia_endpoint(
@@ -130,9 +157,39 @@ async def get_question_for_trivia_endpoint(
         ...,
         description="El identificador único de la Trivia de la cual se quiere obtener la pregunta de la ronda activa",
     ),
+    wait_for_round: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Numero de ronda a esperar. Usualmente la ronda siguiente a la ultima pregunta recibida.",
+        example=2
+    ),
+    current_user: dict = Depends(player_or_admin_required),
+):
+    if wait_for_round is not None:
+        return await wait_question_for_trivia(trivia_id, current_user, wait_for_round)
+    return await get_question_for_trivia(trivia_id, current_user)
+
+
+@router.get(
+    "/trivias/{trivia_id}/events",
+    summary="Recibir los eventos de una Trivia (Server-Sent Events)",
+    description="Stream 'text/event-stream' con los eventos de la Trivia, como alternativa a consultar\
+        /trivias/{trivia_id}/question. Eventos: 'round_opened' (pregunta de la nueva ronda y su termino),\
+        'round_closed' (respuesta correcta y puntaje de la ronda) y 'trivia_ended' (puntaje final, cierra el stream).\
+        Al conectarse se recibe el evento del estado actual de la Trivia.",
+    tags=["Trivias"]
+)
+async def get_trivia_events_endpoint(
+    trivia_id: str = Path(
+        ...,
+        description="El identificador único de la Trivia de la cual se quieren recibir los eventos",
+    ),
     current_user: dict = Depends(player_or_admin_required),
 ):
-    return await get_question_for_trivia(trivia_id, current_user["email"])
+    stream = await subscribe_trivia_events(trivia_id, current_user)
+    return StreamingResponse(
+        stream, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post(
@@ -163,7 +220,7 @@ async def submit_answer_to_trivia_question(
     ),
     current_user: dict = Depends(player_or_admin_required),
 ):
-    return await submit_answer(trivia_id, question_id, answer_position, current_user["email"])
+    return await submit_answer(trivia_id, question_id, answer_position, current_user)
 
 
 @router.get(
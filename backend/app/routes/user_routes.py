@@ -1,19 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, Form, status
+from fastapi import APIRouter, HTTPException, Depends, Form, Query, Response, status
+from fastapi.responses import StreamingResponse
 from bcrypt import checkpw
 from datetime import timedelta
-from typing import List
+from typing import List, Literal, Optional
 from app.models.user import UserCreate, UserResponseInDB, UserToken
 from app.models.trivia import TriviaStatus
 from app.services.user_service import (
     create_user,
     get_user_by_email,
     get_all_users,
+    stream_all_users,
     get_trivias_invitations_for_user,
     get_trivia_joined,
     get_trivias_played_by_user
 )
 from app.core.auth import create_access_token, admin_required, player_or_admin_required
-from app.core.constants import LOGIN_PATH
+from app.core.constants import LOGIN_PATH, PAGE_SIZE, MAX_PAGE_SIZE
+from app.core.pagination import NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
@@ -34,11 +37,28 @@ async def create_user_endpoint(user: UserCreate):
     "/users",
     response_model=list[UserResponseInDB],
     summary="(Admin) Obtener todos los Usuarios",
-    description="Devuelve una lista de todos los usuarios registrados.",
+    description="Devuelve una página de los usuarios registrados, ordenados por ID. Si hay mas usuarios, el\
+        header X-Next-Cursor trae el cursor para pedir la siguiente página con 'after'. Con format=ndjson se\
+        exportan todos los usuarios (desde 'after') como un stream NDJSON, un usuario por linea.",
     tags=["Users"],
 )
-async def get_all_users_endpoint(current_user: dict = Depends(admin_required)):
-    return await get_all_users()
+async def get_all_users_endpoint(
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Cantidad máxima de usuarios de la página."),
+    after: Optional[str] = Query(
+        None, description="Cursor de la página (header X-Next-Cursor de la página anterior)."
+    ),
+    output_format: Literal["json", "ndjson"] = Query(
+        "json", alias="format", description="'ndjson' exporta todos los usuarios como un stream, sin paginar."
+    ),
+    current_user: dict = Depends(admin_required)
+):
+    if output_format == "ndjson":
+        return StreamingResponse(stream_all_users(after), media_type="application/x-ndjson")
+    users, next_cursor = await get_all_users(limit, after)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 
 @router.post(
@@ -68,7 +88,7 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}, expires_delta=timedelta(minutes=300)
+        data={"sub": user.email, "role": user.role, "uid": user.id}, expires_delta=timedelta(minutes=300)
     )
 
     return UserToken(access_token=access_token, token_type="bearer")
@@ -84,7 +104,7 @@ async def login_for_access_token(
 async def get_trivias_invitations_for_user_endpoint(
     current_user: dict = Depends(player_or_admin_required)
 ):
-    trivia_ids = await get_trivias_invitations_for_user(current_user["email"])
+    trivia_ids = await get_trivias_invitations_for_user(current_user)
     if not trivia_ids:
         raise HTTPException(status_code=404, detail="No estas invitado a ninguna Trivia")
     return trivia_ids
@@ -101,7 +121,7 @@ async def get_trivias_invitations_for_user_endpoint(
 async def get_trivia_joined_endpoint(
     current_user: dict = Depends(player_or_admin_required),
 ):
-    trivia = await get_trivia_joined(current_user["email"])
+    trivia = await get_trivia_joined(current_user)
     if trivia is False:
         raise HTTPException(status_code=404, detail="No te has unido a ninguna Trivia.")
     return trivia
@@ -116,7 +136,7 @@ async def get_trivia_joined_endpoint(
 async def get_trivias_played(
     current_user: dict = Depends(player_or_admin_required),
 ):
-    olds_trivias = await get_trivias_played_by_user(current_user["email"])
+    olds_trivias = await get_trivias_played_by_user(current_user)
     if len(olds_trivias) == 0:
         raise HTTPException(status_code=404, detail="Aun no has terminado de jugar ninguna Trivia")
     return olds_trivias
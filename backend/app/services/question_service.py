@@ -1,10 +1,24 @@
-from typing import List, Optional
+import asyncio
+import codecs
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from motor.motor_asyncio import AsyncIOMotorCollection
-from app.models.question import Question, QuestionInDB, QuestionUpdate
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from app.models.question import (
+    Question,
+    QuestionInDB,
+    QuestionUpdate,
+    QuestionImportError,
+    QuestionImportResult
+)
 from app.core.config import db
+from app.core.constants import PAGE_SIZE, IMPORT_CHUNK_SIZE, IMPORT_MAX_ERRORS
+from app.core.pagination import find_page, stream_ndjson
 from bson import ObjectId
 from fastapi import HTTPException
-from app.services.trivia_service import get_trivia
+from app.services.trivia_service import get_trivia_using_question
 
 questions_collection: AsyncIOMotorCollection = db["questions"]
 
@@ -16,15 +30,24 @@ async def create_question(question: Question) -> QuestionInDB:
     result = await questions_collection.insert_one(question_dict)
     return QuestionInDB(id=str(result.inserted_id), **question.dict())
 
-async def get_all_questions() -> List[QuestionInDB]:
+def question_from_db(question: dict) -> QuestionInDB:
+    return QuestionInDB(id=str(question["_id"]), **question)
+
+async def get_all_questions(
+    limit: int = PAGE_SIZE, after: Optional[str] = None
+) -> Tuple[List[QuestionInDB], Optional[str]]:
     """
-    Recupera todas las preguntas
+    Recupera una página de preguntas, ordenadas por ID, a partir del cursor "after"
+    Retorna las preguntas y el cursor de la siguiente página (None si no hay mas preguntas)
     """
-    questions_cursor = questions_collection.find()
-    questions = []
-    async for question in questions_cursor:
-        questions.append(QuestionInDB(id=str(question["_id"]), **question))
-    return questions
+    questions, next_cursor = await find_page(questions_collection, {}, None, limit, after)
+    return [question_from_db(question) for question in questions], next_cursor
+
+def stream_all_questions(after: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Recupera todas las preguntas a partir del cursor "after", como NDJSON, sin cargarlas todas en memoria
+    """
+    return stream_ndjson(questions_collection, {}, None, question_from_db, after)
 
 async def get_question(question_id: str) -> Optional[QuestionInDB]:
     """
@@ -41,14 +64,14 @@ async def delete_question(question_id: str) -> Optional[QuestionInDB]:
     Elimina una pregunta
     Solo se pueden eliminar preguntas que no estén asociadas a ninguna Trivia
     """
-    trivia_using_question = await get_trivia(question_id, False)
+    trivia_using_question = await get_trivia_using_question(question_id)
     if trivia_using_question is not False:
         raise HTTPException(
             status_code=400,
             detail=f"La pregunta con ID {question_id} no puede eliminarse porque está\
                 asociada a la Trivia '{trivia_using_question['_id']}'."
         )
-    result = await questions_collection.find_one_and_delete({"_id": question_id})
+    result = await questions_collection.find_one_and_delete({"_id": ObjectId(question_id)})
     if result:
         return QuestionInDB(id=str(result["_id"]), **result)
     return None
@@ -58,7 +81,7 @@ async def update_question(question_id: str, updated_question: QuestionUpdate) ->
     Actualiza una pregunta
     La pregunta no puede estar asociada a ninguna Trivia para poder ser actualizada.
     """
-    trivia_using_question = await get_trivia(question_id, False)
+    trivia_using_question = await get_trivia_using_question(question_id)
     if trivia_using_question is not False:
         raise HTTPException(
             status_code=400,
@@ -76,3 +99,186 @@ async def update_question(question_id: str, updated_question: QuestionUpdate) ->
         return_document=True
     )
     return result
+
+
+"""
+Importación masiva de preguntas
+
+El archivo se lee como stream (sin cargarlo completo en memoria), linea a linea. Cada fila se valida con el
+modelo Question y las filas validas se insertan en bloques de IMPORT_CHUNK_SIZE con un insert_many sin orden;
+mientras se inserta un bloque se valida el siguiente. Las filas con error no detienen la importación: se
+informan con su numero de linea.
+"""
+
+# Fila del archivo: (linea donde parte, campos de la pregunta o el motivo por el que no se pudo leer)
+ImportRow = Tuple[int, Union[dict, str]]
+
+CSV_REQUIRED_COLUMNS = {"question", "answer", "difficulty"}
+
+async def read_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Convierte un stream de bytes UTF-8 en lineas, sin importar donde se corten los bloques del stream
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+async def ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[ImportRow]:
+    """
+    Lee un archivo NDJSON: una pregunta (objeto JSON) por linea. Las lineas vacías se ignoran.
+    """
+    row = 0
+    async for line in lines:
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, f"JSON invalido: {e}"
+
+def csv_question(header: List[str], values: List[str]) -> Union[dict, str]:
+    """
+    Arma los campos de una pregunta a partir de una fila CSV. Las columnas "distractor..." (ej: distractor_1,
+    distractor_2) forman la lista de distractores, en orden y omitiendo las vacías.
+    """
+    if len(values) != len(header):
+        return f"La fila tiene {len(values)} columnas y el encabezado {len(header)}"
+    columns = dict(zip(header, values))
+    return {
+        "question": columns["question"],
+        "answer": columns["answer"],
+        "difficulty": columns["difficulty"],
+        "distractors": [value for name, value in zip(header, values) if name.startswith("distractor") and value],
+    }
+
+async def csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[ImportRow]:
+    """
+    Lee un archivo CSV con encabezado (question, answer, difficulty y columnas "distractor..."). Un campo
+    entre comillas puede contener comas y saltos de linea: la fila sigue en la linea siguiente mientras tenga
+    comillas sin cerrar.
+    """
+    header = None
+    row = 0
+    start = 0
+    record_lines = []
+    async for line in lines:
+        row += 1
+        if not record_lines:
+            start = row
+        record_lines.append(line)
+        record = "\n".join(record_lines)
+        if record.count('"') % 2 == 1:
+            continue
+        record_lines = []
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield start, f"CSV invalido: {e}"
+            continue
+
+        if header is None:
+            header = [name.strip() for name in values]
+            missing = CSV_REQUIRED_COLUMNS - set(header)
+            if missing:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Al encabezado del CSV le faltan las columnas: {', '.join(sorted(missing))}"
+                )
+            continue
+        yield start, csv_question(header, values)
+
+    if record_lines:
+        yield start, "CSV invalido: comillas sin cerrar al final del archivo"
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(location) for location in detail['loc']) or 'fila'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+class QuestionImport:
+    """
+    Estado de una importación: preguntas insertadas, filas con error y el bloque que se esta armando
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[QuestionImportError] = []
+        self.rows: List[int] = []
+        self.documents: List[dict] = []
+
+    def add_error(self, row: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(QuestionImportError(row=row, error=error))
+
+    def take_chunk(self) -> Tuple[List[int], List[dict]]:
+        chunk = (self.rows, self.documents)
+        self.rows, self.documents = [], []
+        return chunk
+
+    async def insert_chunk(self, rows: List[int], documents: List[dict]) -> None:
+        """
+        Inserta un bloque sin orden, así una fila rechazada por la DB no impide insertar el resto del bloque
+        """
+        try:
+            result = await questions_collection.insert_many(documents, ordered=False)
+            self.inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            self.inserted += e.details.get("nInserted", 0)
+            for error in e.details.get("writeErrors", []):
+                self.add_error(rows[error["index"]], error["errmsg"])
+
+    def result(self) -> QuestionImportResult:
+        return QuestionImportResult(
+            inserted=self.inserted,
+            failed=self.failed,
+            errors=sorted(self.errors, key=lambda error: error.row)
+        )
+
+async def import_questions(chunks: AsyncIterator[bytes], input_format: str = "ndjson") -> QuestionImportResult:
+    """
+    Importa las preguntas de un archivo NDJSON o CSV recibido como stream de bytes
+    Retorna la cantidad de preguntas insertadas y los errores de cada fila que no se importó
+    """
+    lines = read_lines(chunks)
+    rows = csv_rows(lines) if input_format == "csv" else ndjson_rows(lines)
+    question_import = QuestionImport()
+    inserting: Optional[asyncio.Task] = None
+    try:
+        async for row, fields in rows:
+            if isinstance(fields, str):
+                question_import.add_error(row, fields)
+                continue
+            try:
+                question = Question.model_validate(fields)
+            except ValidationError as e:
+                question_import.add_error(row, validation_message(e))
+                continue
+            question_import.rows.append(row)
+            question_import.documents.append(question.model_dump())
+
+            if len(question_import.documents) >= IMPORT_CHUNK_SIZE:
+                # Solo un bloque en vuelo: se espera el anterior antes de insertar el siguiente
+                if inserting is not None:
+                    await inserting
+                inserting = asyncio.create_task(question_import.insert_chunk(*question_import.take_chunk()))
+    finally:
+        if inserting is not None:
+            await inserting
+
+    if question_import.documents:
+        await question_import.insert_chunk(*question_import.take_chunk())
+    return question_import.result()
@@ -1,25 +1,60 @@
+import asyncio
+import json
 import time
-from typing import Optional, Union, List
+from typing import AsyncIterator, Optional, Tuple, Union, List
 from motor.motor_asyncio import AsyncIOMotorCollection
-from app.models.trivia import Trivia, TriviaInDB, TriviaProtected
+from app.models.trivia import Trivia, TriviaInDB, TriviaProtected, TriviaSummary
 from datetime import datetime
 from app.models.question import DisplayedQuestion
 from app.models.user import UserRanking
 from app.core.config import db
-from app.services.user_service import get_user_by_email
-from app.core.constants import QUESTION_STATUS
-from fastapi import HTTPException
+from app.services.user_service import get_user_id
+from app.core.constants import (
+    QUESTION_STATUS,
+    TRIVIA_READY_EVENT,
+    STREAM_KEEPALIVE_SEC,
+    LONG_POLL_TIMEOUT_SEC,
+    ANSWER_BUFFER_ENABLED,
+    LATE_ANSWER_MARGIN_SEC,
+    PAGE_SIZE
+)
+from app.core.events import EventBus
+from app.core.metrics import ANSWERS_ACCEPTED
+from app.core.round_cache import ActiveRoundCache, build_entry
+from app.core.broadcaster import Broadcaster
+from app.core.pagination import find_page, stream_ndjson
+from app.core.answer_buffer import AnswerBuffer
+from app.core.scoring import score_late_answers
+from app.core.round_answers import count_round_answers
+from fastapi import HTTPException, Response
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+event_bus = EventBus()
+round_cache = ActiveRoundCache()
+broadcaster = Broadcaster()
+answer_buffer = AnswerBuffer()
 
 trivia_collection: AsyncIOMotorCollection = db["trivias"]
 users_collection: AsyncIOMotorCollection = db["users"]
 questions_collection: AsyncIOMotorCollection = db["questions"]
+answers_collection: AsyncIOMotorCollection = db["answers"]
+scores_collection: AsyncIOMotorCollection = db["scores"]
+
+# Campos de la Trivia necesarios para mostrar la ronda activa: solo se lee la ultima ronda
+ACTIVE_ROUND_PROJECTION = {"status": 1, "user_ids_invitations": 1, "total_rounds": 1, "rounds": {"$slice": -1}}
+
+# Campos de la Trivia necesarios para detectar sus eventos: las dos ultimas rondas cubren una ronda que
+# se cierra y la siguiente que se abre entre dos lecturas
+TRIVIA_EVENTS_PROJECTION = {"status": 1, "total_rounds": 1, "final_score": 1, "rounds": {"$slice": -2}}
 
 async def create_trivia(trivia: Trivia) -> TriviaInDB:
     """
     Crea una nueva Trivia compuesta de una serie de Questions y donde se invitan una serie de Usuarios
     Las Trivias creadas parten por defecto con status "waiting_start". Al crear una Trivia el sistema
-    calcula la cantidad de rondas totales que tendrá (total_rounds), basándose en el numero de preguntas.
+    calcula la cantidad de rondas totales que tendrá (total_rounds), basándose en el numero de preguntas,
+    y la cantidad de invitados que aun no se unen (pending_joins), que llega a 0 cuando la Trivia puede iniciar.
     """
 
     # Verificar si las IDs de los usuarios existen
@@ -38,42 +73,97 @@ async def create_trivia(trivia: Trivia) -> TriviaInDB:
     trivia_dict = trivia.dict()
     trivia_dict["status"] = "waiting_start"
     trivia_dict["total_rounds"] = len(trivia_dict["question_ids"])
+    trivia_dict["pending_joins"] = len(set(trivia_dict["user_ids_invitations"]))
     result = await trivia_collection.insert_one(trivia_dict)
     return TriviaInDB(id=str(result.inserted_id), **trivia_dict)
 
 
 async def delete_trivia(trivia_id: str) -> Optional[TriviaInDB]:
     """
-    Elimina una Trivia
+    Elimina una Trivia, sus respuestas y sus puntajes acumulados
     """
     trivia = await trivia_collection.find_one_and_delete({"_id": ObjectId(trivia_id)})
     if trivia:
+        await answers_collection.delete_many({"trivia_id": trivia_id})
+        await scores_collection.delete_many({"trivia_id": trivia_id})
         return TriviaInDB(id=str(trivia["_id"]), **trivia)
     return None
 
-async def get_all_trivias() -> List[TriviaInDB]:
+def trivia_from_db(trivia: dict) -> TriviaInDB:
+    return TriviaInDB(id=str(trivia["_id"]), **trivia)
+
+def trivia_summary_from_db(trivia: dict) -> TriviaSummary:
+    return TriviaSummary(id=str(trivia["_id"]), **trivia)
+
+
+# Vistas del listado de Trivias: proyección y modelo de cada una. "summary" no lee rondas, jugadores ni puntajes
+# y "full" no lee el mazo de preguntas ("deck"), que es interno del motor de rondas. Las respuestas y puntajes de
+# cada ronda están en la colección de respuestas y solo se incluyen en el detalle de una Trivia.
+TRIVIA_LIST_VIEWS = {
+    "full": ({"deck": 0}, trivia_from_db),
+    "summary": (
+        {"name": 1, "description": 1, "status": 1, "total_rounds": 1, "round_time_sec": 1},
+        trivia_summary_from_db
+    ),
+}
+
+async def get_all_trivias(
+    limit: int = PAGE_SIZE, after: Optional[str] = None, view: str = "full"
+) -> Tuple[List[Union[TriviaInDB, TriviaSummary]], Optional[str]]:
     """
-    Retorna todas las Trivias
+    Retorna una página de Trivias, ordenadas por ID, a partir del cursor "after", en la vista indicada
+    Retorna las Trivias y el cursor de la siguiente página (None si no hay mas Trivias)
+    Las rondas no incluyen respuestas ni puntajes por ronda (ver "get_trivia_details")
     """
-    trivias = await trivia_collection.find().to_list(100)
-    return [TriviaInDB(id=str(trivia["_id"]), **trivia) for trivia in trivias]
+    projection, to_model = TRIVIA_LIST_VIEWS[view]
+    trivias, next_cursor = await find_page(trivia_collection, {}, projection, limit, after)
+    return [to_model(trivia) for trivia in trivias], next_cursor
 
+def stream_all_trivias(after: Optional[str] = None, view: str = "full") -> AsyncIterator[bytes]:
+    """
+    Retorna todas las Trivias a partir del cursor "after", en la vista indicada, como NDJSON, sin cargarlas
+    todas en memoria
+    """
+    projection, to_model = TRIVIA_LIST_VIEWS[view]
+    return stream_ndjson(trivia_collection, {}, projection, to_model, after)
 
-async def get_trivia(trivia_id: str, http: bool = True) -> Union[bool, TriviaInDB]:
+async def get_trivia(trivia_id: str, http: bool = True, projection: Optional[dict] = None) -> Union[bool, TriviaInDB]:
     """
     Retorna una Trivia
 
     Con "http=False" retornamos un False, en vez de una HTTPException, en caso de no encontrar una Trivia
+    Con "projection" solo se retornan los campos indicados (ver "user_projection"), así las validaciones
+    no leen todas las rondas, respuestas y puntajes de la Trivia.
     """
 
-    trivia = await trivia_collection.find_one({"_id": ObjectId(trivia_id)})
+    trivia = await trivia_collection.find_one({"_id": ObjectId(trivia_id)}, projection)
     if not trivia:
         if http is True:
             raise HTTPException(status_code=404, detail="Trivia no encontrada")
         return False
     return trivia
 
-async def join_trivia(trivia_id: str, user_email: str) -> TriviaProtected:
+async def get_trivia_using_question(question_id: str) -> Union[bool, dict]:
+    """
+    Retorna una Trivia (solo su "_id") que incluya la pregunta, o False si ninguna la incluye
+
+    La consulta usa el indice de "question_ids", así su costo no depende de la cantidad de Trivias guardadas.
+    """
+    trivia = await trivia_collection.find_one({"question_ids": question_id}, {"_id": 1})
+    return trivia or False
+
+def user_projection(user_id: str) -> dict:
+    """
+    Proyección con el estado de la Trivia y, de "user_ids_invitations" y "joined_users", solo el usuario
+    indicado (si esta presente). Así validar la participación de un usuario no depende de la cantidad de jugadores.
+    """
+    return {
+        "status": 1,
+        "user_ids_invitations": {"$elemMatch": {"$eq": user_id}},
+        "joined_users": {"$elemMatch": {"$eq": user_id}}
+    }
+
+async def join_trivia(trivia_id: str, current_user: dict) -> TriviaProtected:
     """
     Agrega a un usuario que este en al lista de invitados (user_ids_invitations) de una Trivia, a la
     lista de usuarios que han aceptado la invitación (joined_users).
@@ -84,17 +174,20 @@ async def join_trivia(trivia_id: str, user_email: str) -> TriviaProtected:
     confirmen la invitación (status "waiting_start")
     O sea, un usuario solo puede aceptar simultáneamente 1 invitación a una trivia que
     este por empezar o este en curso.
+
+    Cada unión descuenta "pending_joins" en la misma escritura. Cuando el ultimo invitado se une (llega a 0),
+    se publica el evento TRIVIA_READY_EVENT para que la Trivia inicie de inmediato, sin esperar al ciclo de
+    revisión de trivias.
     """
 
-    # Buscar el usuario por correo electrónico
-    user = await get_user_by_email(user_email)
-    user_id = user.id
+    # ID del usuario autenticado
+    user_id = await get_user_id(current_user)
 
     # Verificar si el usuario ya está unido a otra trivia activa o por comenzar
-    conflicting_trivia = await trivia_collection.find_one({
-        "joined_users": user_id,
-        "status": {"$in": ["waiting_start", "playing"]}
-    })
+    conflicting_trivia = await trivia_collection.find_one(
+        {"joined_users": user_id, "status": {"$in": ["waiting_start", "playing"]}},
+        {"status": 1}
+    )
     if conflicting_trivia:
         raise HTTPException(
             status_code=403,
@@ -103,10 +196,10 @@ async def join_trivia(trivia_id: str, user_email: str) -> TriviaProtected:
         )
 
     # Buscar la trivia por ID
-    trivia = await get_trivia(trivia_id)
+    trivia = await get_trivia(trivia_id, projection=user_projection(user_id))
 
     # Verificar si el usuario es parte de `user_ids_invitations` (esta invitado)
-    if user_id not in trivia["user_ids_invitations"]:
+    if user_id not in trivia.get("user_ids_invitations", []):
         raise HTTPException(
             status_code=403,
             detail="El usuario no esta invitado a esta Trivia"
@@ -119,20 +212,24 @@ async def join_trivia(trivia_id: str, user_email: str) -> TriviaProtected:
             detail=f"No se puede unir a esta trivia porque su estado actual es '{trivia['status']}'."
         )
 
-    # Actualizar el campo `joined_users` añadiendo al usuario si no está ya en la lista
-    joined_users = trivia.get("joined_users", [])
-    if user_id not in joined_users:
-        joined_users.append(user_id)
-        await trivia_collection.update_one(
-            {"_id": ObjectId(trivia_id)},
-            {"$set": {"joined_users": joined_users}}
-        )
+    # Añade al usuario a `joined_users` de forma atómica, así dos uniones simultaneas no se pisan ni
+    # descuentan dos veces al mismo usuario de "pending_joins"
+    updated_trivia = await trivia_collection.find_one_and_update(
+        {"_id": ObjectId(trivia_id), "status": "waiting_start", "joined_users": {"$ne": user_id}},
+        {"$addToSet": {"joined_users": user_id}, "$inc": {"pending_joins": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_trivia:
+        raise HTTPException(status_code=400, detail="No se puede unir a esta trivia porque ya no esta en espera.")
+
+    # Si todos los invitados ya se unieron, la Trivia puede iniciar
+    if updated_trivia["pending_joins"] <= 0:
+        await event_bus.publish(TRIVIA_READY_EVENT, str(updated_trivia["_id"]))
 
-    trivia["joined_users"] = joined_users
-    return TriviaProtected(id=str(trivia["_id"]), **trivia)
+    return TriviaProtected(id=str(updated_trivia["_id"]), **updated_trivia)
 
 
-async def leave_trivia(trivia_id: str, user_email: str) -> str:
+async def leave_trivia(trivia_id: str, current_user: dict) -> str:
     """
     Permite a un usuario retirarse de una Trivia donde se haya unido.
 
@@ -140,25 +237,25 @@ async def leave_trivia(trivia_id: str, user_email: str) -> str:
     En caso contrario, el usuario no se puede retirar y debe esperar que la Trivia donde participa termine.
     """
 
-    # Buscar el usuario por correo electrónico
-    user = await get_user_by_email(user_email)
-    user_id = user.id
+    # ID del usuario autenticado
+    user_id = await get_user_id(current_user)
 
     # Buscar la trivia por ID
-    trivia = await get_trivia(trivia_id)
+    trivia = await get_trivia(trivia_id, projection=user_projection(user_id))
 
     # Verificar si el usuario ha aceptado la invitación a la Trivia
-    if user_id not in trivia["joined_users"]:
+    if user_id not in trivia.get("joined_users", []):
         raise HTTPException(status_code=400, detail="El usuario no está unido a esta trivia")
 
     # Verificar si el estado de la trivia permite la acción
     if trivia["status"] != "waiting_start":
         raise HTTPException(status_code=400, detail="Solo puedes salir de trivias con estado 'waiting_start'")
 
-    # Remueve al usuario de la Trivia
+    # Remueve al usuario de la Trivia, que vuelve a esperar su unión
     updated_trivia = await trivia_collection.find_one_and_update(
-        {"_id": ObjectId(trivia_id)},
-        {"$pull": {"joined_users": user_id}}
+        {"_id": ObjectId(trivia_id), "status": "waiting_start", "joined_users": user_id},
+        {"$pull": {"joined_users": user_id}, "$inc": {"pending_joins": 1}},
+        projection={"_id": 1}
     )
 
     if not updated_trivia:
@@ -167,172 +264,438 @@ async def leave_trivia(trivia_id: str, user_email: str) -> str:
     return str(updated_trivia["_id"])
 
 
-async def get_trivia_details(trivia_id: str, user_email: str) -> Union[TriviaInDB, TriviaProtected]:
+async def get_trivia_details(trivia_id: str, current_user: dict) -> Union[TriviaInDB, TriviaProtected]:
     """
     Retorna el detalle de una Trivia con la información de todas sus rondas (si es que existen).
+    Las respuestas y puntajes de cada ronda se leen de la colección de respuestas, con una agregación.
 
     Si el usuario no es admin, la función se asegura de ocultar información sensible, durante la progresión
     de una ronda, para evitar trampas.
     """
 
-    # Buscar el usuario por correo electrónico
-    user = await get_user_by_email(user_email)
-    user_id = user.id
+    # ID del usuario autenticado
+    user_id = await get_user_id(current_user)
 
-    # Buscar la trivia por ID
-    trivia = await get_trivia(trivia_id)
+    # Buscar la trivia por ID, sin el mazo de preguntas ("deck"), que es interno del motor de rondas
+    trivia = await get_trivia(trivia_id, projection={"deck": 0})
 
     # Si no es admin, verificar si el usuario es parte de la Trivia
-    if user.role != 'admin' and user_id not in trivia["user_ids_invitations"]:
+    if current_user["role"] != 'admin' and user_id not in trivia["user_ids_invitations"]:
         raise HTTPException(status_code=403, detail="El usuario no está incluido en esta trivia")
 
+    # Agrega a cada ronda sus respuestas y, si ya cerró, el puntaje de cada jugador
+    responses_by_round = await get_trivia_responses(trivia_id)
+    for round_item in trivia.get("rounds", []):
+        round_item["responses"] = responses_by_round.get(round_item["id"], [])
+        if "correct_answer" in round_item:
+            round_item["round_score"] = build_round_score(round_item["responses"], trivia["user_ids_invitations"])
+
     # Verifica la cantidad de información a retornar dependiendo del rol del usuario
-    if user.role == "player":
+    if current_user["role"] == "player":
         for round_item in trivia.get("rounds", []):
-            if "round_score" not in round_item:
-                for response in round_item.get("responses", []):
+            if "correct_answer" not in round_item:
+                for response in round_item["responses"]:
                     if response["user_id"] != user_id:
                         response["answer_index"] = -1
         return TriviaProtected(id=str(trivia["_id"]), **trivia)
 
     return TriviaInDB(id=str(trivia["_id"]), **trivia)
 
-async def get_question_for_trivia(trivia_id: str, user_email: str) -> DisplayedQuestion:
+async def get_trivia_responses(trivia_id: str) -> dict:
+    """
+    Retorna las respuestas de una Trivia agrupadas por ronda (ID de la pregunta), en orden de envío
+    """
+    groups = answers_collection.aggregate([
+        {"$match": {"trivia_id": trivia_id}},
+        {"$sort": {"submitted_at": 1}},
+        {"$group": {
+            "_id": "$round_id",
+            "responses": {"$push": {
+                "user_id": "$user_id",
+                "answer_index": "$answer_index",
+                "submitted_at": "$submitted_at",
+                "score": "$score"
+            }}
+        }}
+    ])
+    return {group["_id"]: group["responses"] async for group in groups}
+
+def build_round_score(responses: List[dict], user_ids: List[str]) -> List[dict]:
+    """
+    Puntaje de cada jugador en una ronda cerrada. Los jugadores que no respondieron tienen 0 puntos.
+    """
+    round_score = [{"user_id": response["user_id"], "score": response.get("score", 0)} for response in responses]
+    responded_user_ids = {response["user_id"] for response in responses}
+    round_score += [{"user_id": user_id, "score": 0} for user_id in user_ids if user_id not in responded_user_ids]
+    return round_score
+
+async def get_active_question(trivia_id: str, current_user: dict) -> Tuple[dict, str]:
     """
-    Retorna la Pregunta de la ronda activa de una Trivia que debe ser desplegada al usuario.
+    Valida que el usuario pueda ver la pregunta activa de la Trivia y retorna la entrada del cache de la
+    ronda activa junto al ID del usuario.
 
-    El retorno incluye diversa meta-data de la partida de Trivia (numero ronda, tiempo restante...)
     El sistema identifica la pregunta "activa" de una Trivia, validando que ronda aun no
-    tiene el campo "round_score" (el cual solo se crea una vez la ronda ha terminado y se han
+    tiene el campo "correct_answer" (el cual solo se crea una vez la ronda ha terminado y se han
     calculado los puntos respectivos)
+
+    La ronda activa se obtiene del ActiveRoundCache, así las consultas de todos los jugadores
+    de una Trivia no leen la Trivia en cada consulta.
     """
 
-    # Buscar el usuario por correo electrónico
-    user = await get_user_by_email(user_email)
-    user_id = user.id
+    # ID del usuario autenticado
+    user_id = await get_user_id(current_user)
 
-    # Buscar la trivia por ID
-    trivia = await get_trivia(trivia_id)
+    # Buscar la ronda activa de la Trivia en el cache
+    active_round = await round_cache.get(trivia_id, load_active_round)
 
     # Si no es admin, verificar si el usuario es parte de la Trivia
-    if user.role != 'admin' and user_id not in trivia["user_ids_invitations"]:
+    if current_user["role"] != 'admin' and user_id not in active_round["user_ids_invitations"]:
         raise HTTPException(status_code=403, detail="El usuario no está incluido en esta Trivia")
 
     # Verificar si el estado de la trivia permite la acción
-    if trivia["status"] != "playing":
+    if active_round["status"] != "playing":
         raise HTTPException(status_code=400, detail="Esta Trivia no esta activa")
 
-    # La pregunta que corresponde mostrar al usuario es aquella que aun no tiene aun el campo "round_score"
-    active_question = next((q for q in trivia["rounds"] if "round_score" not in q), None)
-    if not active_question:
+    # La pregunta que corresponde mostrar al usuario es aquella que aun no tiene aun el campo "correct_answer"
+    if active_round["question"] is None:
         raise HTTPException(status_code=400, detail="No hay una pregunta activa en esta Trivia")
 
-    # Antepone numero en el texto de la pregunta
-    for pa_i in range(len(active_question["possible_answers"])):
-        active_question["possible_answers"][pa_i] = f"{pa_i + 1}) {active_question['possible_answers'][pa_i]}"
+    return active_round, user_id
+
+def render_question(active_round: dict) -> bytes:
+    """
+    Valida y serializa una vez la parte de la pregunta activa que es igual para todos los jugadores.
+    Retorna el JSON de un DisplayedQuestion sin "remaining_time" ni "answered" y sin la llave de cierre,
+    para que "question_response" agregue esos dos campos en cada consulta.
+    """
+    question = DisplayedQuestion(
+        remaining_time=0,
+        answered=QUESTION_STATUS[1],
+        total_rounds=active_round["total_rounds"],
+        **active_round["question"]
+    )
+    return question.model_dump_json(exclude={"remaining_time", "answered"}).encode()[:-1]
 
+def question_response(active_round: dict, user_id: str) -> Response:
+    """
+    Arma la respuesta con la pregunta activa para el usuario, agregando a la pregunta ya serializada de la
+    ronda los campos que dependen del usuario y del momento de la consulta
+    """
     # Verificar si el usuario ya respondió la pregunta
-    answered_status = QUESTION_STATUS[1]
-    for response in active_question.get("responses", []):
-        if response["user_id"] == user_id:
-            answered_status = QUESTION_STATUS[0]
-            break
+    if user_id in active_round["answered"]:
+        answered_status = QUESTION_STATUS[0]
+    else:
+        answered_status = QUESTION_STATUS[1]
 
     # Calculamos el tiempo restante de la ronda
     current_time = int(time.time())
-    round_endtime_timestamp = active_question["round_endtime"].timestamp()
-    remaining_time = round(max(0, round_endtime_timestamp - current_time))
-
-    return DisplayedQuestion(
-        remaining_time=remaining_time,
-        answered=answered_status,
-        total_rounds=trivia["total_rounds"],
-        **active_question
+    remaining_time = round(max(0, active_round["round_endtime"] - current_time))
+
+    # La primera consulta de la entrada serializa la pregunta, el resto la reutiliza
+    rendered_question = active_round.get("rendered_question")
+    if rendered_question is None:
+        rendered_question = active_round["rendered_question"] = render_question(active_round)
+
+    user_fields = f',"remaining_time":{remaining_time},"answered":{json.dumps(answered_status)}}}'
+    return Response(
+        content=rendered_question + user_fields.encode(),
+        media_type="application/json"
     )
 
-async def submit_answer(trivia_id: str, question_id: str, answer_index: int, user_email: str) -> str:
+async def get_question_for_trivia(trivia_id: str, current_user: dict) -> Response:
+    """
+    Retorna la Pregunta de la ronda activa de una Trivia que debe ser desplegada al usuario (un DisplayedQuestion).
+
+    El retorno incluye diversa meta-data de la partida de Trivia (numero ronda, tiempo restante...)
+    La pregunta se valida y serializa en la primera consulta de cada entrada del cache (ver "render_question"),
+    y en cada consulta solo se agregan el tiempo restante y si el usuario ya respondió.
+    """
+    active_round, user_id = await get_active_question(trivia_id, current_user)
+    return question_response(active_round, user_id)
+
+async def wait_question_for_trivia(trivia_id: str, current_user: dict, wait_for_round: int) -> Response:
+    """
+    Versión "long-poll" de get_question_for_trivia: si la ronda activa es anterior a "wait_for_round", la consulta
+    espera (sin leer la DB) hasta que el Broadcaster publique la apertura de esa ronda, el termino de la Trivia
+    o se cumplan LONG_POLL_TIMEOUT_SEC. Luego retorna la pregunta activa, como get_question_for_trivia.
+    """
+    try:
+        active_round, user_id = await get_active_question(trivia_id, current_user)
+        if active_round["round_count"] >= wait_for_round:
+            return question_response(active_round, user_id)
+    except HTTPException as e:
+        # Una Trivia sin ronda activa (aun no inicia o esta entre rondas) también puede esperar
+        if e.status_code != 400:
+            raise
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LONG_POLL_TIMEOUT_SEC
+    queue = broadcaster.subscribe(trivia_id, poll_trivia_events)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if event["event"] == "trivia_ended":
+                break
+            if event["event"] == "round_opened" and event["data"]["round_count"] >= wait_for_round:
+                break
+    finally:
+        broadcaster.unsubscribe(trivia_id, queue)
+
+    return await get_question_for_trivia(trivia_id, current_user)
+
+async def load_active_round(trivia_id: str) -> dict:
+    """
+    Lee desde la DB la ronda activa de una Trivia (solo la ultima ronda) y los jugadores que ya la respondieron,
+    y arma su entrada para el cache
+    """
+    trivia = await trivia_collection.find_one(
+        {"_id": ObjectId(trivia_id)},
+        ACTIVE_ROUND_PROJECTION
+    )
+    if not trivia:
+        raise HTTPException(status_code=404, detail="Trivia no encontrada")
+
+    # Solo se leen los IDs de los jugadores, que están en el indice de la colección de respuestas
+    answered = set()
+    rounds = trivia.get("rounds") or []
+    if trivia["status"] == "playing" and rounds and "correct_answer" not in rounds[-1]:
+        answers = answers_collection.find(
+            {"trivia_id": trivia_id, "round_id": rounds[-1]["id"]},
+            {"_id": 0, "user_id": 1}
+        )
+        answered = {answer["user_id"] async for answer in answers}
+    return build_entry(trivia, answered)
+
+async def submit_answer(trivia_id: str, question_id: str, answer_index: int, current_user: dict) -> str:
     """
     Registra la respuesta del usuario, ante una determinada pregunta de una ronda.
 
     La respuesta solo es aceptada si esta dentro del rango de tiempo valido de la ronda.
     El usuario no pueda cambiar su respuesta una vez registrada una.
     El sistema identifica la pregunta "activa" de una Trivia, validando que ronda aun no
-    tiene el campo "round_score" (el cual solo se crea una vez la ronda ha terminado y se han
+    tiene el campo "correct_answer" (el cual solo se crea una vez la ronda ha terminado y se han
     calculado los puntos respectivos)
+
+    Las validaciones se hacen sobre la ronda activa del ActiveRoundCache y la respuesta se guarda en la
+    colección de respuestas, con una sola escritura que no toca la Trivia. El indice único
+    (trivia_id, round_id, user_id) impide que dos respuestas simultaneas del mismo usuario sean aceptadas.
+    Con ANSWER_BUFFER_ENABLED la respuesta se agrega al AnswerBuffer, que la escribe junto a las demás
+    respuestas recibidas en el mismo intervalo; la respuesta solo se confirma una vez escrita.
+    Si la escritura termina cerca del termino de la ronda, su cierre (quizás en otro proceso) pudo no verla,
+    por lo que se puntúa aquí si la ronda ya fue cerrada (ver "score_late_answers").
+
+    Cada respuesta escrita se suma al contador de la ronda (con el AnswerBuffer, una vez por escritura). Si con
+    ella todos los jugadores de la Trivia ya respondieron, se adelanta el cierre de la ronda para pasar de
+    inmediato a la siguiente pregunta, aunque la Trivia este a cargo de otro proceso (ver "count_round_answers").
     """
 
-    # Verificar que el usuario exista
-    user = await get_user_by_email(user_email)
-    user_id = user.id
+    # ID del usuario autenticado
+    user_id = await get_user_id(current_user)
+
+    # Validar la respuesta contra la ronda activa de la Trivia
+    active_round = await round_cache.get(trivia_id, load_active_round)
+    check_answer(active_round, question_id, answer_index, user_id)
+
+    # Guarda respuesta
+    round_count = active_round["round_count"]
+    answer = {
+        "trivia_id": trivia_id,
+        "round_id": question_id,
+        "round_count": round_count,
+        "user_id": user_id,
+        "answer_index": answer_index,
+        "submitted_at": datetime.utcnow()
+    }
+    try:
+        if ANSWER_BUFFER_ENABLED:
+            await answer_buffer.add(answer, active_round["round_endtime"])
+        else:
+            await answers_collection.insert_one(answer)
+            if time.time() >= active_round["round_endtime"] - LATE_ANSWER_MARGIN_SEC:
+                await score_late_answers(trivia_id, round_count, [user_id])
+            await count_round_answers(trivia_id, round_count, 1)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="El usuario ya respondió esta pregunta,\
+             no puedes cambiar tu respuesta")
+    ANSWERS_ACCEPTED.inc()
+    round_cache.add_answer(trivia_id, round_count, user_id)
 
-    # Verificar que la trivia exista
-    trivia = await get_trivia(trivia_id)
+    return str(answer_index)
+
+def check_answer(active_round: dict, question_id: str, answer_index: int, user_id: str) -> None:
+    """
+    Valida una respuesta contra la ronda activa de la Trivia (entrada del ActiveRoundCache).
+    Levanta la HTTPException correspondiente a la primera validación que falle.
+    """
 
     # Verificar que el usuario esté en la trivia
-    if user_id not in trivia["user_ids_invitations"]:
+    if user_id not in active_round["user_ids_invitations"]:
         raise HTTPException(status_code=403, detail="El usuario no está incluido en esta Trivia")
 
     # Verificar si el estado de la trivia permite la acción
-    if trivia["status"] != "playing":
+    if active_round["status"] != "playing":
         raise HTTPException(status_code=400, detail="Esta Trivia no está activa")
 
     # Verificar que la pregunta exista y sea la activa
-    question = next((q for q in trivia["rounds"] if q["id"] == question_id and "round_score" not in q), None)
-    if not question:
+    question = active_round["question"]
+    if question is None or question["id"] != question_id:
         raise HTTPException(status_code=404, detail="La pregunta no existe o ya ha finalizado")
 
     # Verificar que la respuesta esté dentro del tiempo permitido
-    current_time = datetime.utcnow()
-    if current_time >= question["round_endtime"]:
+    if time.time() >= active_round["round_endtime"]:
         raise HTTPException(status_code=400, detail="El tiempo para responder esta pregunta ha expirado")
 
     # Validar si el usuario ya respondió esta pregunta
-    existing_response = next((resp for resp in question.get("responses", []) if resp["user_id"] == user_id), None)
-    if existing_response:
+    if user_id in active_round["answered"]:
         raise HTTPException(status_code=400, detail="El usuario ya respondió esta pregunta,\
              no puedes cambiar tu respuesta")
 
     # Validar que answer_index esté dentro del rango permitido
-    possible_answers = question.get("possible_answers", [])
+    possible_answers = question["possible_answers"]
     if not (0 < answer_index <= len(possible_answers)):
         raise HTTPException(
             status_code=400,
             detail=f"El índice de respuesta debe estar entre 1 y {len(possible_answers)}"
         )
 
-    # Guarda respuesta
-    response_data = {
-        "user_id": user_id,
-        "answer_index": answer_index,
-        "submitted_at": current_time
-    }
-    result = await trivia_collection.update_one(
-        {"_id": ObjectId(trivia_id), "rounds.id": question_id},
-        {"$push": {"rounds.$.responses": response_data}}
-    )
-    if result.modified_count == 0:
-        raise HTTPException(status_code=400, detail="No se pudo registrar la respuesta")
-
-    return str(answer_index)
-
 
 async def get_trivia_ranking(trivia_id: str) -> List[UserRanking]:
     """
     Retorna el Ranking de los jugadores de una Trivia
+
+    El orden y el nombre de cada jugador se obtienen con una sola agregación sobre "final_score".
     """
 
-    trivia = await get_trivia(trivia_id)
-    if trivia is None:
-        raise HTTPException(status_code=404, detail="Trivia no encontrada.")
+    trivia = await get_trivia(trivia_id, projection={"status": 1})
     if trivia["status"] != "ended":
         raise HTTPException(status_code=400, detail="Esta Trivia no está finalizada")
 
-    ranking = sorted(trivia["final_score"], key=lambda x: x['score'], reverse=True)
+    ranking = trivia_collection.aggregate([
+        {"$match": {"_id": ObjectId(trivia_id)}},
+        {"$unwind": "$final_score"},
+        {"$replaceRoot": {"newRoot": "$final_score"}},
+        {"$sort": {"score": -1}},
+        {"$lookup": {
+            "from": "users",
+            "let": {"user_id": {"$toObjectId": "$user_id"}},
+            "pipeline": [{"$match": {"$expr": {"$eq": ["$_id", "$$user_id"]}}}, {"$project": {"name": 1}}],
+            "as": "user"
+        }},
+        {"$project": {"_id": 0, "score": 1, "name": {"$first": "$user.name"}}}
+    ])
     players_details = []
-    position = 1
-    for score in ranking:
-        user = await users_collection.find_one({"_id": ObjectId(score["user_id"])})
-        players_details.append(UserRanking(position=position, name=user["name"], final_score=int(score["score"])))
-        position += 1
-
+    async for score in ranking:
+        players_details.append(
+            UserRanking(position=len(players_details) + 1, name=score["name"], final_score=int(score["score"]))
+        )
     return players_details
+
+def round_opened_event(round_data: dict, total_rounds: int) -> dict:
+    return {
+        "event": "round_opened",
+        "data": {
+            "id": round_data["id"],
+            "question": round_data["question"],
+            "possible_answers": [
+                f"{index}) {answer}" for index, answer in enumerate(round_data["possible_answers"], start=1)
+            ],
+            "difficulty": round_data["difficulty"],
+            "round_count": round_data["round_count"],
+            "total_rounds": total_rounds,
+            "round_endtime": round_data["round_endtime"].isoformat() + "Z",
+        }
+    }
+
+def round_closed_event(round_data: dict, round_score: List[dict]) -> dict:
+    return {
+        "event": "round_closed",
+        "data": {
+            "id": round_data["id"],
+            "round_count": round_data["round_count"],
+            "correct_answer": round_data.get("correct_answer"),
+            "round_score": round_score,
+        }
+    }
+
+def trivia_ended_event(trivia: dict) -> dict:
+    return {"event": "trivia_ended", "data": {"final_score": trivia.get("final_score", [])}, "final": True}
+
+async def poll_trivia_events(trivia_id: str, state: Optional[dict]) -> Tuple[List[dict], dict, List[dict]]:
+    """
+    Función "poll" del Broadcaster para los eventos de una Trivia
+
+    Con una sola lectura (las dos ultimas rondas) compara la Trivia con el estado anterior ("state": ultima ronda
+    abierta y ultima ronda cerrada) y genera los eventos "round_opened", "round_closed" (con "correct_answer" y
+    "round_score") y "trivia_ended". En la primera lectura solo se generan los eventos del estado actual.
+    El "round_score" de los eventos se lee de la colección de respuestas e incluye solo a los jugadores que
+    respondieron.
+    """
+    trivia = await trivia_collection.find_one({"_id": ObjectId(trivia_id)}, TRIVIA_EVENTS_PROJECTION)
+    if not trivia:
+        trivia = {"status": "ended", "rounds": []}
+    rounds = trivia.get("rounds", [])
+
+    snapshot = []
+    if trivia["status"] == "ended":
+        snapshot = [trivia_ended_event(trivia)]
+    elif trivia["status"] == "playing" and rounds and "correct_answer" not in rounds[-1]:
+        snapshot = [round_opened_event(rounds[-1], trivia["total_rounds"])]
+
+    previous = state or {"opened": 0, "closed": 0}
+    new_state = {
+        "opened": max([previous["opened"]] + [round_data["round_count"] for round_data in rounds]),
+        "closed": max([previous["closed"]] + [
+            round_data["round_count"] for round_data in rounds if "correct_answer" in round_data
+        ])
+    }
+    if state is None:
+        return snapshot, new_state, snapshot
+    if new_state != state:
+        # La Trivia cambió (ej: en otro proceso): la entrada del cache de este proceso ya no es la ronda activa
+        round_cache.invalidate(trivia_id)
+
+    events = []
+    for round_data in rounds:
+        if round_data["round_count"] > state["opened"] and "correct_answer" not in round_data:
+            events.append(round_opened_event(round_data, trivia["total_rounds"]))
+        if round_data["round_count"] > state["closed"] and "correct_answer" in round_data:
+            answers = answers_collection.find(
+                {"trivia_id": trivia_id, "round_id": round_data["id"]},
+                {"_id": 0, "user_id": 1, "score": 1}
+            )
+            round_score = [{"user_id": answer["user_id"], "score": answer.get("score", 0)} async for answer in answers]
+            events.append(round_closed_event(round_data, round_score))
+    if trivia["status"] == "ended":
+        events.append(trivia_ended_event(trivia))
+    return events, new_state, snapshot
+
+async def subscribe_trivia_events(trivia_id: str, current_user: dict) -> AsyncIterator[str]:
+    """
+    Valida que el usuario participe de la Trivia y retorna el stream (Server-Sent Events) de sus eventos
+
+    Todos los clientes conectados a una misma Trivia comparten una sola lectura por evento, a través del Broadcaster.
+    """
+    user_id = await get_user_id(current_user)
+    trivia = await get_trivia(trivia_id, projection=user_projection(user_id))
+    if current_user["role"] != "admin" and user_id not in trivia.get("user_ids_invitations", []):
+        raise HTTPException(status_code=403, detail="El usuario no está incluido en esta Trivia")
+    return trivia_event_stream(trivia_id)
+
+async def trivia_event_stream(trivia_id: str) -> AsyncIterator[str]:
+    queue = broadcaster.subscribe(trivia_id, poll_trivia_events)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                # Comentario SSE para mantener abierta la conexión a través de proxies
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            if event.get("final"):
+                return
+    finally:
+        broadcaster.unsubscribe(trivia_id, queue)
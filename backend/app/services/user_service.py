@@ -1,19 +1,28 @@
-from typing import Union, List
+from typing import AsyncIterator, Optional, Tuple, Union, List
 from bcrypt import gensalt, hashpw
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from motor.motor_asyncio import AsyncIOMotorCollection
 from app.models.user import UserCreate, UserResponseInDB, UserFull
 from app.core.config import db
+from app.core.cache import LRUCache
+from app.core.constants import USER_CACHE_SIZE, USER_CACHE_TTL_SEC, PAGE_SIZE
+from app.core.pagination import find_page, stream_ndjson
 from app.models.trivia import TriviaStatus
 
 users_collection: AsyncIOMotorCollection = db["users"]
 trivia_collection: AsyncIOMotorCollection = db["trivias"]
 
+# Usuarios recientemente consultados, por email. Los usuarios no se modifican una vez creados, por lo que basta
+# con invalidar el email al crear un usuario; el TTL acota lo que otro proceso podría ver desactualizado.
+user_cache = LRUCache(USER_CACHE_SIZE, USER_CACHE_TTL_SEC)
+
 async def create_user(user: UserCreate) -> UserResponseInDB:
     """
     Crea un usuario
 
-    El email debe ser único
+    El email debe ser único. La consulta previa entrega el error habitual y el indice único de "email" rechaza
+    el registro si otro request creó el mismo email entre la consulta y la inserción.
     Dado el contexto del proyecto, la función permite crear usuarios con rol
     'player' y 'admin' sin restricciones.
     """
@@ -26,7 +35,11 @@ async def create_user(user: UserCreate) -> UserResponseInDB:
     hashed_password = hashpw(user.password.encode("utf-8"), salt)
     user_dict["password"] = hashed_password.decode("utf-8")
     user_dict["role"] = user_dict.get("role", "player")
-    result = await users_collection.insert_one(user_dict)
+    try:
+        result = await users_collection.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="El email ya esta en uso")
+    user_cache.invalidate(user.email)
     return UserResponseInDB(id=str(result.inserted_id), **user.dict(exclude={"password"}))
 
 async def get_user_by_email(email: str, http=True, full=False) -> Union[bool, UserFull, UserResponseInDB]:
@@ -35,9 +48,14 @@ async def get_user_by_email(email: str, http=True, full=False) -> Union[bool, Us
 
     Con "http=False" retornamos un False, en vez de una HTTPException, en caso de no encontrar el Usuario
     Con "full=True" retorna el hash de la password
+    Los usuarios encontrados se guardan en "user_cache"
     """
 
-    user = await users_collection.find_one({"email": email})
+    user = user_cache.get(email)
+    if user is None:
+        user = await users_collection.find_one({"email": email})
+        if user:
+            user_cache.set(email, user)
     if not user:
         if http is True:
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -46,15 +64,41 @@ async def get_user_by_email(email: str, http=True, full=False) -> Union[bool, Us
         return UserFull(id=str(user["_id"]), **user)
     return UserResponseInDB(id=str(user["_id"]), **user)
 
-async def get_all_users() -> List[UserResponseInDB]:
+async def get_user_id(current_user: dict) -> str:
     """
-    Retorna todos los usuarios
+    Retorna la ID del usuario autenticado
+
+    Los JWT emitidos por /login incluyen la ID del usuario, así no es necesario buscarlo en la DB.
+    Para JWT anteriores (sin ID) se busca el usuario por su email.
     """
+    if current_user.get("id"):
+        return current_user["id"]
+    user = await get_user_by_email(current_user["email"])
+    return user.id
+
+# Los listados de usuarios no leen el hash de la password
+USER_LIST_PROJECTION = {"password": 0}
+
+def user_from_db(user: dict) -> UserResponseInDB:
+    return UserResponseInDB(id=str(user["_id"]), **user)
 
-    users = await users_collection.find().to_list(100)
-    return [UserResponseInDB(id=str(user["_id"]), **user) for user in users]
+async def get_all_users(
+    limit: int = PAGE_SIZE, after: Optional[str] = None
+) -> Tuple[List[UserResponseInDB], Optional[str]]:
+    """
+    Retorna una página de usuarios, ordenados por ID, a partir del cursor "after"
+    Retorna los usuarios y el cursor de la siguiente página (None si no hay mas usuarios)
+    """
+    users, next_cursor = await find_page(users_collection, {}, USER_LIST_PROJECTION, limit, after)
+    return [user_from_db(user) for user in users], next_cursor
+
+def stream_all_users(after: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Retorna todos los usuarios a partir del cursor "after", como NDJSON, sin cargarlos todos en memoria
+    """
+    return stream_ndjson(users_collection, {}, USER_LIST_PROJECTION, user_from_db, after)
 
-async def get_trivias_invitations_for_user(user_email: str) -> List[str]:
+async def get_trivias_invitations_for_user(current_user: dict) -> List[str]:
     """
     Retorna una lista de IDs de Trivias donde el usuario esta invitado
 
@@ -62,25 +106,19 @@ async def get_trivias_invitations_for_user(user_email: str) -> List[str]:
     se valida que el status de la Trivia sea "waiting_start".
     """
 
-    user = await get_user_by_email(user_email, False)
-    if user is False:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    user_id = user.id
+    user_id = await get_user_id(current_user)
     query = {"user_ids_invitations": user_id, "status": "waiting_start"}
     trivias = await trivia_collection.find(query).to_list(100)
     return [str(trivia["_id"]) for trivia in trivias]
 
-async def get_trivia_joined(user_email: str) -> Union[bool, TriviaStatus]:
+async def get_trivia_joined(current_user: dict) -> Union[bool, TriviaStatus]:
     """
     Retorna la ID de la Trivia donde el usuario ha aceptado una invitación.
 
     Ignora Trivias que ya han concluido y tienen un status "ended".
     """
 
-    user = await get_user_by_email(user_email, False)
-    if user is False:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    user_id = user.id
+    user_id = await get_user_id(current_user)
 
     trivia = await trivia_collection.find_one(
         {"joined_users": user_id, "status": {"$ne": "ended"}}
@@ -89,15 +127,12 @@ async def get_trivia_joined(user_email: str) -> Union[bool, TriviaStatus]:
         return TriviaStatus(trivia_id=str(trivia["_id"]), status=trivia["status"])
     return False
 
-async def get_trivias_played_by_user(user_email: str) -> List[str]:
+async def get_trivias_played_by_user(current_user: dict) -> List[str]:
     """
     Retorna una lista de IDs de Trivias donde el usuario haya participado
     """
 
-    user = await get_user_by_email(user_email, False)
-    if user is False:
-        raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    user_id = user.id
+    user_id = await get_user_id(current_user)
     trivias = await trivia_collection.find({
         "user_ids_invitations": user_id,
         "status": "ended"
@@ -1,176 +1,302 @@
-import asyncio
 from datetime import datetime, timedelta
 from app.core.task_manager import TaskManager
+from app.core.scheduler import RoundScheduler, utc_timestamp
+from app.core.leases import LeaseManager
+from app.core.round_cache import ActiveRoundCache
+from app.core.broadcaster import Broadcaster
+from app.core.answer_buffer import AnswerBuffer
+from app.core.constants import ANSWER_BUFFER_ENABLED
+from app.core.scoring import score_answers
+from app.core.metrics import ACTIVE_PLAYERS, ACTIVE_TRIVIAS, ROUNDS_CLOSED, ROUNDS_OPENED, ROUND_SCORING_DURATION
 from motor.motor_asyncio import AsyncIOMotorCollection
 from app.core.config import db
 from bson import ObjectId
-from app.services.question_service import get_question
-from app.services.trivia_service import get_trivia
-from typing import Union
+from typing import Dict, List
 from random import shuffle
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 task_manager = TaskManager()
+round_scheduler = RoundScheduler()
+lease_manager = LeaseManager()
+round_cache = ActiveRoundCache()
+broadcaster = Broadcaster()
+answer_buffer = AnswerBuffer()
 trivia_collection: AsyncIOMotorCollection = db["trivias"]
+questions_collection: AsyncIOMotorCollection = db["questions"]
+scores_collection: AsyncIOMotorCollection = db["scores"]
+
+TRIVIA_LEASE_PREFIX = "trivia:"
+
+ACTIVE_TRIVIAS.set_function(lambda: len(round_scheduler))
+ACTIVE_PLAYERS.set_function(lambda: sum(data.get("players", 0) for data in round_scheduler.pending_data()))
+
+def trivia_lease(trivia_id: str) -> str:
+    """
+    Nombre del lease que asigna una Trivia en juego a un solo proceso
+    """
+    return f"{TRIVIA_LEASE_PREFIX}{trivia_id}"
 
 async def start_trivia(trivia_id: str) -> None:
     """
-    Crea un job para gestionar la 'vida' de una nueva partida de trivia durante su estado de "playing"
-    Cada trivia en estado "playing" esta gestionada por un job independiente que se encarga de 
-    manejar los tiempos de cada ronda, las preguntas, respuestas, la asignación de puntos y el termino de la trivia.
+    Inicia la 'vida' de una nueva partida de trivia durante su estado de "playing"
+    Se arma el mazo de rondas (deck) y se agenda de inmediato la apertura de la primera ronda en el RoundScheduler,
+    que se encarga de cerrar cada ronda a tiempo, abrir la siguiente, asignar los puntos y terminar la trivia.
+
+    El cambio de estado solo se aplica si la Trivia sigue en "waiting_start", por lo que la función
+    puede ser llamada tanto por el evento de unión como por el ciclo de revisión sin iniciar dos veces la Trivia.
+    El estado y el mazo se guardan en la misma escritura, y desde ahí el RoundScheduler reintenta cualquier
+    falla. El proceso que inicia la Trivia toma su lease y queda a cargo de sus rondas; si el inicio falla, ver
+    "recover_failed_start".
     """
+    if lease_manager.owns(trivia_lease(trivia_id)):
+        # Ya fue iniciada por este proceso (ej: por el evento de unión y el ciclo de revisión a la vez)
+        return
+    started = False
     try:
-        result = await trivia_collection.update_one(
-            {"_id": ObjectId(trivia_id)},
-            {"$set": {"status": "playing"}}
+        if not await lease_manager.acquire(trivia_lease(trivia_id)):
+            logger.info("La Trivia %s esta a cargo de otro proceso", trivia_id)
+            return
+        trivia = await trivia_collection.find_one(
+            {"_id": ObjectId(trivia_id), "status": "waiting_start"},
+            {"question_ids": 1, "round_time_sec": 1, "joined_users": 1}
         )
-        if result.modified_count == 0:
-            print(f"Error al iniciar la Trivia {trivia_id}", flush=True)
+        if trivia:
+            deck = await build_deck(trivia["question_ids"])
+            result = await trivia_collection.update_one(
+                {"_id": ObjectId(trivia_id), "status": "waiting_start"},
+                {"$set": {"status": "playing", "deck": deck}}
+            )
+        if not trivia or not result.modified_count:
+            await lease_manager.release(trivia_lease(trivia_id))
+            logger.info("La Trivia %s ya fue iniciada o no existe", trivia_id)
             return
-        await task_manager.start_task(f"trivia_worker_{trivia_id}", trivia_worker, trivia_id)
-        print(f"Trivia {trivia_id} iniciada correctamente", flush=True)
+        started = True
+        data = {
+            "round_time_sec": trivia["round_time_sec"],
+            "total_rounds": len(deck),
+            "players": len(trivia.get("joined_users", []))
+        }
+        round_scheduler.schedule(trivia_id, time.time(), 0, data)
+        logger.info("Trivia %s iniciada correctamente", trivia_id)
+    except Exception as e:
+        logger.error("Error al iniciar la trivia %s: %s", trivia_id, e)
+        await recover_failed_start(trivia_id, started)
+
+async def recover_failed_start(trivia_id: str, started: bool) -> None:
+    """
+    Deja una Trivia cuyo inicio falló lista para volver a iniciarse:
+    - Si alcanzó a quedar en "playing" (sin rondas abiertas), vuelve a "waiting_start" sin mazo.
+    - Se libera su lease, así el ciclo de revisión la vuelve a iniciar (en cualquier proceso).
+    Si no se puede volver atrás (ej: la DB no responde o ya se abrió una ronda), el lease se marca como expirado
+    y el heartbeat de leases la retoma como una Trivia en juego.
+    """
+    round_scheduler.cancel(trivia_id)
+    try:
+        if started:
+            result = await trivia_collection.update_one(
+                {"_id": ObjectId(trivia_id), "status": "playing", "rounds.0": {"$exists": False}},
+                {"$set": {"status": "waiting_start"}, "$unset": {"deck": ""}}
+            )
+            if not result.modified_count:
+                await lease_manager.expire([trivia_lease(trivia_id)])
+                return
+        await lease_manager.release(trivia_lease(trivia_id))
     except Exception as e:
-        print(f"Error al iniciar la trivia {trivia_id}: {e}", flush=True)
+        logger.error("Error al recuperar el inicio fallido de la trivia %s: %s", trivia_id, e)
+        await lease_manager.expire([trivia_lease(trivia_id)])
+
+async def load_questions(question_ids: List[str]) -> Dict[str, dict]:
+    """
+    Lee las preguntas indicadas con una sola consulta y las retorna por ID
+    """
+    questions = await questions_collection.find(
+        {"_id": {"$in": [ObjectId(question_id) for question_id in question_ids]}}
+    ).to_list(len(question_ids))
+    return {str(question["_id"]): question for question in questions}
+
+def deck_from_questions(question_ids: List[str], questions_by_id: Dict[str, dict]) -> List[dict]:
+    """
+    Arma el mazo de rondas de una Trivia, en el orden de "question_ids", con las preguntas ya leídas.
+    Levanta KeyError si alguna pregunta no existe.
+
+    Cada ronda del mazo tiene sus posibles respuestas (distractores y correcta) ya barajadas y el indice
+    de la respuesta correcta. Solo le falta el tiempo de termino, que se asigna al abrir la ronda.
+    """
+    deck = []
+    for round_count, question_id in enumerate(question_ids, start=1):
+        question = questions_by_id[question_id]
+        possible_answers = question["distractors"] + [question["answer"]]
+        shuffle(possible_answers)
+        deck.append({
+            "id": question_id,
+            "question": question["question"],
+            "possible_answers": possible_answers,
+            "correct_answer_index": possible_answers.index(question["answer"]),
+            "difficulty": question["difficulty"],
+            "round_count": round_count
+        })
+    return deck
 
-async def get_next_question_id(trivia_id: str) -> Union[bool, str]:
+async def build_deck(question_ids: List[str]) -> List[dict]:
     """
-    Dada una trivia que en estado "playing", se retorna la ID de la siguiente pregunta (aun no desplegada)
-    que debe ser mostrada a los jugadores.
-    En caso que todas las preguntas ya fueron utilizadas, retorna False
+    Arma el mazo de rondas de una Trivia, en el orden de "question_ids", con una sola consulta a la DB
     """
-    trivia = await get_trivia(trivia_id, False)
-    question_ids = set(trivia.get("question_ids", []))
-    round_question_ids = set([question['id'] for question in trivia.get("rounds", [])])
-    available_question_ids = list(question_ids - round_question_ids)
-    if not available_question_ids:
-        return False
-    return available_question_ids[0]
+    return deck_from_questions(question_ids, await load_questions(question_ids))
 
-async def set_next_question_in_trivia(trivia, round_count) -> Union[bool, int]:
+async def set_next_question_in_trivia(trivia_id: str, round_count: int, round_time_sec: int, players: int) -> datetime:
     """
-    Prepara y dispone una nueva pregunta para los jugadores de una Trivia
+    Dispone para los jugadores la pregunta de la ronda "round_count", tomándola del mazo de la Trivia
 
-    Se calcula el tiempo limite para responder la pregunta
-    Se combinan y barajan las posibles respuestas (distractores y correcta)
-    Si no quedan mas preguntas para la Trivia, retornamos False
+    Se calcula el tiempo limite para responder la pregunta y se agrega la ronda con una sola escritura
+    (update con pipeline), sin leer la Trivia. Si la ronda ya estaba agregada no se duplica. La ronda guarda
+    la cantidad de jugadores, para cerrarla apenas todos respondan (ver "count_round_answers").
+    Retorna el momento de termino de la ronda.
     """
-    question_id = await get_next_question_id(trivia["_id"])
-    if question_id is False:
-        return False
-    question = await get_question(question_id)
 
     # Calcula en que momento debe terminar esta ronda
-    current_time = datetime.utcnow()
-    round_lapse = int(trivia["round_time_sec"])
-    round_endtime = current_time + timedelta(seconds=round_lapse)
-
-    # Añade la pregunta seleccionada a la ronda de la Trivia
-    round_data = question.dict()
-    possible_answers = round_data["distractors"] + [round_data["answer"]]
-    shuffle(possible_answers)
-    round_data["possible_answers"] = possible_answers
-    round_data["correct_answer_index"] = possible_answers.index(round_data["answer"])
-    round_data["round_endtime"] = round_endtime
-    round_data["round_count"] = round_count
+    round_endtime = datetime.utcnow() + timedelta(seconds=int(round_time_sec))
 
+    # Añade la pregunta del mazo a las rondas de la Trivia
     await trivia_collection.update_one(
-        {"_id": ObjectId(trivia["_id"])},
-        {"$push": {"rounds": round_data}}
+        {"_id": ObjectId(trivia_id), "rounds.round_count": {"$ne": round_count}},
+        [{"$set": {"rounds": {"$concatArrays": [
+            {"$ifNull": ["$rounds", []]},
+            [{"$mergeObjects": [
+                {"$arrayElemAt": ["$deck", round_count - 1]},
+                {"round_endtime": round_endtime, "players": players, "answers": 0}
+            ]}]
+        ]}}}]
     )
 
-    return round_lapse
+    return round_endtime
 
-async def calculate_round_points(trivia_id) -> None:
+async def calculate_round_points(trivia_id: str, round_count: int) -> None:
     """
     Calcula los puntos de cada jugador al finalizar una ronda.
 
-    Solo calcula los puntos de rondas que aun no estén calculadas.
-    Asigna 0 puntos a jugadores que no respondieron.
-    Deja disponible, en texto, la respuesta correcta de la ronda.
-    """
-
-    trivia = await get_trivia(trivia_id, False)
-    all_user_ids = set(trivia.get("user_ids_invitations", []))
-    for round_data in trivia.get("rounds", []):
-        if "round_score" in round_data:
-            continue
-        round_score = []
-
-        correct_answer_index = round_data["correct_answer_index"]
-        difficulty = round_data["difficulty"]
-        responded_user_ids = set()
-        for response in round_data.get("responses", []):
-            user_id = response["user_id"]
-            responded_user_ids.add(user_id)
-            answer_index = response["answer_index"]
-            score = difficulty if (answer_index - 1) == correct_answer_index else 0
-            round_score.append({"user_id": user_id, "score": score})
-
-        # Identificar usuarios que no respondieron y asigna 0 puntos
-        non_responded_user_ids = all_user_ids - responded_user_ids
-        for user_id in non_responded_user_ids:
-            round_score.append({"user_id": user_id, "score": 0})
-
-        # Deja disponible la respuesta correcta (en texto) una vez calculados los puntos de la ronda
-        correct_answer_index = round_data.get("correct_answer_index")
-        possible_answers = round_data.get("possible_answers", [])
-        if correct_answer_index is None or correct_answer_index >= len(possible_answers):
-            raise ValueError(f"Índice de respuesta correcta inválido para el round {round_data['id']}")
-        correct_answer_text = possible_answers[correct_answer_index]
-
-        # Actualiza información de la ronda
-        result = await trivia_collection.update_one(
-            {"_id": ObjectId(trivia_id), "rounds.id": round_data["id"]},
-            {"$set": {"rounds.$.round_score": round_score, "rounds.$.correct_answer": correct_answer_text}}
-        )
-        if result.modified_count == 0:
-            raise ValueError(f"No se pudo actualizar el puntaje para el round {round_data['id']}")
+    Solo se lee la ronda que acaba de terminar. Los puntajes se calculan y guardan en la colección de
+    respuestas con una agregación, así la Trivia no crece con la cantidad de jugadores, y otra agregación
+    los suma al puntaje acumulado de cada jugador (colección "scores"). Luego se deja
+    disponible, en texto, la respuesta correcta, lo que marca la ronda como cerrada. Si la ronda ya estaba
+    cerrada no se hace nada; si el proceso se interrumpe entre ambos pasos, la agregación se puede repetir.
 
-async def calculate_final_points(trivia_id) -> None:
-    """
-    Calcula los puntos finales de cada jugador, dado los puntos de cada ronda.
-    Pasa la Trivia al estado finalizado "ended"
+    Antes de calcular se escriben las respuestas de la ronda que estén en el AnswerBuffer de este proceso, y
+    la ronda se marca como cerrada ("closed"). Las respuestas que otro proceso termine de escribir después de
+    esa marca las puntúa ese mismo proceso (ver "score_late_answers"), así no se espera a sus escrituras.
     """
+    await answer_buffer.flush_round(trivia_id, round_count)
+
+    trivia = await trivia_collection.find_one_and_update(
+        {"_id": ObjectId(trivia_id), "rounds.round_count": round_count},
+        {"$set": {"rounds.$.closed": True}},
+        projection={"rounds": {"$elemMatch": {"round_count": round_count}}}
+    )
+    if not trivia or not trivia.get("rounds"):
+        raise ValueError(f"No existe la ronda {round_count} en la Trivia {trivia_id}")
+    round_data = trivia["rounds"][0]
+    if "correct_answer" in round_data:
+        return
 
-    trivia = await get_trivia(trivia_id, False)
-    final_scores = {}
-    for round_data in trivia.get("rounds", []):
-        for score_entry in round_data.get("round_score", []):
-            user_id = score_entry["user_id"]
-            score = score_entry["score"]
+    # Deja disponible la respuesta correcta (en texto) una vez calculados los puntos de la ronda
+    correct_answer_index = round_data.get("correct_answer_index")
+    possible_answers = round_data.get("possible_answers", [])
+    if correct_answer_index is None or correct_answer_index >= len(possible_answers):
+        raise ValueError(f"Índice de respuesta correcta inválido para el round {round_data['id']}")
+    correct_answer_text = possible_answers[correct_answer_index]
 
-            if user_id in final_scores:
-                final_scores[user_id] += score
-            else:
-                final_scores[user_id] = score
+    # Calcula el puntaje de cada respuesta de la ronda y lo suma al acumulado de cada jugador
+    await score_answers(trivia_id, round_data)
 
-    final_scores_list = [{"user_id": user_id, "score": score} for user_id, score in final_scores.items()]
+    # Cierra la ronda
     await trivia_collection.update_one(
-        {"_id": ObjectId(trivia_id)},
-        {"$set": {"final_score": final_scores_list, "status": "ended"}}
+        {
+            "_id": ObjectId(trivia_id),
+            "rounds": {"$elemMatch": {"round_count": round_count, "correct_answer": {"$exists": False}}}
+        },
+        {"$set": {"rounds.$.correct_answer": correct_answer_text}}
     )
 
-async def trivia_worker(trivia_id: str) -> None:
+async def calculate_final_points(trivia_id) -> None:
     """
-    Ciclo principal para gestionar las rondas de una Trivia
-    Administra tiempos de cada ronda y los puntos asociados.
+    Calcula el puntaje final de cada jugador ("final_score") a partir de los puntajes acumulados al cerrar
+    cada ronda (colección "scores"), sin volver a leer las respuestas de la Trivia. Los invitados sin puntos
+    quedan con 0 puntos. Pasa la Trivia al estado finalizado "ended" y elimina sus acumulados.
     """
 
-    print(f"Trabajando en la trivia {trivia_id}", flush=True)
+    totals = {
+        total["user_id"]: total["score"]
+        async for total in scores_collection.find({"trivia_id": trivia_id}, {"_id": 0, "user_id": 1, "score": 1})
+    }
+    trivia = await trivia_collection.find_one({"_id": ObjectId(trivia_id)}, {"user_ids_invitations": 1})
+    final_score = [
+        {"user_id": user_id, "score": totals.get(user_id, 0)}
+        for user_id in (trivia or {}).get("user_ids_invitations", [])
+    ]
+    # Solo mientras siga en juego: si se repite tras eliminar los acumulados, no reemplaza el puntaje final
+    await trivia_collection.update_one(
+        {"_id": ObjectId(trivia_id), "status": "playing"},
+        {"$set": {"status": "ended", "final_score": final_score}, "$unset": {"expedite_round": ""}}
+    )
+    await scores_collection.delete_many({"trivia_id": trivia_id})
 
-    trivia = await get_trivia(trivia_id, False)
-    round_count = 1
-    while True:
-        # Procesa una nueva pregunta para los jugadores de la Trivia
-        round_lapse = await set_next_question_in_trivia(trivia, round_count)
-        if round_lapse is False:
-            break
-        # Esperamos el lapso de la ronda antes de cerrarla y pasar a la proxima
-        await asyncio.sleep(round_lapse)
-        # Calcula los puntos de cada jugador de la ronda recién finalizada
-        await calculate_round_points(trivia_id)
-        round_count += 1
+async def open_round(trivia_id: str, round_count: int, data: dict) -> None:
+    """
+    Abre la ronda "round_count" de una Trivia y agenda su cierre en el RoundScheduler.
+    Si ya no quedan preguntas, calcula los puntos finales y termina la Trivia.
+    En ambos casos se invalida la entrada de la Trivia en el ActiveRoundCache de este proceso y se avisa
+    al Broadcaster, para enviar de inmediato los eventos de la Trivia a los clientes conectados.
 
-    # Calcula puntos finales
-    await calculate_final_points(trivia_id)
+    "data" contiene el "round_time_sec", "total_rounds" y la cantidad de jugadores ("players") de la Trivia,
+    así avanzar de ronda no requiere leerla.
+    """
+    if round_count > data["total_rounds"]:
+        await calculate_final_points(trivia_id)
+        round_cache.invalidate(trivia_id)
+        broadcaster.wake(trivia_id)
+        await lease_manager.release(trivia_lease(trivia_id))
+        logger.info("Trivia %s terminada.", trivia_id)
+        return
+    round_endtime = await set_next_question_in_trivia(trivia_id, round_count, data["round_time_sec"], data["players"])
+    round_cache.invalidate(trivia_id)
+    broadcaster.wake(trivia_id)
+    round_scheduler.schedule(trivia_id, utc_timestamp(round_endtime), round_count, data)
+    ROUNDS_OPENED.inc()
 
-    print(f"Trivia {trivia_id} terminada.", flush=True)
+async def close_round(trivia_id: str, round_count: int, data: dict) -> None:
+    """
+    Handler del RoundScheduler, se ejecuta al vencer el plazo de una ronda.
+    Calcula los puntos de cada jugador de la ronda recién finalizada y abre la siguiente.
+
+    La ronda 0 no existe: se agenda al iniciar una Trivia, o al retomar una interrumpida antes de abrir su
+    primera ronda, para abrir la primera ronda.
+    Si el proceso perdió el lease de la Trivia, otro proceso ya esta a cargo y no se hace nada.
+    """
+    if not lease_manager.owns(trivia_lease(trivia_id)):
+        return
+    if round_count > 0:
+        start = time.perf_counter()
+        await calculate_round_points(trivia_id, round_count)
+        ROUND_SCORING_DURATION.observe(time.perf_counter() - start)
+        ROUNDS_CLOSED.inc()
+    await open_round(trivia_id, round_count + 1, data)
+
+async def start_round_scheduler_task() -> None:
+    await task_manager.start_task("round_scheduler_task", round_scheduler.run, close_round)
+
+async def stop_round_scheduler_task() -> None:
+    await task_manager.stop_task("round_scheduler_task")
+
+async def start_answer_buffer_task() -> None:
+    if ANSWER_BUFFER_ENABLED:
+        await task_manager.start_task("answer_buffer_task", answer_buffer.run)
+
+async def stop_answer_buffer_task() -> None:
+    """
+    Detiene el ciclo del AnswerBuffer y escribe las respuestas que queden en sus buffers
+    """
+    if ANSWER_BUFFER_ENABLED:
+        await task_manager.stop_task("answer_buffer_task")
+        await answer_buffer.flush()
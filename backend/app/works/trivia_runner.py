@@ -1,55 +1,368 @@
 import asyncio
-from app.core.constants import TRIVIA_CHECK_SEC_INTERVAL
+import logging
+import time
+from app.core.constants import (
+    TRIVIA_CHECK_SEC_INTERVAL,
+    TRIVIA_READY_EVENT,
+    LEASE_HEARTBEAT_SEC,
+    LEASE_ADOPT_BATCH,
+    MIGRATION_BATCH,
+    EXPEDITE_CHECK_SEC
+)
 from app.core.task_manager import TaskManager
+from app.core.events import EventBus
 from motor.motor_asyncio import AsyncIOMotorCollection
 from app.core.config import db
-from app.works.trivia_manager import start_trivia
-from app.models.trivia import TriviaRollback
+from app.core.scheduler import RoundScheduler, utc_timestamp
+from app.core.leases import LeaseManager
+from app.works.trivia_manager import (
+    start_trivia,
+    load_questions,
+    deck_from_questions,
+    trivia_lease,
+    TRIVIA_LEASE_PREFIX
+)
 from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
 
 task_manager = TaskManager()
+event_bus = EventBus()
+round_scheduler = RoundScheduler()
+lease_manager = LeaseManager()
 trivia_collection: AsyncIOMotorCollection = db["trivias"]
+answers_collection: AsyncIOMotorCollection = db["answers"]
+scores_collection: AsyncIOMotorCollection = db["scores"]
 
 async def check_trivias() -> None:
     """
-    Verifica, de forma cíclica, si el juego de una trivia cumple las condiciones para iniciar.
-    Las condiciones es que todos los jugadores invitados (user_ids_invitations) estén unidos a la trivia (joined_users).
+    Barrido de reconciliación, de baja frecuencia, para trivias que cumplen las condiciones para iniciar.
+    Las condiciones es que todos los jugadores invitados (user_ids_invitations) estén unidos a la trivia (joined_users),
+    o sea, que no le queden uniones pendientes ("pending_joins" en 0).
+
+    El inicio normal de una Trivia ocurre por el evento TRIVIA_READY_EVENT que publica "join_trivia". Este
+    barrido solo existe como red de seguridad (ej: un evento perdido por un reinicio). La consulta usa el indice
+    (status, pending_joins), así solo lee las Trivias listas para iniciar y no todas las que están en espera.
+
+    Con varios procesos o nodos, solo el dueño del lease "check_trivias" ejecuta el barrido. Un error no detiene
+    el ciclo: el lease sigue tomado y ningún otro proceso haría el barrido, así que se reintenta en el siguiente.
     """
-    is_running = True
-    while is_running:
+    while True:
         try:
-            trivias = await trivia_collection.find({"status": "waiting_start"}).to_list(length=None)
-            for trivia in trivias:
-                user_ids_invitations = set(trivia.get("user_ids_invitations", []))
-                joined_users = set(trivia.get("joined_users", []))
-                if user_ids_invitations == joined_users:
-                    await start_trivia(trivia['_id'])
+            if not await lease_manager.acquire("check_trivias"):
+                await asyncio.sleep(TRIVIA_CHECK_SEC_INTERVAL)
+                continue
+            ready_trivias = trivia_collection.find(
+                {"status": "waiting_start", "pending_joins": {"$lte": 0}}, {"_id": 1}
+            )
+            async for trivia in ready_trivias:
+                await queue_start_trivia(str(trivia["_id"]))
             await asyncio.sleep(TRIVIA_CHECK_SEC_INTERVAL)
         except asyncio.CancelledError:
-            print("Tarea de revisión de trivias cancelada.", flush=True)
+            logger.info("Tarea de revisión de trivias cancelada.")
             break
-        except Exception as e:
-            print(f"Error en la tarea de revisión de trivias: {e}", flush=True)
-            is_running = False
-
-async def rollback_interrupted_trivias() -> None:
-    """
-    Retorna a un estado inicial/limpio de "waiting_start" cualquier trivia que fuera interrumpida por un
-    reinicio del backend y que estuviera en estado "playing".
-    """
-    trivias_playing = await trivia_collection.find({"status": "playing"}).to_list(length=None)
-    for trivia in trivias_playing:
-        rollback_data = {key: trivia[key] for key in TriviaRollback.__fields__ if key in trivia}
-        rollback_data["status"] = "waiting_start"
-        rollback_trivia = TriviaRollback(**rollback_data)
-        await trivia_collection.replace_one(
-            {"_id": ObjectId(trivia["_id"])},
-            rollback_trivia.dict()
+        except Exception:
+            logger.exception("Error en la tarea de revisión de trivias")
+            await asyncio.sleep(TRIVIA_CHECK_SEC_INTERVAL)
+
+async def count_pending_joins() -> None:
+    """
+    Calcula "pending_joins" de las Trivias en espera creadas antes de existir ese campo, con una sola escritura
+    """
+    await trivia_collection.update_many(
+        {"status": "waiting_start", "pending_joins": {"$exists": False}},
+        [{"$set": {"pending_joins": {"$size": {"$setDifference": [
+            "$user_ids_invitations", {"$ifNull": ["$joined_users", []]}
+        ]}}}}]
+    )
+
+async def migrate_embedded_responses() -> None:
+    """
+    Mueve a la colección de respuestas las respuestas y puntajes guardados dentro de las rondas de las Trivias
+    jugadas antes de existir esa colección ("rounds.responses" y "rounds.round_score"). En las Trivias en juego
+    también suma los puntos de sus rondas ya cerradas al acumulado de cada jugador ("scores"), así el puntaje
+    final las incluye.
+
+    Se procesan lotes de MIGRATION_BATCH Trivias, con una escritura por colección en cada lote. La migración se
+    puede repetir sin duplicar nada (indice único de las respuestas y rondas ya sumadas de cada acumulado), por
+    lo que varios procesos la pueden ejecutar a la vez y una migración interrumpida se completa al reiniciar.
+    """
+    cursor = trivia_collection.find(
+        {"$or": [{"rounds.responses": {"$exists": True}}, {"rounds.round_score": {"$exists": True}}]},
+        {"status": 1, "rounds.id": 1, "rounds.round_count": 1, "rounds.responses": 1, "rounds.round_score": 1}
+    )
+    migrated = 0
+    while True:
+        trivias = await cursor.to_list(MIGRATION_BATCH)
+        if not trivias:
+            break
+        answers, totals = [], []
+        for trivia in trivias:
+            trivia_answers, trivia_totals = embedded_responses_writes(trivia)
+            answers += trivia_answers
+            totals += trivia_totals
+        await bulk_write_new(answers_collection, answers)
+        await bulk_write_new(scores_collection, totals)
+        await trivia_collection.update_many(
+            {"_id": {"$in": [trivia["_id"] for trivia in trivias]}},
+            {"$unset": {"rounds.$[].responses": "", "rounds.$[].round_score": ""}}
         )
+        migrated += len(trivias)
+    if migrated:
+        logger.info("Respuestas de %s Trivias movidas a la colección de respuestas", migrated)
+
+def embedded_responses_writes(trivia: dict) -> Tuple[List[InsertOne], List[UpdateOne]]:
+    """
+    Escrituras que migran las respuestas guardadas dentro de las rondas de una Trivia: una respuesta por cada
+    respuesta guardada (con su puntaje si la ronda ya cerró) y, si la Trivia esta en juego, la suma de los puntos
+    de cada ronda cerrada al acumulado del jugador, solo si esa ronda aun no fue sumada.
+    """
+    trivia_id = str(trivia["_id"])
+    answers, totals = [], []
+    for round_data in trivia.get("rounds", []):
+        closed = "round_score" in round_data
+        scores = {score["user_id"]: score["score"] for score in round_data.get("round_score") or []}
+        for response in round_data.get("responses") or []:
+            answer = {
+                "trivia_id": trivia_id,
+                "round_id": round_data["id"],
+                "round_count": round_data["round_count"],
+                "user_id": response["user_id"],
+                "answer_index": response["answer_index"],
+                "submitted_at": response["submitted_at"]
+            }
+            if closed:
+                answer["score"] = scores.get(response["user_id"], 0)
+            answers.append(InsertOne(answer))
+        if trivia["status"] != "playing":
+            continue
+        for user_id, score in scores.items():
+            if score > 0:
+                totals.append(UpdateOne(
+                    {"trivia_id": trivia_id, "user_id": user_id, "rounds": {"$ne": round_data["round_count"]}},
+                    {"$inc": {"score": score}, "$push": {"rounds": round_data["round_count"]}},
+                    upsert=True
+                ))
+    return answers, totals
+
+async def bulk_write_new(collection: AsyncIOMotorCollection, requests: list) -> None:
+    """
+    Aplica las escrituras con un solo bulk_write desordenado, ignorando las que chocan con un indice único
+    (ya fueron aplicadas)
+    """
+    if not requests:
+        return
+    try:
+        await collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if e.details.get("writeConcernErrors") or any(error["code"] != 11000 for error in errors):
+            raise
+
+async def queue_start_trivia(trivia_id: str) -> None:
+    """
+    Encola el inicio de una Trivia en el TaskManager, en la clase "start_trivia" de concurrencia acotada.
+    Si el inicio de esa Trivia ya esta en cola o en ejecución no se hace nada.
+    """
+    task_id = f"start_trivia_{trivia_id}"
+    if not task_manager.has_task(task_id):
+        await task_manager.start_task(task_id, start_trivia, trivia_id, task_class="start_trivia")
+
+async def resume_interrupted_trivias(trivia_ids: Optional[List[str]] = None) -> Set[str]:
+    """
+    Retoma cualquier trivia que fuera interrumpida por un reinicio del backend y que estuviera en estado "playing".
+    Con "trivia_ids" se limita a esas Trivias (ej: las de un proceso caído cuyo lease expiró).
+
+    Con una sola agregación se obtiene, de cada Trivia, solo su ultima ronda (numero, termino y si ya fue
+    puntuada). Luego se re-agenda en el RoundScheduler:
+    - Rondas en curso: se cierran en su "round_endtime" original.
+    - Rondas que vencieron durante la caída: se cierran de inmediato (se puntúan con las respuestas recibidas).
+    - Rondas ya puntuadas (o Trivias sin rondas): se abre de inmediato la siguiente ronda.
+    El scheduler procesa los cierres vencidos con concurrencia acotada, por lo que el reinicio no depende
+    de la cantidad de Trivias en juego.
+
+    Solo se retoman las Trivias cuyo lease pudo ser tomado por este proceso. Los leases de todas las Trivias se
+    toman con una sola escritura, y los mazos de las Trivias antiguas se arman con una sola consulta de preguntas
+    y una sola escritura. Si una Trivia no se puede retomar (ej: una pregunta de su mazo ya no existe), se informa
+    el error y su lease se marca como expirado, para reintentarla en un próximo heartbeat, sin afectar al resto.
+
+    Retorna las IDs de las Trivias que siguen en juego (retomadas o no), así el heartbeat puede eliminar los
+    leases de las que ya terminaron.
+    """
+    match = {"status": "playing"}
+    if trivia_ids is not None:
+        match["_id"] = {"$in": [ObjectId(trivia_id) for trivia_id in trivia_ids]}
+    has_deck = {"$ne": [{"$ifNull": ["$deck", None]}, None]}
+    trivias_playing = await trivia_collection.aggregate([
+        {"$match": match},
+        {"$project": {
+            "round_time_sec": 1,
+            "total_rounds": 1,
+            "players": {"$size": {"$ifNull": ["$joined_users", []]}},
+            "question_ids": {"$cond": [has_deck, None, "$question_ids"]},
+            "played_ids": {"$cond": [has_deck, None, {"$ifNull": ["$rounds.id", []]}]},
+            "last_round": {"$let": {
+                "vars": {"round": {"$arrayElemAt": ["$rounds", -1]}},
+                "in": {
+                    "round_count": "$$round.round_count",
+                    "round_endtime": "$$round.round_endtime",
+                    "scored": {"$ne": [{"$ifNull": ["$$round.correct_answer", None]}, None]}
+                }
+            }}
+        }}
+    ]).to_list(None)
+    playing = {str(trivia["_id"]) for trivia in trivias_playing}
+
+    acquired = await lease_manager.acquire_many([trivia_lease(trivia_id) for trivia_id in playing])
+    trivias = [trivia for trivia in trivias_playing if trivia_lease(str(trivia["_id"])) in acquired]
+
+    # Trivias iniciadas antes de existir el mazo de rondas
+    legacy_trivias = [trivia for trivia in trivias if trivia.get("question_ids")]
+    try:
+        failed = await build_legacy_decks(legacy_trivias)
+    except Exception as e:
+        failed = {str(trivia["_id"]): e for trivia in legacy_trivias}
+
+    now = time.time()
+    resumed = set()
+    for trivia in trivias:
+        trivia_id = str(trivia["_id"])
+        try:
+            if trivia_id in failed:
+                raise failed[trivia_id]
+            data = {
+                "round_time_sec": trivia["round_time_sec"],
+                "total_rounds": trivia["total_rounds"],
+                "players": trivia["players"]
+            }
+            last_round = trivia.get("last_round") or {}
+            round_count = last_round.get("round_count", 0)
+            if round_count and not last_round["scored"]:
+                deadline = utc_timestamp(last_round["round_endtime"])
+            else:
+                deadline = now
+        except Exception as e:
+            failed[trivia_id] = e
+            logger.error("Error al retomar la Trivia %s: %s", trivia_id, e)
+            continue
+        round_scheduler.schedule(trivia_id, deadline, round_count, data)
+        resumed.add(trivia_id)
+
+    if failed:
+        await lease_manager.expire([trivia_lease(trivia_id) for trivia_id in failed])
+    if resumed:
+        logger.info("Trivias retomadas: %s", len(resumed))
+    return playing
+
+async def build_legacy_decks(trivias: List[dict]) -> Dict[str, Exception]:
+    """
+    Arma el mazo de las Trivias iniciadas antes de existir el mazo de rondas, respetando las rondas ya jugadas,
+    con una sola consulta de preguntas y una sola escritura. Retorna el error de cada Trivia cuyo mazo no se
+    pudo armar o guardar.
+    """
+    if not trivias:
+        return {}
+    question_ids = {question_id for trivia in trivias for question_id in trivia["question_ids"]}
+    questions_by_id = await load_questions(list(question_ids))
+
+    errors = {}
+    updates, updated_ids = [], []
+    for trivia in trivias:
+        played_ids = trivia.get("played_ids") or []
+        pending_ids = [question_id for question_id in trivia["question_ids"] if question_id not in played_ids]
+        try:
+            deck = deck_from_questions(played_ids + pending_ids, questions_by_id)
+        except KeyError as e:
+            errors[str(trivia["_id"])] = ValueError(f"No existe la pregunta {e}")
+            continue
+        updates.append(UpdateOne({"_id": trivia["_id"]}, {"$set": {"deck": deck}}))
+        updated_ids.append(str(trivia["_id"]))
+
+    if updates:
+        try:
+            await trivia_collection.bulk_write(updates, ordered=False)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                raise
+            for error in e.details.get("writeErrors", []):
+                errors[updated_ids[error["index"]]] = OperationFailure(error["errmsg"], error["code"], error)
+    return errors
+
+async def lease_heartbeat() -> None:
+    """
+    Renueva, de forma cíclica, los leases de este proceso y adopta las Trivias de procesos caídos.
+
+    Si un lease se perdió (otro proceso lo tomó tras expirar), se descarta la ronda agendada localmente.
+    Las Trivias con lease expirado se retoman en lotes de LEASE_ADOPT_BATCH, así se reparten entre los
+    procesos que sigan vivos.
+    """
+    while True:
+        try:
+            for name in await lease_manager.renew():
+                if name.startswith(TRIVIA_LEASE_PREFIX):
+                    round_scheduler.cancel(name[len(TRIVIA_LEASE_PREFIX):])
+
+            expired = await lease_manager.find_expired(TRIVIA_LEASE_PREFIX, LEASE_ADOPT_BATCH)
+            if expired:
+                trivia_ids = [name[len(TRIVIA_LEASE_PREFIX):] for name in expired]
+                playing = await resume_interrupted_trivias(trivia_ids)
+                finished = [trivia_lease(trivia_id) for trivia_id in trivia_ids if trivia_id not in playing]
+                await lease_manager.clear_expired(finished)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error en el heartbeat de leases: %s", e)
+        await asyncio.sleep(LEASE_HEARTBEAT_SEC)
+
+async def expedite_requested_rounds() -> None:
+    """
+    Revisa, de forma cíclica, las Trivias cuyas rondas ya respondieron todos los jugadores en otro proceso
+    ("expedite_round", ver "count_round_answers") y adelanta el cierre de las que están a cargo de este proceso.
+    Solo el proceso a cargo elimina la marca, una vez adelantado el cierre.
+    """
+    while True:
+        try:
+            requested = trivia_collection.find({"expedite_round": {"$exists": True}}, {"expedite_round": 1})
+            handled = []
+            async for trivia in requested:
+                trivia_id = str(trivia["_id"])
+                if lease_manager.owns(trivia_lease(trivia_id)):
+                    round_scheduler.expedite(trivia_id, trivia["expedite_round"])
+                    handled.append(UpdateOne(
+                        {"_id": trivia["_id"], "expedite_round": trivia["expedite_round"]},
+                        {"$unset": {"expedite_round": ""}}
+                    ))
+            if handled:
+                await trivia_collection.bulk_write(handled, ordered=False)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error al revisar las rondas por adelantar: %s", e)
+        await asyncio.sleep(EXPEDITE_CHECK_SEC)
 
 async def start_check_trivias_task() -> None:
-    await rollback_interrupted_trivias()
+    """
+    Retoma las Trivias interrumpidas e inicia los ciclos de leases, de revisión de trivias y de rondas por adelantar.
+    Si la recuperación falla (ej: la DB no responde), la app inicia igual: los leases de las Trivias en juego
+    expiran y el heartbeat las retoma.
+    """
+    try:
+        await count_pending_joins()
+        await migrate_embedded_responses()
+        await resume_interrupted_trivias()
+    except Exception as e:
+        logger.error("Error al retomar las trivias interrumpidas: %s", e)
+    event_bus.subscribe(TRIVIA_READY_EVENT, queue_start_trivia)
+    await task_manager.start_task("lease_heartbeat_task", lease_heartbeat)
     await task_manager.start_task("check_trivias_task", check_trivias)
+    await task_manager.start_task("expedite_rounds_task", expedite_requested_rounds)
 
 async def stop_check_trivias_task() -> None:
+    event_bus.unsubscribe(TRIVIA_READY_EVENT, queue_start_trivia)
     await task_manager.stop_task("check_trivias_task")
+    await task_manager.stop_task("expedite_rounds_task")
+    await task_manager.stop_task("lease_heartbeat_task")
+    await lease_manager.release_all()
@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import random
+import time
+import bson
+from datetime import datetime, timedelta
+from app.core.config import db
+from app.core.indexes import ensure_indexes
+from app.core.constants import ANSWER_BUFFER_ENABLED
+from app.core.metrics import MONGO_COMMANDS
+from app.services.trivia_service import submit_answer, get_trivia_ranking, round_cache
+from app.works.trivia_manager import (
+    calculate_round_points,
+    calculate_final_points,
+    start_answer_buffer_task,
+    stop_answer_buffer_task
+)
+from bench_concurrency import percentiles
+
+"""
+Benchmark de una Trivia con una audiencia grande
+
+Juega una Trivia con muchos jugadores (50k por defecto), donde todos responden cada ronda con "--concurrency"
+respuestas en vuelo. Las respuestas se guardan en la colección de respuestas. Reporta, por ronda, respuestas
+por segundo, latencia de "submit_answer", escrituras a la DB y duración del calculo de puntos, y al final la
+duración del puntaje final y del ranking, junto al tamaño BSON de la Trivia. Con ANSWER_BUFFER=1 las respuestas
+se escriben en grupo con el AnswerBuffer, lo que reduce las escrituras de una por respuesta a una por intervalo.
+
+Como referencia, mide también la escritura anterior ($push de cada respuesta dentro de la ronda de la Trivia)
+para una ronda, y cuantas rondas con esas respuestas caben en el limite de 16 MB de un documento BSON.
+Usa la DB de testing, por lo que requiere TEST_MODE=1.
+
+Uso: python benchmarks/bench_answers.py --players 50000 --rounds 5 --concurrency 500
+     ANSWER_BUFFER=1 python benchmarks/bench_answers.py --players 50000 --rounds 5 --concurrency 500
+"""
+
+BSON_LIMIT = 16 * 1024 * 1024
+
+def build_round(round_count: int) -> dict:
+    return {
+        "id": str(bson.ObjectId()),
+        "question": f"Pregunta {round_count}",
+        "possible_answers": ["A", "B", "C", "D"],
+        "correct_answer_index": random.randint(0, 3),
+        "difficulty": random.randint(1, 3),
+        "round_count": round_count,
+    }
+
+async def create_players(total: int) -> list:
+    users = [{"name": f"bot{i}", "email": f"bot{i}@bench.com", "role": "player"} for i in range(total)]
+    result = await db["users"].insert_many(users)
+    return [
+        {"id": str(user_id), "email": user["email"], "role": "player"}
+        for user_id, user in zip(result.inserted_ids, users)
+    ]
+
+async def create_trivia(user_ids: list, rounds: list) -> str:
+    result = await db["trivias"].insert_one({
+        "name": "Benchmark",
+        "description": "Trivia con audiencia grande",
+        "question_ids": [round_data["id"] for round_data in rounds],
+        "user_ids_invitations": user_ids,
+        "joined_users": user_ids,
+        "round_time_sec": 600,
+        "total_rounds": len(rounds),
+        "status": "playing",
+        "deck": rounds,
+        "rounds": [],
+    })
+    return str(result.inserted_id)
+
+async def open_round(trivia_id: str, round_data: dict) -> None:
+    """
+    Abre la ronda con un plazo amplio, así el benchmark mide las respuestas y no el reloj de la ronda
+    """
+    round_endtime = datetime.utcnow() + timedelta(minutes=10)
+    await db["trivias"].update_one(
+        {"_id": bson.ObjectId(trivia_id)},
+        {"$push": {"rounds": {**round_data, "round_endtime": round_endtime}}}
+    )
+    round_cache.invalidate(trivia_id)
+
+async def answer_all(players: list, concurrency: int, submit) -> tuple:
+    """
+    Envía una respuesta por jugador con "concurrency" respuestas en vuelo. Retorna la duración y las latencias.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def answer(player):
+        async with semaphore:
+            start = time.perf_counter()
+            await submit(player, random.randint(1, 4))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[answer(player) for player in players])
+    return time.perf_counter() - start, latencies
+
+def latency_text(latencies: list) -> str:
+    latency = percentiles(latencies)
+    return f"latencia p50 {latency['p50']} ms, p99 {latency['p99']} ms"
+
+async def trivia_bytes(trivia_id: str) -> int:
+    return len(bson.encode(await db["trivias"].find_one({"_id": bson.ObjectId(trivia_id)})))
+
+async def bench_embedded(players: list, concurrency: int) -> None:
+    """
+    Escritura anterior: cada respuesta es un $push dentro de la ronda de la Trivia
+    """
+    round_data = build_round(1)
+    trivia_id = await create_trivia([player["id"] for player in players], [round_data])
+    await open_round(trivia_id, round_data)
+    empty_bytes = await trivia_bytes(trivia_id)
+
+    async def submit(player, answer_index):
+        await db["trivias"].update_one(
+            {
+                "_id": bson.ObjectId(trivia_id),
+                "rounds": {"$elemMatch": {"id": round_data["id"], "responses.user_id": {"$ne": player["id"]}}}
+            },
+            {"$push": {"rounds.$.responses": {
+                "user_id": player["id"], "answer_index": answer_index, "submitted_at": datetime.utcnow()
+            }}}
+        )
+
+    writes = MONGO_COMMANDS.value("update")
+    duration, latencies = await answer_all(players, concurrency, submit)
+    writes = MONGO_COMMANDS.value("update") - writes
+    round_bytes = await trivia_bytes(trivia_id) - empty_bytes
+    print(
+        f"Respuestas dentro de la Trivia: {len(players) / duration:.0f} respuestas/s, {latency_text(latencies)}, "
+        f"{writes:.0f} escrituras"
+    )
+    print(
+        f"Cada ronda agrega {round_bytes / 1024 / 1024:.2f} MB a la Trivia: caben "
+        f"{max(0, BSON_LIMIT - empty_bytes) // max(1, round_bytes)} rondas en 16 MB"
+    )
+
+async def bench_answers(args) -> None:
+    for collection in ["users", "trivias", "answers"]:
+        await db[collection].delete_many({})
+    await ensure_indexes()
+    players = await create_players(args.players)
+    print(
+        f"Jugadores: {args.players} | Rondas: {args.rounds} | Respuestas en vuelo: {args.concurrency} | "
+        f"AnswerBuffer: {'si' if ANSWER_BUFFER_ENABLED else 'no'}"
+    )
+
+    await bench_embedded(players, args.concurrency)
+
+    rounds = [build_round(round_count) for round_count in range(1, args.rounds + 1)]
+    trivia_id = await create_trivia([player["id"] for player in players], rounds)
+
+    async def submit(player, answer_index):
+        await submit_answer(trivia_id, round_data["id"], answer_index, player)
+
+    await start_answer_buffer_task()
+    for round_data in rounds:
+        await open_round(trivia_id, round_data)
+        writes = MONGO_COMMANDS.value("insert")
+        duration, latencies = await answer_all(players, args.concurrency, submit)
+        writes = MONGO_COMMANDS.value("insert") - writes
+        start = time.perf_counter()
+        await calculate_round_points(trivia_id, round_data["round_count"])
+        scoring = time.perf_counter() - start
+        print(
+            f"Ronda {round_data['round_count']}: {len(players) / duration:.0f} respuestas/s, "
+            f"{latency_text(latencies)}, {writes:.0f} escrituras, calculo de puntos {scoring:.2f} s"
+        )
+    await stop_answer_buffer_task()
+
+    start = time.perf_counter()
+    await calculate_final_points(trivia_id)
+    final_points = time.perf_counter() - start
+    start = time.perf_counter()
+    ranking = await get_trivia_ranking(trivia_id)
+    ranking_time = time.perf_counter() - start
+    assert len(ranking) == args.players
+    print(f"Puntaje final: {final_points:.2f} s | Ranking: {ranking_time:.2f} s")
+    print(f"Tamaño de la Trivia al terminar: {await trivia_bytes(trivia_id) / 1024 / 1024:.2f} MB")
+
+    for collection in ["users", "trivias", "answers"]:
+        await db[collection].delete_many({})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de una Trivia con una audiencia grande")
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=500, help="Respuestas en vuelo a la vez")
+    args = parser.parse_args()
+    asyncio.run(bench_answers(args))
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import time
+from app.core.auth import create_access_token, decode_access_token, get_current_user, token_cache
+
+"""
+Benchmark de la autenticación de cada request
+
+Compara el costo de verificar un JWT en cada request (firma HMAC, decodificación base64 y JSON) con el
+costo de una consulta al cache de tokens ya verificados de get_current_user. No requiere DB.
+
+Uso: python benchmarks/bench_auth.py --iterations 100000 --tokens 1000
+"""
+
+async def bench_auth(iterations, total_tokens):
+    tokens = [
+        create_access_token({"sub": f"player{i}@bench.com", "role": "player", "uid": f"{i:024x}"})
+        for i in range(total_tokens)
+    ]
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        decode_access_token(tokens[i % total_tokens])
+    decode_time = time.perf_counter() - start
+
+    token_cache.clear()
+    start = time.perf_counter()
+    for i in range(iterations):
+        await get_current_user(tokens[i % total_tokens])
+    cached_time = time.perf_counter() - start
+
+    print(f"Requests: {iterations} | Tokens distintos: {total_tokens}")
+    print(f"Verificando el JWT en cada request: {decode_time / iterations * 1e6:.2f} us por request")
+    print(f"Con cache de tokens verificados: {cached_time / iterations * 1e6:.2f} us por request")
+    print(f"Aceleración: x{decode_time / cached_time:.1f} (aciertos del cache: {token_cache.hits})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la autenticación por JWT")
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--tokens", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(bench_auth(args.iterations, args.tokens))
@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from bcrypt import gensalt, hashpw
+from app.main import app
+from app.core.auth import create_access_token
+from app.core.config import db
+from app.core.scheduler import RoundScheduler
+from bench_fullgame import clean_db, login, create_questions
+import httpx
+
+"""
+Benchmark de Trivias simultaneas
+
+Inicia N Trivias con M jugadores (bots) cada una y un "round_time_sec" corto, y las juega completas en el
+mismo proceso del backend. Cada bot responde una fracción de las rondas ("--answer-rate"), así parte de las
+rondas se cierra por tiempo y parte por cierre anticipado. Reporta:
+- Rondas por segundo: rondas jugadas entre todas las Trivias dividido por la duración total.
+- Retraso del scheduler (ms): momento real de cierre de cada ronda menos su plazo, desde RoundScheduler.
+- Latencia de las respuestas (ms): duración del POST de cada respuesta aceptada.
+- Memoria por partida (KB): aumento del RSS máximo del proceso durante el juego dividido por N (incluye bots).
+
+Con "--save" el resultado se guarda como baseline en JSON; con "--baseline" se compara contra uno guardado y
+el script termina con código 1 si alguna métrica empeora mas que "--tolerance". Las métricas dependen de la
+maquina y de la DB, así que el repositorio no incluye un baseline: en cada maquina se guarda primero con "--save"
+y luego se compara con "--baseline", usando la misma configuración. Requiere TEST_MODE=1.
+
+Uso: python benchmarks/bench_concurrency.py --trivias 100 --players 10 --rounds 5 --round-time 2 --save base.json
+     python benchmarks/bench_concurrency.py --trivias 100 --players 10 --rounds 5 --round-time 2 --baseline base.json
+"""
+
+# Métricas comparadas contra el baseline y si un valor mayor es mejor
+COMPARED_METRICS = {
+    "rounds_per_sec": True,
+    "drift_ms.p95": False,
+    "drift_ms.p99": False,
+    "answer_latency_ms.p95": False,
+    "memory_per_game_kb": False,
+}
+
+def percentiles(values: list) -> dict:
+    values = sorted(values)
+
+    def percentile(p: float) -> float:
+        if not values:
+            return 0.0
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 3)
+
+    return {
+        "mean": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+def max_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def bot_token(email: str, user_id: str) -> str:
+    return create_access_token({"sub": email, "role": "player", "uid": user_id})
+
+async def create_bots(total: int) -> list:
+    """
+    Crea los jugadores directamente en la DB (un solo hash de contraseña) y genera sus JWT sin pasar por
+    /login, para que la preparación de miles de bots no domine el benchmark
+    """
+    password = hashpw(b"1234", gensalt()).decode("utf-8")
+    users = [
+        {"name": f"bot{i}", "email": f"bot{i}@bench.com", "password": password, "role": "player"}
+        for i in range(total)
+    ]
+    result = await db["users"].insert_many(users)
+    return [
+        {
+            "id": str(user_id),
+            "headers": {"Authorization": f"Bearer {bot_token(user['email'], str(user_id))}"}
+        }
+        for user_id, user in zip(result.inserted_ids, users)
+    ]
+
+async def bot(client, trivia_id, player, answer_rate, poll, ended, latencies):
+    """
+    Jugador que, en cada ronda nueva, responde con probabilidad "answer_rate"
+    """
+    seen_round = 0
+    while trivia_id not in ended:
+        response = await client.get(f"/trivias/{trivia_id}/question", headers=player["headers"])
+        if response.status_code == 200:
+            question = response.json()
+            if question["round_count"] > seen_round:
+                seen_round = question["round_count"]
+                if question["answered"] != "answered" and random.random() < answer_rate:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        f"/trivias/{trivia_id}/questions/{question['id']}/answer",
+                        data={"answer_position": random.randint(1, 4)},
+                        headers=player["headers"]
+                    )
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+                    continue
+        await asyncio.sleep(poll)
+
+async def play_trivia(client, admin_headers, question_ids, players, args, ended, latencies):
+    response = await client.post(
+        "/trivias/",
+        json={
+            "name": "Benchmark",
+            "description": "Partida de benchmark",
+            "question_ids": question_ids,
+            "user_ids_invitations": [player["id"] for player in players],
+            "round_time_sec": args.round_time
+        },
+        headers=admin_headers
+    )
+    assert response.status_code == 201, f"Error al crear la trivia: {response.text}"
+    trivia_id = response.json()["id"]
+
+    bots = [
+        asyncio.create_task(bot(client, trivia_id, player, args.answer_rate, args.poll, ended, latencies))
+        for player in players
+    ]
+    for player in players:
+        await client.post(f"/trivias/{trivia_id}/join", headers=player["headers"])
+
+    timeout = args.round_time * len(question_ids) * 3 + 30
+    start = time.time()
+    while time.time() - start < timeout:
+        response = await client.get(f"/trivias/{trivia_id}", headers=admin_headers)
+        if response.json()["status"] == "ended":
+            break
+        await asyncio.sleep(args.poll)
+    else:
+        raise TimeoutError(f"La Trivia {trivia_id} no terminó a tiempo")
+    ended.add(trivia_id)
+    await asyncio.gather(*bots)
+
+async def bench_concurrency(args) -> dict:
+    await clean_db()
+    ended = set()
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60, limits=limits) as client:
+            await client.post(
+                "/users", json={"name": "admin", "email": "admin@bench.com", "password": "1234", "role": "admin"}
+            )
+            admin_headers = await login(client, "admin@bench.com", "1234")
+            question_ids = await create_questions(client, admin_headers, args.rounds)
+            players = await create_bots(args.trivias * args.players)
+
+            rss_before = max_rss_kb()
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                play_trivia(
+                    client, admin_headers, question_ids,
+                    players[i * args.players:(i + 1) * args.players], args, ended, latencies
+                )
+                for i in range(args.trivias)
+            ])
+            duration = time.perf_counter() - start
+            rss_peak = max_rss_kb()
+
+    scheduler_stats = RoundScheduler().get_stats()
+    return {
+        "config": {
+            "trivias": args.trivias,
+            "players": args.players,
+            "rounds": args.rounds,
+            "round_time": args.round_time,
+            "answer_rate": args.answer_rate,
+        },
+        "duration_sec": round(duration, 3),
+        "rounds_per_sec": round(args.trivias * args.rounds / duration, 3),
+        "drift_ms": scheduler_stats["lag_ms"],
+        "answers": len(latencies),
+        "answer_latency_ms": percentiles(latencies),
+        "memory_per_game_kb": round((rss_peak - rss_before) / args.trivias, 1),
+    }
+
+def metric_value(result: dict, metric: str) -> float:
+    value = result
+    for key in metric.split("."):
+        value = value[key]
+    return value
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compara el resultado contra un baseline y retorna las métricas que empeoraron mas que "tolerance"
+    """
+    if result["config"] != baseline["config"]:
+        print(f"Advertencia: el baseline fue medido con otra configuración: {baseline['config']}")
+
+    regressions = []
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        current, previous = metric_value(result, metric), metric_value(baseline, metric)
+        if higher_is_better:
+            worse = current < previous * (1 - tolerance)
+        else:
+            worse = current > previous * (1 + tolerance)
+        print(f"{metric}: {current} (baseline {previous}){' REGRESIÓN' if worse else ''}")
+        if worse:
+            regressions.append(metric)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de Trivias simultaneas")
+    parser.add_argument("--trivias", type=int, default=50)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--round-time", type=int, default=2)
+    parser.add_argument("--answer-rate", type=float, default=0.8, help="Probabilidad de que un bot responda")
+    parser.add_argument("--poll", type=float, default=0.2, help="Segundos entre consultas de cada bot")
+    parser.add_argument("--save", help="Guarda el resultado como baseline en este archivo JSON")
+    parser.add_argument("--baseline", help="Compara el resultado contra este baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento tolerado (0.2 = 20%%)")
+    args = parser.parse_args()
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f"No existe el baseline {args.baseline}: guárdalo primero en esta maquina con --save")
+
+    result = asyncio.run(bench_concurrency(args))
+    print(json.dumps(result, indent=2))
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(result, baseline_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(result, json.load(baseline_file), args.tolerance)
+        if regressions:
+            sys.exit(1)
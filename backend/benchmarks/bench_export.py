@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+from app.core.config import db
+from app.services.question_service import question_from_db, stream_all_questions
+
+"""
+Benchmark de la exportación de todas las preguntas
+
+Inserta muchas preguntas (1M por defecto) y compara cargar la colección completa en una lista de QuestionInDB
+(lo que hacia GET /questions/ antes) con exportarla como NDJSON con stream_all_questions, que solo mantiene un
+lote en memoria. Reporta duración, preguntas por segundo y el máximo de memoria asignada (tracemalloc) de cada
+forma. Usa la DB de testing, por lo que requiere TEST_MODE=1.
+
+Uso: python benchmarks/bench_export.py --questions 1000000
+"""
+
+INSERT_BATCH = 10_000
+
+async def create_questions(total: int) -> None:
+    for start in range(0, total, INSERT_BATCH):
+        await db["questions"].insert_many([
+            {
+                "question": f"Pregunta {i}",
+                "distractors": ["Madrid", "Berlín", "Roma"],
+                "answer": "París",
+                "difficulty": i % 3 + 1,
+            }
+            for i in range(start, min(start + INSERT_BATCH, total))
+        ])
+
+async def load_all() -> int:
+    questions = [question_from_db(question) async for question in db["questions"].find()]
+    return len(questions)
+
+async def export_ndjson() -> int:
+    exported = 0
+    async for line in stream_all_questions():
+        exported += len(line)
+    return exported
+
+async def measure(name: str, action, total: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    await action()
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name}: {duration:.2f} s, {total / duration:.0f} preguntas/s, memoria máxima {peak / 1024 / 1024:.1f} MB")
+
+async def bench_export(total: int) -> None:
+    await db["questions"].delete_many({})
+    await create_questions(total)
+    print(f"Preguntas: {total}")
+    await measure("Lista completa en memoria", load_all, total)
+    await measure("Stream NDJSON", export_ndjson, total)
+    await db["questions"].delete_many({})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la exportación de preguntas")
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    args = parser.parse_args()
+    asyncio.run(bench_export(args.questions))
@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import time
+import httpx
+from app.main import app
+from app.core.config import db
+
+"""
+Benchmark de partidas completas
+
+Juega N Trivias en paralelo, donde cada jugador (bot) responde apenas aparece la pregunta de la ronda.
+Compara la duración real de cada partida con la duración que tendría esperando el tiempo completo de
+cada ronda (round_time_sec * rondas). Usa la DB de testing, por lo que requiere TEST_MODE=1.
+
+Uso: python benchmarks/bench_fullgame.py --trivias 5 --players 4 --rounds 4 --round-time 10
+"""
+
+async def clean_db():
+    """Vacía todas las colecciones antes de iniciar el benchmark"""
+    collections = await db.list_collection_names()
+    for collection in collections:
+        await db[collection].delete_many({})
+
+async def login(client, email, password):
+    response = await client.post("/login", data={"username": email, "password": password})
+    assert response.status_code == 200, f"Error al iniciar sesión: {response.text}"
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def create_players(client, total):
+    """
+    Crea los jugadores y retorna sus IDs y headers de autorización
+    """
+    players = []
+    for i in range(total):
+        email = f"bot{i}@bench.com"
+        response = await client.post(
+            "/users", json={"name": f"bot{i}", "email": email, "password": "1234", "role": "player"}
+        )
+        assert response.status_code == 201, f"Error al crear el jugador: {response.text}"
+        players.append({"id": response.json()["id"], "headers": await login(client, email, "1234")})
+    return players
+
+async def create_questions(client, admin_headers, total):
+    question_ids = []
+    for i in range(total):
+        response = await client.post(
+            "/questions/",
+            json={"question": f"Pregunta {i}", "distractors": ["A", "B", "C"], "answer": "D", "difficulty": 1},
+            headers=admin_headers
+        )
+        assert response.status_code == 201, f"Error al crear la pregunta: {response.text}"
+        question_ids.append(response.json()["id"])
+    return question_ids
+
+async def bot(client, trivia_id, player, total_rounds):
+    """
+    Jugador que responde la alternativa 1 apenas se publica una nueva ronda
+    """
+    answered_round = 0
+    while answered_round < total_rounds:
+        response = await client.get(f"/trivias/{trivia_id}/question", headers=player["headers"])
+        if response.status_code != 200:
+            await asyncio.sleep(0.05)
+            continue
+        question = response.json()
+        if question["round_count"] <= answered_round or question["answered"] == "answered":
+            await asyncio.sleep(0.05)
+            continue
+        await client.post(
+            f"/trivias/{trivia_id}/questions/{question['id']}/answer",
+            data={"answer_position": 1},
+            headers=player["headers"]
+        )
+        answered_round = question["round_count"]
+
+async def wait_end(client, trivia_id, headers, timeout):
+    start = time.time()
+    while time.time() - start < timeout:
+        response = await client.get(f"/trivias/{trivia_id}", headers=headers)
+        if response.json()["status"] == "ended":
+            return time.time()
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"La Trivia {trivia_id} no terminó a tiempo")
+
+async def play_trivia(client, admin_headers, question_ids, players, round_time):
+    """
+    Crea una Trivia, une a sus jugadores, la juega completa y retorna su duración en segundos
+    """
+    response = await client.post(
+        "/trivias/",
+        json={
+            "name": "Benchmark",
+            "description": "Partida de benchmark",
+            "question_ids": question_ids,
+            "user_ids_invitations": [player["id"] for player in players],
+            "round_time_sec": round_time
+        },
+        headers=admin_headers
+    )
+    assert response.status_code == 201, f"Error al crear la trivia: {response.text}"
+    trivia_id = response.json()["id"]
+
+    for player in players:
+        await client.post(f"/trivias/{trivia_id}/join", headers=player["headers"])
+    start = time.time()
+
+    bots = [bot(client, trivia_id, player, len(question_ids)) for player in players]
+    await asyncio.gather(*bots)
+    end = await wait_end(client, trivia_id, admin_headers, round_time * len(question_ids) * 2)
+    return end - start
+
+async def bench_fullgame(trivias, players, rounds, round_time):
+    await clean_db()
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            await client.post(
+                "/users", json={"name": "admin", "email": "admin@bench.com", "password": "1234", "role": "admin"}
+            )
+            admin_headers = await login(client, "admin@bench.com", "1234")
+            question_ids = await create_questions(client, admin_headers, rounds)
+            all_players = await create_players(client, trivias * players)
+
+            games = [
+                play_trivia(client, admin_headers, question_ids, all_players[i * players:(i + 1) * players], round_time)
+                for i in range(trivias)
+            ]
+            durations = await asyncio.gather(*games)
+
+    full_duration = rounds * round_time
+    mean_duration = sum(durations) / len(durations)
+    print(f"Trivias: {trivias} | Jugadores por Trivia: {players} | Rondas: {rounds} | round_time_sec: {round_time}")
+    print(f"Duración sin cierre anticipado: {full_duration:.2f} s")
+    print(f"Duración promedio real: {mean_duration:.2f} s (max {max(durations):.2f} s)")
+    print(f"Aceleración: x{full_duration / mean_duration:.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de partidas completas de Trivia")
+    parser.add_argument("--trivias", type=int, default=5)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--round-time", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(bench_fullgame(args.trivias, args.players, args.rounds, args.round_time))
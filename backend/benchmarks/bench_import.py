@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import json
+import time
+from app.core.config import db
+from app.models.question import Question
+from app.services.question_service import create_question, import_questions
+
+"""
+Benchmark de la importación masiva de preguntas
+
+Genera un archivo NDJSON de muchas preguntas (500k por defecto) y lo importa con import_questions, entregándolo
+en bloques como lo haría el body de POST /questions/import. Lo compara con crear una muestra de las mismas
+preguntas una a una con create_question (un POST /questions por pregunta) y reporta preguntas por segundo de
+cada forma. Usa la DB de testing, por lo que requiere TEST_MODE=1.
+
+Uso: python benchmarks/bench_import.py --questions 500000 --sample 5000
+"""
+
+BODY_CHUNK_BYTES = 64 * 1024
+
+def question_line(i: int) -> bytes:
+    return json.dumps({
+        "question": f"Pregunta {i}",
+        "distractors": ["Madrid", "Berlín", "Roma"],
+        "answer": "París",
+        "difficulty": i % 3 + 1,
+    }, ensure_ascii=False).encode() + b"\n"
+
+async def body(data: bytes):
+    for start in range(0, len(data), BODY_CHUNK_BYTES):
+        yield data[start:start + BODY_CHUNK_BYTES]
+
+async def bench_one_by_one(total: int) -> float:
+    start = time.perf_counter()
+    for i in range(total):
+        await create_question(Question(**json.loads(question_line(i))))
+    return total / (time.perf_counter() - start)
+
+async def bench_bulk(total: int) -> float:
+    data = b"".join(question_line(i) for i in range(total))
+    start = time.perf_counter()
+    result = await import_questions(body(data), "ndjson")
+    duration = time.perf_counter() - start
+    assert result.inserted == total, result
+    return total / duration
+
+async def bench_import(total: int, sample: int) -> None:
+    await db["questions"].delete_many({})
+    one_by_one = await bench_one_by_one(sample)
+    print(f"Una a una ({sample} preguntas): {one_by_one:.0f} preguntas/s")
+    await db["questions"].delete_many({})
+    bulk = await bench_bulk(total)
+    print(f"Importación masiva ({total} preguntas): {bulk:.0f} preguntas/s ({bulk / one_by_one:.1f}x)")
+    await db["questions"].delete_many({})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la importación masiva de preguntas")
+    parser.add_argument("--questions", type=int, default=500_000)
+    parser.add_argument("--sample", type=int, default=5_000)
+    args = parser.parse_args()
+    asyncio.run(bench_import(args.questions, args.sample))
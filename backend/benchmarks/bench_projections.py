@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import random
+import time
+import bson
+from datetime import datetime
+from app.core.config import db
+from app.services.trivia_service import ACTIVE_ROUND_PROJECTION, user_projection
+
+"""
+Benchmark de las lecturas de una Trivia en cada camino de los servicios
+
+Compara, para una Trivia con muchas rondas ya jugadas, la lectura anterior (la Trivia completa, con todas
+sus rondas, respuestas y puntajes) con la lectura proyectada que usa hoy cada servicio. Reporta los bytes
+leídos (tamaño BSON del documento recibido) y la latencia promedio de cada lectura. Usa la DB de testing,
+por lo que requiere TEST_MODE=1.
+
+Uso: python benchmarks/bench_projections.py --rounds 100 --players 50 --iterations 200
+"""
+
+def build_trivia(rounds: int, user_ids: list) -> dict:
+    """
+    Trivia en juego con "rounds" rondas, todas respondidas por todos los jugadores. La ultima es la ronda activa.
+    """
+    now = datetime.utcnow()
+    trivia_rounds = []
+    for round_count in range(1, rounds + 1):
+        round_data = {
+            "id": str(bson.ObjectId()),
+            "question": f"Pregunta {round_count}",
+            "possible_answers": ["A", "B", "C", "D"],
+            "correct_answer_index": random.randint(0, 3),
+            "difficulty": random.randint(1, 3),
+            "round_count": round_count,
+            "round_endtime": now,
+            "responses": [
+                {"user_id": user_id, "answer_index": random.randint(1, 4), "submitted_at": now}
+                for user_id in user_ids
+            ]
+        }
+        if round_count < rounds:
+            round_data["round_score"] = [{"user_id": user_id, "score": random.randint(0, 3)} for user_id in user_ids]
+            round_data["correct_answer"] = "A"
+        trivia_rounds.append(round_data)
+    return {
+        "name": "Benchmark",
+        "description": "Trivia de benchmark",
+        "question_ids": [round_data["id"] for round_data in trivia_rounds],
+        "user_ids_invitations": user_ids,
+        "joined_users": user_ids,
+        "round_time_sec": 10,
+        "total_rounds": rounds,
+        "status": "playing",
+        "rounds": trivia_rounds,
+        "running_score": {user_id: 0 for user_id in user_ids},
+    }
+
+async def measure(trivia_id, projection, iterations):
+    """
+    Retorna los bytes leídos y la latencia promedio (ms) de leer la Trivia con la proyección indicada
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        trivia = await db["trivias"].find_one({"_id": trivia_id}, projection)
+    latency = (time.perf_counter() - start) / iterations * 1000
+    return len(bson.encode(trivia)), latency
+
+async def bench_projections(rounds, players, iterations):
+    await db["trivias"].delete_many({})
+    user_ids = [str(bson.ObjectId()) for _ in range(players)]
+    trivia = build_trivia(rounds, user_ids)
+    result = await db["trivias"].insert_one(trivia)
+    trivia_id = result.inserted_id
+    user_id = user_ids[0]
+
+    paths = {
+        "join_trivia / leave_trivia": user_projection(user_id),
+        "get_question_for_trivia": ACTIVE_ROUND_PROJECTION,
+        "get_trivia_ranking": {"status": 1},
+    }
+
+    print(f"Rondas: {rounds} | Jugadores: {players} | Lecturas por camino: {iterations}")
+    full_bytes, full_latency = await measure(trivia_id, None, iterations)
+    print(f"Trivia completa (lectura anterior): {full_bytes / 1024:.1f} KB, {full_latency:.3f} ms")
+    for path, projection in paths.items():
+        path_bytes, path_latency = await measure(trivia_id, projection, iterations)
+        print(
+            f"{path}: {path_bytes / 1024:.1f} KB ({full_bytes / path_bytes:.0f}x menos), "
+            f"{path_latency:.3f} ms ({full_latency / path_latency:.1f}x)"
+        )
+    await db["trivias"].delete_many({})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las lecturas proyectadas de una Trivia")
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(bench_projections(args.rounds, args.players, args.iterations))
@@ -0,0 +1,87 @@
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse
+from app.core.constants import QUESTION_STATUS
+from app.core.round_cache import build_entry
+from app.models.question import DisplayedQuestion
+from app.services.trivia_service import question_response, render_question
+
+"""
+Benchmark de la consulta de la pregunta activa
+
+Compara el costo por consulta de armar y validar un DisplayedQuestion y serializarlo como JSON (lo que hacia
+cada consulta antes) con el de agregar el tiempo restante y el estado de respuesta a la pregunta ya serializada
+de la ronda. Mide solo el armado de la respuesta, sin el resto del request. No requiere DB.
+
+Uso: python benchmarks/bench_question.py --iterations 100000 --players 1000
+"""
+
+def build_active_round(total_players: int) -> dict:
+    user_ids = [f"{i:024x}" for i in range(total_players)]
+    trivia = {
+        "status": "playing",
+        "user_ids_invitations": user_ids,
+        "total_rounds": 10,
+        "rounds": [{
+            "id": "640f92a18b545c7b5f34f4b0",
+            "question": "¿Cuál es la capital de Francia?",
+            "possible_answers": ["Madrid", "Berlín", "Roma", "París"],
+            "difficulty": 1,
+            "round_count": 1,
+            "round_endtime": datetime.utcnow() + timedelta(minutes=10),
+        }],
+    }
+    # La mitad de los jugadores ya respondió la ronda
+    return build_entry(trivia, user_ids[::2])
+
+def model_response(active_round: dict, user_id: str) -> JSONResponse:
+    """
+    Respuesta como se armaba antes: un DisplayedQuestion por consulta, serializado por FastAPI
+    """
+    answered = QUESTION_STATUS[0] if user_id in active_round["answered"] else QUESTION_STATUS[1]
+    remaining_time = round(max(0, active_round["round_endtime"] - int(time.time())))
+    question = DisplayedQuestion(
+        remaining_time=remaining_time,
+        answered=answered,
+        total_rounds=active_round["total_rounds"],
+        **active_round["question"]
+    )
+    return JSONResponse(question.model_dump(mode="json"))
+
+def bench_question(iterations: int, total_players: int) -> None:
+    active_round = build_active_round(total_players)
+    user_ids = list(active_round["user_ids_invitations"])
+    for user_id in user_ids[:2]:
+        expected = json.loads(model_response(active_round, user_id).body)
+        assert json.loads(question_response(active_round, user_id).body) == expected
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        model_response(active_round, user_ids[i % total_players])
+    model_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        question_response(active_round, user_ids[i % total_players])
+    rendered_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations // 100):
+        render_question(active_round)
+    render_time = time.perf_counter() - start
+
+    print(f"Consultas: {iterations} | Jugadores: {total_players}")
+    print(f"DisplayedQuestion por consulta: {model_time / iterations * 1e6:.2f} us por consulta")
+    print(f"Pregunta serializada por ronda: {rendered_time / iterations * 1e6:.2f} us por consulta")
+    print(f"Serializar la pregunta de la ronda: {render_time / (iterations // 100) * 1e6:.2f} us por entrada del cache")
+    print(f"Aceleración: x{model_time / rendered_time:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la consulta de la pregunta activa")
+    parser.add_argument("--iterations", type=int, default=100_000)
+    parser.add_argument("--players", type=int, default=1_000)
+    args = parser.parse_args()
+    bench_question(args.iterations, args.players)
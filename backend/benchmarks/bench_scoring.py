@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import random
+import time
+import bson
+from datetime import datetime
+from app.core.config import db
+from app.core.indexes import ensure_indexes
+from app.works.trivia_manager import calculate_round_points, calculate_final_points
+
+"""
+Benchmark del calculo de puntos de una Trivia
+
+Juega, sin clientes, una Trivia con muchas rondas y jugadores (200 rondas y 5k jugadores por defecto): inserta las
+respuestas de todos los jugadores en cada ronda y la cierra con calculate_round_points, que puntúa solo esa ronda
+y suma sus puntos al acumulado de cada jugador (colección "scores"). Al final compara calculate_final_points, que
+arma "final_score" leyendo un acumulado por jugador, con el calculo anterior, que agrupaba ($group) todas las
+respuestas de la Trivia. Reporta la duración de cada cierre de ronda, de ambos cálculos finales y los documentos
+que lee cada uno, y valida que ambos entreguen los mismos puntajes. Usa la DB de testing, por lo que requiere
+TEST_MODE=1.
+
+Uso: python benchmarks/bench_scoring.py --rounds 200 --players 5000
+"""
+
+def build_round(round_count: int) -> dict:
+    return {
+        "id": str(bson.ObjectId()),
+        "question": f"Pregunta {round_count}",
+        "possible_answers": ["A", "B", "C", "D"],
+        "correct_answer_index": random.randint(0, 3),
+        "difficulty": random.randint(1, 3),
+        "round_count": round_count,
+        "round_endtime": datetime.utcnow(),
+    }
+
+async def create_trivia(user_ids: list, rounds: list) -> str:
+    result = await db["trivias"].insert_one({
+        "name": "Benchmark",
+        "description": "Calculo de puntos",
+        "question_ids": [round_data["id"] for round_data in rounds],
+        "user_ids_invitations": user_ids,
+        "joined_users": user_ids,
+        "round_time_sec": 600,
+        "total_rounds": len(rounds),
+        "status": "playing",
+        "rounds": rounds,
+    })
+    return str(result.inserted_id)
+
+async def insert_answers(trivia_id: str, round_data: dict, user_ids: list) -> None:
+    now = datetime.utcnow()
+    await db["answers"].insert_many([
+        {
+            "trivia_id": trivia_id,
+            "round_id": round_data["id"],
+            "round_count": round_data["round_count"],
+            "user_id": user_id,
+            "answer_index": random.randint(1, 4),
+            "submitted_at": now,
+        }
+        for user_id in user_ids
+    ])
+
+async def legacy_final(trivia_id: str) -> dict:
+    """
+    Calculo anterior: agrupa todas las respuestas de la Trivia
+    """
+    return {
+        total["_id"]: total["score"]
+        async for total in db["answers"].aggregate([
+            {"$match": {"trivia_id": trivia_id}},
+            {"$group": {"_id": "$user_id", "score": {"$sum": "$score"}}}
+        ])
+    }
+
+async def bench_scoring(rounds: int, players: int) -> None:
+    await ensure_indexes()
+    user_ids = [str(bson.ObjectId()) for _ in range(players)]
+    trivia_rounds = [build_round(round_count) for round_count in range(1, rounds + 1)]
+    trivia_id = await create_trivia(user_ids, trivia_rounds)
+    try:
+        close_times = []
+        for round_data in trivia_rounds:
+            await insert_answers(trivia_id, round_data, user_ids)
+            start = time.perf_counter()
+            await calculate_round_points(trivia_id, round_data["round_count"])
+            close_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        legacy_scores = await legacy_final(trivia_id)
+        legacy_time = time.perf_counter() - start
+        totals_read = await db["scores"].count_documents({"trivia_id": trivia_id})
+
+        start = time.perf_counter()
+        await calculate_final_points(trivia_id)
+        final_time = time.perf_counter() - start
+
+        trivia = await db["trivias"].find_one({"_id": bson.ObjectId(trivia_id)}, {"final_score": 1})
+        final_scores = {score["user_id"]: score["score"] for score in trivia["final_score"]}
+        assert final_scores == legacy_scores, "Los puntajes finales no coinciden"
+
+        print(f"Rondas: {rounds} | Jugadores: {players} | Respuestas: {rounds * players}")
+        print(
+            f"Cierre de ronda: promedio {sum(close_times) / len(close_times) * 1000:.1f} ms, "
+            f"primera {close_times[0] * 1000:.1f} ms, ultima {close_times[-1] * 1000:.1f} ms"
+        )
+        print(f"Puntaje final anterior ($group): {legacy_time * 1000:.1f} ms, lee {rounds * players} respuestas")
+        print(f"Puntaje final acumulado:         {final_time * 1000:.1f} ms, lee {totals_read} acumulados")
+    finally:
+        await db["trivias"].delete_one({"_id": bson.ObjectId(trivia_id)})
+        await db["answers"].delete_many({"trivia_id": trivia_id})
+        await db["scores"].delete_many({"trivia_id": trivia_id})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del calculo de puntos de una Trivia")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--players", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(bench_scoring(args.rounds, args.players))
@@ -0,0 +1,139 @@
+import asyncio
+import time
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.core.answer_buffer import AnswerBuffer
+from app.core.constants import ANSWER_FLUSH_MAX
+
+TOTAL_ANSWERS = 20_000
+
+class FakeAnswersCollection:
+    """
+    Colección en memoria con la semántica del indice único (trivia_id, round_id, user_id) y de bulk_write sin orden
+    """
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.keys = set()
+        self.bulk_writes = 0
+
+    async def bulk_write(self, requests, ordered=True):
+        self.bulk_writes += 1
+        await asyncio.sleep(self.delay)
+        errors = []
+        for index, request in enumerate(requests):
+            answer = request._doc
+            key = (answer["trivia_id"], answer["round_id"], answer["user_id"])
+            if key in self.keys:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+            else:
+                self.keys.add(key)
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(requests) - len(errors)
+            })
+
+def build_answer(user_id: str, round_count: int = 1) -> dict:
+    return {"trivia_id": "t1", "round_id": f"q{round_count}", "round_count": round_count, "user_id": user_id}
+
+def new_buffer(collection: FakeAnswersCollection) -> AnswerBuffer:
+    answer_buffer = AnswerBuffer()
+    answer_buffer._initialize()
+    answer_buffer._collection = collection
+    answer_buffer._score_late = record_late_answers
+    answer_buffer._count_answers = record_counted_answers
+    record_late_answers.calls = []
+    record_counted_answers.calls = {}
+    return answer_buffer
+
+async def record_late_answers(trivia_id: str, round_count: int, user_ids: list) -> None:
+    record_late_answers.calls.append((trivia_id, round_count, sorted(user_ids)))
+
+async def record_counted_answers(trivia_id: str, round_count: int, answers: int) -> None:
+    key = (trivia_id, round_count)
+    record_counted_answers.calls[key] = record_counted_answers.calls.get(key, 0) + answers
+
+def add(answer_buffer: AnswerBuffer, answer: dict, round_endtime: float = None):
+    return answer_buffer.add(answer, round_endtime or time.time() + 60)
+
+async def test_group_commit():
+    """
+    Valida que muchas respuestas simultaneas se escriban en pocos bulk_write, que cada respuesta se confirme
+    solo después de escrita y que las respuestas duplicadas sean rechazadas
+    """
+    collection = FakeAnswersCollection()
+    answer_buffer = new_buffer(collection)
+    runner = asyncio.create_task(answer_buffer.run())
+
+    answers = [build_answer(f"u{i}") for i in range(TOTAL_ANSWERS)] + [build_answer("u0"), build_answer("u1")]
+    results = await asyncio.gather(*[add(answer_buffer, answer) for answer in answers], return_exceptions=True)
+    runner.cancel()
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 2 and all(isinstance(error, DuplicateKeyError) for error in errors), errors
+    assert len(collection.keys) == TOTAL_ANSWERS
+    assert collection.bulk_writes <= TOTAL_ANSWERS // ANSWER_FLUSH_MAX + 2, f"{collection.bulk_writes} escrituras"
+    assert len(answer_buffer) == 0
+    assert record_late_answers.calls == [], "Respuestas lejos del termino de la ronda no son tardías"
+    assert record_counted_answers.calls == {("t1", 1): TOTAL_ANSWERS}, "Se contaron respuestas no escritas"
+
+async def test_flush_round():
+    """
+    Valida que "flush_round" escriba de inmediato el buffer de la ronda, sin esperar el intervalo, y que
+    espere una escritura en curso de la misma ronda
+    """
+    collection = FakeAnswersCollection(delay=0.05)
+    answer_buffer = new_buffer(collection)
+
+    first = asyncio.create_task(add(answer_buffer, build_answer("u1")))
+    other_round = asyncio.create_task(add(answer_buffer, build_answer("u1", round_count=2)))
+    await asyncio.sleep(0)
+    writing = asyncio.create_task(answer_buffer.flush([("t1", 1)]))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(add(answer_buffer, build_answer("u2")))
+    await asyncio.sleep(0)
+
+    await answer_buffer.flush_round("t1", 1)
+    await asyncio.sleep(0)
+    assert first.done() and second.done() and writing.done()
+    assert not other_round.done()
+    assert len(answer_buffer) == 1
+    await answer_buffer.flush()
+    await asyncio.sleep(0)
+    assert other_round.done()
+
+async def test_late_answers():
+    """
+    Valida que las respuestas escritas al termino de su ronda (que su cierre, quizás en otro proceso, pudo no
+    ver) se entreguen para ser puntuadas antes de confirmarse, sin incluir las rechazadas
+    """
+    collection = FakeAnswersCollection()
+    answer_buffer = new_buffer(collection)
+    ended = time.time()
+
+    async def confirmed(answer):
+        await add(answer_buffer, answer, ended)
+        return list(record_late_answers.calls)
+
+    late = [asyncio.create_task(confirmed(build_answer(user_id))) for user_id in ["u1", "u2"]]
+    on_time = asyncio.create_task(add(answer_buffer, build_answer("u3", round_count=2)))
+    await asyncio.sleep(0)
+    await answer_buffer.flush()
+    assert [await task for task in late] == [[("t1", 1, ["u1", "u2"])]] * 2
+    await on_time
+
+    duplicated = asyncio.create_task(add(answer_buffer, build_answer("u1"), ended))
+    await asyncio.sleep(0)
+    await answer_buffer.flush()
+    try:
+        await duplicated
+    except DuplicateKeyError:
+        pass
+    assert record_late_answers.calls == [("t1", 1, ["u1", "u2"])]
+
+async def test_answer_buffer():
+    await test_group_commit()
+    await test_flush_round()
+    await test_late_answers()
+
+if __name__ == "__main__":
+    asyncio.run(test_answer_buffer())
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi import HTTPException
+from app.core.config import db
+from app.core.indexes import ensure_indexes
+from app.services.trivia_service import submit_answer, round_cache
+from app.works.trivia_manager import start_answer_buffer_task, stop_answer_buffer_task
+
+"""
+Test de respuestas simultaneas
+
+Inserta una Trivia en juego con muchos jugadores y una ronda activa, y envía a la vez una respuesta de cada
+jugador mas respuestas repetidas. Valida que cada jugador quede con exactamente una respuesta registrada en la
+colección de respuestas (indice único) y que las repetidas sean rechazadas. Requiere MONGO_URI y TEST_MODE=1.
+Con ANSWER_BUFFER=1 valida lo mismo escribiendo las respuestas con el AnswerBuffer.
+"""
+
+TOTAL_PLAYERS = 10_000
+DUPLICATED_ANSWERS = 1_000
+QUESTION_ID = "test_answers_question"
+
+def player(user_id: str) -> dict:
+    return {"id": user_id, "role": "player", "email": f"{user_id}@answers.com"}
+
+async def create_trivia(user_ids: list, round_endtime: datetime) -> str:
+    """
+    Crea una Trivia en juego cuya ronda activa termina en "round_endtime"
+    """
+    result = await db["trivias"].insert_one({
+        "name": "Test de respuestas",
+        "description": "Respuestas simultaneas",
+        "question_ids": [QUESTION_ID],
+        "user_ids_invitations": user_ids,
+        "joined_users": user_ids,
+        "status": "playing",
+        "round_time_sec": 600,
+        "total_rounds": 1,
+        "rounds": [{
+            "id": QUESTION_ID,
+            "question": "¿Cuánto es 2 + 2?",
+            "possible_answers": ["3", "4", "5", "22"],
+            "correct_answer_index": 1,
+            "difficulty": "easy",
+            "round_count": 1,
+            "round_endtime": round_endtime,
+        }]
+    })
+    return str(result.inserted_id)
+
+async def rejected(trivia_id: str, answer_index: int, current_user: dict) -> HTTPException:
+    try:
+        await submit_answer(trivia_id, QUESTION_ID, answer_index, current_user)
+    except HTTPException as e:
+        return e
+    raise AssertionError("La respuesta debía ser rechazada")
+
+async def test_concurrent_answers():
+    """
+    Envía a la vez una respuesta por jugador y DUPLICATED_ANSWERS respuestas repetidas
+    """
+    user_ids = [str(ObjectId()) for _ in range(TOTAL_PLAYERS)]
+    trivia_id = await create_trivia(user_ids, datetime.utcnow() + timedelta(seconds=600))
+    submissions = [(user_id, i % 4 + 1) for i, user_id in enumerate(user_ids)]
+    submissions += [(user_ids[i], 1) for i in range(DUPLICATED_ANSWERS)]
+
+    results = await asyncio.gather(
+        *[submit_answer(trivia_id, QUESTION_ID, answer, player(user_id)) for user_id, answer in submissions],
+        return_exceptions=True
+    )
+    accepted = [result for result in results if not isinstance(result, Exception)]
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(accepted) == TOTAL_PLAYERS, f"Se aceptaron {len(accepted)} respuestas"
+    assert len(errors) == DUPLICATED_ANSWERS, f"Se rechazaron {len(errors)} respuestas"
+    assert all(isinstance(e, HTTPException) and e.status_code == 400 for e in errors), errors[:3]
+
+    responses = await db["answers"].find({"trivia_id": trivia_id, "round_id": QUESTION_ID}).to_list(None)
+    assert len(responses) == TOTAL_PLAYERS
+    assert {response["user_id"] for response in responses} == set(user_ids)
+
+async def test_rejected_answers():
+    """
+    Valida que cada condición incumplida sea informada con su error
+    """
+    user_ids = [str(ObjectId()) for _ in range(2)]
+    trivia_id = await create_trivia(user_ids, datetime.utcnow() + timedelta(seconds=600))
+
+    error = await rejected(trivia_id, 1, player(str(ObjectId())))
+    assert error.status_code == 403
+    error = await rejected(trivia_id, 5, player(user_ids[0]))
+    assert error.status_code == 400 and "entre 1 y 4" in error.detail
+    error = await rejected(trivia_id, 0, player(user_ids[0]))
+    assert error.status_code == 400 and "entre 1 y 4" in error.detail
+
+    expired_trivia_id = await create_trivia(user_ids, datetime.utcnow() - timedelta(seconds=1))
+    error = await rejected(expired_trivia_id, 1, player(user_ids[0]))
+    assert error.status_code == 400 and "expirado" in error.detail
+
+    # Una ronda cerrada (al cerrar la ronda, el motor de rondas invalida la entrada del cache)
+    await db["trivias"].update_one({"_id": ObjectId(trivia_id)}, {"$set": {"rounds.0.correct_answer": "4"}})
+    round_cache.invalidate(trivia_id)
+    error = await rejected(trivia_id, 1, player(user_ids[1]))
+    assert error.status_code == 404
+
+async def test_answers():
+    await ensure_indexes()
+    await start_answer_buffer_task()
+    try:
+        await test_concurrent_answers()
+        await test_rejected_answers()
+    finally:
+        await stop_answer_buffer_task()
+        await db["trivias"].delete_many({"question_ids": QUESTION_ID})
+        await db["answers"].delete_many({"round_id": QUESTION_ID})
+
+if __name__ == "__main__":
+    asyncio.run(test_answers())
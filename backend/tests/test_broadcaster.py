@@ -0,0 +1,51 @@
+import asyncio
+from app.core.broadcaster import Broadcaster
+
+SUBSCRIBERS = 10_000
+ROUNDS = 5
+
+async def test_fan_out():
+    """
+    Conecta muchos suscriptores a una misma llave y valida que todos reciban los mismos eventos,
+    con una sola consulta por evento (mas la consulta inicial)
+    """
+    broadcaster = Broadcaster()
+    broadcaster._initialize()
+    source = {"round": 0, "polls": 0}
+
+    async def poll(key, state):
+        source["polls"] += 1
+        current = source["round"]
+        snapshot = [{"event": "round_opened", "round": current}] if current else []
+        if state is None:
+            return snapshot, current, snapshot
+        events = [{"event": "round_opened", "round": r} for r in range(state + 1, current + 1)]
+        if current == ROUNDS:
+            events.append({"event": "trivia_ended", "final": True})
+        return events, current, snapshot
+
+    queues = [broadcaster.subscribe("t1", poll) for _ in range(SUBSCRIBERS)]
+    await asyncio.sleep(0.01)
+    for round_count in range(1, ROUNDS + 1):
+        source["round"] = round_count
+        broadcaster.wake("t1")
+        await asyncio.sleep(0.01)
+
+    for queue in queues:
+        received = [queue.get_nowait() for _ in range(queue.qsize())]
+        assert [event.get("round") for event in received] == list(range(1, ROUNDS + 1)) + [None]
+    assert source["polls"] == ROUNDS + 1, f"Se hicieron {source['polls']} consultas"
+
+    # El canal se cierra con el evento final; un suscriptor nuevo recibe el estado actual
+    for queue in queues:
+        broadcaster.unsubscribe("t1", queue)
+    assert broadcaster.subscribers() == 0
+    queue = broadcaster.subscribe("t1", poll)
+    await asyncio.sleep(0.01)
+    assert queue.get_nowait() == {"event": "round_opened", "round": ROUNDS}
+
+async def test_broadcaster():
+    await test_fan_out()
+
+if __name__ == "__main__":
+    asyncio.run(test_broadcaster())
@@ -0,0 +1,110 @@
+import asyncio
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.core.config import db
+from app.core.indexes import ensure_indexes
+from app.services.trivia_service import get_trivia_details
+from app.works.trivia_manager import calculate_round_points, calculate_final_points
+from app.works.trivia_runner import migrate_embedded_responses
+
+"""
+Test de la migración de las respuestas guardadas dentro de las rondas
+
+Inserta Trivias con el formato anterior a la colección de respuestas (respuestas y puntajes dentro de cada
+ronda): una terminada y otra en juego, con una ronda cerrada y otra abierta. Ejecuta la migración dos veces y
+valida que el detalle de la Trivia terminada muestre los mismos puntajes, que no se dupliquen respuestas y que
+el puntaje final de la Trivia en juego incluya la ronda cerrada antes de la migración. Requiere MONGO_URI y
+TEST_MODE=1.
+"""
+
+ADMIN = {"id": str(ObjectId()), "role": "admin", "email": "admin@embedded.com"}
+USER_IDS = [str(ObjectId()) for _ in range(3)]
+
+def legacy_round(round_count: int, answers: dict, difficulty: int, closed: bool) -> dict:
+    """
+    Ronda con el formato anterior. "answers" tiene el indice de respuesta (desde 1) de cada jugador que
+    respondió; la respuesta correcta es la primera.
+    """
+    round_data = {
+        "id": str(ObjectId()),
+        "question": f"Pregunta {round_count}",
+        "possible_answers": ["A", "B", "C", "D"],
+        "correct_answer_index": 0,
+        "difficulty": difficulty,
+        "round_count": round_count,
+        "round_endtime": datetime.utcnow() - timedelta(seconds=1),
+        "responses": [
+            {"user_id": user_id, "answer_index": answer_index, "submitted_at": datetime.utcnow()}
+            for user_id, answer_index in answers.items()
+        ]
+    }
+    if closed:
+        round_data["correct_answer"] = "A"
+        round_data["round_score"] = [
+            {"user_id": user_id, "score": difficulty if answers.get(user_id) == 1 else 0} for user_id in USER_IDS
+        ]
+    return round_data
+
+async def create_trivia(status: str, rounds: list, final_score: list = None) -> str:
+    trivia = {
+        "name": "Test de migración",
+        "description": "Respuestas dentro de las rondas",
+        "question_ids": [round_data["id"] for round_data in rounds],
+        "user_ids_invitations": USER_IDS,
+        "joined_users": USER_IDS,
+        "round_time_sec": 10,
+        "total_rounds": len(rounds),
+        "status": status,
+        "rounds": rounds
+    }
+    if final_score is not None:
+        trivia["final_score"] = final_score
+    result = await db["trivias"].insert_one(trivia)
+    return str(result.inserted_id)
+
+async def test_embedded_responses():
+    await ensure_indexes()
+    ended_id = await create_trivia("ended", [
+        legacy_round(1, {USER_IDS[0]: 1, USER_IDS[1]: 2}, 2, True),
+        legacy_round(2, {USER_IDS[0]: 3, USER_IDS[1]: 1}, 3, True),
+    ], [{"user_id": user_id, "score": score} for user_id, score in zip(USER_IDS, [2, 3, 0])])
+    playing_id = await create_trivia("playing", [
+        legacy_round(1, {USER_IDS[0]: 1, USER_IDS[1]: 2}, 1, True),
+        legacy_round(2, {USER_IDS[1]: 1}, 2, False),
+    ])
+    try:
+        await migrate_embedded_responses()
+        await migrate_embedded_responses()
+
+        embedded = await db["trivias"].count_documents({
+            "_id": {"$in": [ObjectId(ended_id), ObjectId(playing_id)]},
+            "$or": [{"rounds.responses": {"$exists": True}}, {"rounds.round_score": {"$exists": True}}]
+        })
+        assert embedded == 0, "Quedaron respuestas dentro de las rondas"
+        assert await db["answers"].count_documents({"trivia_id": ended_id}) == 4, "Se duplicaron respuestas"
+        assert await db["answers"].count_documents({"trivia_id": playing_id}) == 3, "Se duplicaron respuestas"
+
+        # El detalle de la Trivia terminada coincide con su puntaje final
+        trivia = await get_trivia_details(ended_id, ADMIN)
+        totals = {user_id: 0 for user_id in USER_IDS}
+        for round_item in trivia.rounds:
+            assert len(round_item.responses) == 2, "El detalle no muestra las respuestas de la ronda"
+            for score in round_item.round_score:
+                totals[score.user_id] += score.score
+        assert totals == {score.user_id: score.score for score in trivia.final_score}, "Los puntajes no coinciden"
+
+        # La ronda abierta se puntúa con la respuesta migrada y el puntaje final incluye la ronda ya cerrada
+        await calculate_round_points(playing_id, 2)
+        await calculate_final_points(playing_id)
+        trivia = await db["trivias"].find_one({"_id": ObjectId(playing_id)}, {"final_score": 1})
+        final_score = {score["user_id"]: score["score"] for score in trivia["final_score"]}
+        assert final_score == {USER_IDS[0]: 1, USER_IDS[1]: 2, USER_IDS[2]: 0}, f"Puntaje final: {final_score}"
+    finally:
+        for trivia_id in [ended_id, playing_id]:
+            await db["trivias"].delete_one({"_id": ObjectId(trivia_id)})
+            await db["answers"].delete_many({"trivia_id": trivia_id})
+            await db["scores"].delete_many({"trivia_id": trivia_id})
+
+
+if __name__ == "__main__":
+    asyncio.run(test_embedded_responses())
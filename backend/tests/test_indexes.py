@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from app.core.config import db
+from app.core.indexes import ensure_indexes
+from app.models.user import UserCreate
+from app.services.user_service import create_user
+
+"""
+Test de los indices de la DB
+
+Crea los indices del registro (app/core/indexes.py) y valida con explain() que cada consulta de los servicios use
+un indice y no recorra la colección completa (COLLSCAN). También valida que el indice único de "email" rechace
+registros simultaneos con el mismo email. Requiere MONGO_URI y TEST_MODE=1.
+"""
+
+USER_ID = str(ObjectId())
+TRIVIA_ID = str(ObjectId())
+QUESTION_ID = str(ObjectId())
+TOTAL_REGISTRATIONS = 20
+TEST_EMAIL = "test_indexes@indexes.com"
+
+# (consulta, colección, filtro) de cada consulta de los servicios. Las agregaciones se validan con su $match inicial
+SERVICE_QUERIES = [
+    ("get_user_by_email", "users", {"email": TEST_EMAIL}),
+    ("get_trivia", "trivias", {"_id": ObjectId(TRIVIA_ID)}),
+    ("start_trivia", "trivias", {"_id": ObjectId(TRIVIA_ID), "status": "waiting_start"}),
+    ("join_trivia", "trivias", {"joined_users": USER_ID, "status": {"$in": ["waiting_start", "playing"]}}),
+    ("get_trivia_joined", "trivias", {"joined_users": USER_ID, "status": {"$ne": "ended"}}),
+    ("get_trivias_invitations_for_user", "trivias", {"user_ids_invitations": USER_ID, "status": "waiting_start"}),
+    ("get_trivias_played_by_user", "trivias", {"user_ids_invitations": USER_ID, "status": "ended"}),
+    ("get_trivia_using_question", "trivias", {"question_ids": QUESTION_ID}),
+    ("check_trivias", "trivias", {"status": "waiting_start", "pending_joins": {"$lte": 0}}),
+    ("resume_interrupted_trivias", "trivias", {"status": "playing"}),
+    ("expedite_requested_rounds", "trivias", {"expedite_round": {"$exists": True}}),
+    (
+        "calculate_round_points",
+        "trivias",
+        {"_id": ObjectId(TRIVIA_ID), "rounds": {"$elemMatch": {"round_count": 1, "correct_answer": {"$exists": False}}}}
+    ),
+    ("get_trivia_responses", "answers", {"trivia_id": TRIVIA_ID}),
+    ("load_active_round", "answers", {"trivia_id": TRIVIA_ID, "round_id": "q1"}),
+    ("calculate_final_points", "scores", {"trivia_id": TRIVIA_ID}),
+    ("renew", "leases", {"_id": {"$in": ["trivia:test_indexes"]}, "owner": "test_indexes"}),
+    ("find_expired", "leases", {"_id": {"$regex": "^trivia:"}, "expires_at": {"$lt": datetime.utcnow()}}),
+]
+
+def plan_stages(plan: dict) -> set:
+    """
+    Retorna las etapas ("stage") de un plan de explain(), recorriendo sus etapas hijas
+    """
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for value in plan.values():
+            stages |= plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= plan_stages(value)
+    return stages
+
+async def test_queries_use_indexes():
+    """
+    Valida que el plan ganador de cada consulta use un indice
+    """
+    for name, collection_name, query in SERVICE_QUERIES:
+        explain = await db[collection_name].find(query).explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        assert "COLLSCAN" not in stages, f"La consulta de {name} recorre la colección: {stages}"
+        assert stages & {"IXSCAN", "IDHACK", "EXPRESS_IXSCAN"}, f"La consulta de {name} no usa un indice: {stages}"
+
+async def test_unique_email():
+    """
+    Registra a la vez varios usuarios con el mismo email: solo uno debe ser creado
+    """
+    user = UserCreate(name="Indexes", email=TEST_EMAIL, password="1234", role="player")
+    results = await asyncio.gather(*[create_user(user) for _ in range(TOTAL_REGISTRATIONS)], return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == TOTAL_REGISTRATIONS - 1, f"Se crearon {TOTAL_REGISTRATIONS - len(errors)} usuarios"
+    assert all(isinstance(e, HTTPException) and e.status_code == 400 for e in errors), errors[:3]
+    assert await db["users"].count_documents({"email": TEST_EMAIL}) == 1
+
+async def test_indexes():
+    await db["users"].delete_many({"email": TEST_EMAIL})
+    await ensure_indexes()
+    try:
+        await test_queries_use_indexes()
+        await test_unique_email()
+    finally:
+        await db["users"].delete_many({"email": TEST_EMAIL})
+
+if __name__ == "__main__":
+    asyncio.run(test_indexes())
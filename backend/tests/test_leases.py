@@ -0,0 +1,203 @@
+import asyncio
+import os
+import random
+import time
+import multiprocessing
+
+"""
+Test de leases con varios procesos contra la misma DB
+
+Cada proceso usa su propio LeaseManager (como un worker de uvicorn o un nodo distinto). Se valida que
+un lease tenga un solo dueño y que los leases de un proceso que muere sean tomados por los demás, uno a uno
+o en bloque (acquire_many), y que una ronda respondida por completo en un proceso que no está a cargo de la
+Trivia se cierre antes de su termino en el proceso a cargo.
+Requiere MONGO_URI y TEST_MODE=1.
+"""
+
+TOTAL_PROCESSES = 3
+LEASE_NAMES = [f"trivia:test_{i}" for i in range(60)]
+TEST_LEASE_TTL_SEC = 2
+
+def lease_process(conn) -> None:
+    """
+    Proceso que toma leases cuando el proceso padre lo indica y los renueva en segundo plano
+    """
+    from app.core.leases import LeaseManager
+
+    async def main():
+        lease_manager = LeaseManager()
+        loop = asyncio.get_running_loop()
+
+        async def heartbeat():
+            while True:
+                await lease_manager.renew()
+                await asyncio.sleep(TEST_LEASE_TTL_SEC / 4)
+        heartbeat_task = asyncio.create_task(heartbeat())
+
+        while True:
+            command = await loop.run_in_executor(None, conn.recv)
+            if command == "exit":
+                break
+            names = list(LEASE_NAMES)
+            random.shuffle(names)
+            if command == "acquire_many":
+                acquired = await lease_manager.acquire_many(names)
+            else:
+                acquired = [name for name in names if await lease_manager.acquire(name)]
+            conn.send(sorted(acquired))
+        heartbeat_task.cancel()
+
+    asyncio.run(main())
+
+def round_owner_process(conn, trivia_id: str) -> None:
+    """
+    Proceso a cargo de una Trivia: toma su lease, agenda el cierre de la ronda 1 para dentro de un minuto y
+    revisa las rondas por adelantar. Informa al proceso padre cuando la ronda se cierra.
+    """
+    from app.core.constants import EXPEDITE_CHECK_SEC
+    from app.works.trivia_manager import trivia_lease
+    from app.works.trivia_runner import expedite_requested_rounds, lease_manager, round_scheduler
+
+    async def main():
+        closed = asyncio.Event()
+
+        async def close_round(key, token, data):
+            closed.set()
+
+        assert await lease_manager.acquire(trivia_lease(trivia_id))
+        round_scheduler.schedule(trivia_id, time.time() + 60, 1)
+        tasks = [
+            asyncio.create_task(round_scheduler.run(close_round)),
+            asyncio.create_task(expedite_requested_rounds())
+        ]
+        conn.send("ready")
+        await closed.wait()
+        conn.send("closed")
+        # Da tiempo a eliminar la marca de la ronda antes de detener la revisión
+        await asyncio.sleep(EXPEDITE_CHECK_SEC)
+        for task in tasks:
+            task.cancel()
+        await lease_manager.release(trivia_lease(trivia_id))
+
+    asyncio.run(main())
+
+def acquire_all(connections, command: str = "acquire"):
+    for conn in connections:
+        conn.send(command)
+    return [set(conn.recv()) for conn in connections]
+
+async def clean_leases():
+    from app.core.config import db
+    await db["leases"].delete_many({})
+
+async def test_expire():
+    """
+    Un lease expirado a propósito no se renueva en el heartbeat de su dueño y lo puede tomar otro proceso.
+    Un lease tomado por otro proceso se informa como perdido en el heartbeat de su antiguo dueño.
+    """
+    from app.core.leases import LeaseManager
+    await clean_leases()
+    first, second = LeaseManager(), object.__new__(LeaseManager)
+    second._initialize()
+
+    assert await first.acquire("trivia:test_expire") and await first.acquire("trivia:test_lost")
+    await first.expire(["trivia:test_expire"])
+    assert await first.renew() == [], "El heartbeat informó un lease perdido"
+    assert not first.owns("trivia:test_expire"), "El lease expirado sigue a cargo de su dueño"
+    expired = await second.find_expired("trivia:test_", 10)
+    assert expired == ["trivia:test_expire"], "El heartbeat renovó un lease expirado"
+    assert await second.acquire("trivia:test_expire"), "Otro proceso no pudo tomar el lease expirado"
+
+    await first.expire(["trivia:test_lost"])
+    first._owned.add("trivia:test_lost")
+    assert await second.acquire("trivia:test_lost")
+    assert await first.renew() == ["trivia:test_lost"], "El heartbeat no informó el lease perdido"
+    assert not first.owns("trivia:test_lost") and second.owns("trivia:test_lost")
+    await clean_leases()
+
+async def test_expedite_round():
+    """
+    Las respuestas que completan una ronda en un proceso que no está a cargo de la Trivia adelantan su cierre
+    en el proceso a cargo
+    """
+    from bson import ObjectId
+    from app.core.config import db
+    from app.core.constants import EXPEDITE_CHECK_SEC
+    from app.core.round_answers import count_round_answers
+
+    loop = asyncio.get_running_loop()
+    trivia_id = ObjectId()
+    await db["trivias"].insert_one({
+        "_id": trivia_id, "status": "playing", "rounds": [{"round_count": 1, "players": 3, "answers": 0}]
+    })
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=round_owner_process, args=(child_conn, str(trivia_id)))
+    process.start()
+    try:
+        assert await loop.run_in_executor(None, parent_conn.poll, 30), "El proceso a cargo no tomó la Trivia"
+        assert parent_conn.recv() == "ready"
+
+        # Con dos de tres respuestas la ronda sigue abierta
+        for _ in range(2):
+            await count_round_answers(str(trivia_id), 1, 1)
+        closed = await loop.run_in_executor(None, parent_conn.poll, EXPEDITE_CHECK_SEC * 4)
+        assert not closed, "La ronda se cerró sin todas sus respuestas"
+
+        # La última respuesta, escrita en este proceso, cierra la ronda en el proceso a cargo
+        await count_round_answers(str(trivia_id), 1, 1)
+        closed = await loop.run_in_executor(None, parent_conn.poll, EXPEDITE_CHECK_SEC * 10)
+        assert closed and parent_conn.recv() == "closed", "La ronda respondida por completo no se cerró"
+        await loop.run_in_executor(None, process.join, 10)
+    finally:
+        if process.is_alive():
+            process.kill()
+        trivia = await db["trivias"].find_one_and_delete({"_id": trivia_id})
+    assert "expedite_round" not in trivia, "El proceso a cargo no eliminó la marca de la ronda"
+
+def test_leases():
+    """
+    Valida exclusividad de los leases entre procesos y la toma de leases de un proceso caído
+    """
+    os.environ["LEASE_TTL_SEC"] = str(TEST_LEASE_TTL_SEC)
+    asyncio.run(test_expire())
+    asyncio.run(test_expedite_round())
+
+    context = multiprocessing.get_context("spawn")
+    connections, processes = [], []
+    for _ in range(TOTAL_PROCESSES):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=lease_process, args=(child_conn,))
+        process.start()
+        connections.append(parent_conn)
+        processes.append(process)
+
+    # Todos los procesos compiten por los mismos leases
+    owned = acquire_all(connections)
+    for i in range(TOTAL_PROCESSES):
+        for j in range(i + 1, TOTAL_PROCESSES):
+            assert not owned[i] & owned[j], "Un lease quedó asignado a dos procesos"
+    assert set().union(*owned) == set(LEASE_NAMES), "Quedaron leases sin dueño"
+
+    # Un segundo intento no cambia de dueño los leases vigentes
+    assert acquire_all(connections) == owned, "Un proceso tomó un lease vigente de otro proceso"
+
+    # Muere el primer proceso sin liberar sus leases
+    processes[0].kill()
+    processes[0].join()
+    time.sleep(TEST_LEASE_TTL_SEC + 1)
+
+    # Los procesos vivos adoptan los leases del caído con una sola escritura (como al retomar Trivias)
+    adopted = acquire_all(connections[1:], "acquire_many")
+    assert adopted[0] & adopted[1] == set(), "Un lease adoptado quedó asignado a dos procesos"
+    assert adopted[0] | adopted[1] == set(LEASE_NAMES), "No se adoptaron los leases del proceso caído"
+    for before, after in zip(owned[1:], adopted):
+        assert before <= after, "Un proceso vivo perdió sus leases"
+
+    for conn, process in zip(connections[1:], processes[1:]):
+        conn.send("exit")
+        process.join()
+
+
+if __name__ == "__main__":
+    test_leases()
@@ -0,0 +1,90 @@
+import os
+import threading
+from pymongo import monitoring
+from app.core.config import mongo_client_options
+from app.core.metrics import MongoPoolListener
+
+"""
+Test de la configuración y de las estadísticas del pool de conexiones de MongoDB
+
+Valida que las opciones del pool se lean de las variables de entorno y que el MongoPoolListener lleve bien las
+conexiones en uso y la cola de espera, también con eventos desde varios threads (como los envía Motor). No requiere DB.
+"""
+
+ADDRESS = ("localhost", 27017)
+TOTAL_THREADS = 8
+CHECKOUTS_PER_THREAD = 10_000
+
+def new_listener() -> MongoPoolListener:
+    listener = MongoPoolListener()
+    listener._initialize()
+    return listener
+
+def test_client_options():
+    """
+    Valida que solo se pasen al driver las opciones definidas, con su tipo
+    """
+    os.environ["MONGO_MAX_POOL_SIZE"] = "200"
+    os.environ["MONGO_WAIT_QUEUE_TIMEOUT_MS"] = "500"
+    os.environ["MONGO_COMPRESSORS"] = "zstd,zlib"
+    try:
+        options = mongo_client_options()
+    finally:
+        for env_name in ["MONGO_MAX_POOL_SIZE", "MONGO_WAIT_QUEUE_TIMEOUT_MS", "MONGO_COMPRESSORS"]:
+            del os.environ[env_name]
+    assert options["maxPoolSize"] == 200 and options["waitQueueTimeoutMS"] == 500
+    assert options["compressors"] == "zstd,zlib"
+    assert "minPoolSize" not in options and options["appname"]
+
+def test_wait_queue():
+    """
+    Dos operaciones piden conexión con una sola conexión libre: una espera en la cola y la otra la obtiene
+    """
+    listener = new_listener()
+    listener.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {"maxPoolSize": 1}))
+    listener.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1, 0.001))
+    stats = listener.get_stats()
+    assert stats["max_pool_size"] == 1 and stats["open_connections"] == 1
+    assert stats["checked_out"] == 1 and stats["wait_queue"] == 1
+
+    listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, "timeout", 0.5))
+    listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+    stats = listener.get_stats()
+    assert stats["checked_out"] == 0 and stats["wait_queue"] == 0 and stats["max_wait_queue"] == 2
+    assert stats["checkouts"] == 1 and stats["checkout_failures"] == 1
+    assert stats["mean_checkout_wait_ms"] == 1.0
+
+def test_concurrent_events():
+    """
+    Envía eventos desde varios threads a la vez y valida que el estado final quede consistente
+    """
+    listener = new_listener()
+
+    def checkouts():
+        for connection_id in range(CHECKOUTS_PER_THREAD):
+            listener.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+            listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, connection_id, 0))
+            listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, connection_id))
+
+    threads = [threading.Thread(target=checkouts) for _ in range(TOTAL_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = listener.get_stats()
+    assert stats["checked_out"] == 0 and stats["wait_queue"] == 0
+    assert stats["checkouts"] == TOTAL_THREADS * CHECKOUTS_PER_THREAD
+    assert 1 <= stats["max_wait_queue"] <= TOTAL_THREADS
+
+def test_mongo_pool():
+    test_client_options()
+    test_wait_queue()
+    test_concurrent_events()
+
+
+if __name__ == "__main__":
+    test_mongo_pool()
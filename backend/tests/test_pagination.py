@@ -0,0 +1,82 @@
+import asyncio
+import json
+from fastapi import HTTPException
+from app.core.config import db
+from app.services.question_service import get_all_questions, stream_all_questions
+
+"""
+Test de la paginación por llave y de la exportación NDJSON
+
+Inserta preguntas y valida que recorrer todas las páginas con el cursor X-Next-Cursor (y exportarlas como NDJSON)
+entregue cada pregunta exactamente una vez, en orden de ID. Requiere MONGO_URI y TEST_MODE=1.
+"""
+
+TOTAL_QUESTIONS = 2_500
+PAGE_LIMIT = 1_000
+TEST_TAG = "test_pagination"
+
+async def create_questions() -> list:
+    result = await db["questions"].insert_many([
+        {"question": f"{TEST_TAG} {i}", "distractors": ["a", "b", "c"], "answer": "d", "difficulty": 1, "tag": TEST_TAG}
+        for i in range(TOTAL_QUESTIONS)
+    ])
+    return [str(question_id) for question_id in result.inserted_ids]
+
+async def test_pages(question_ids: list):
+    """
+    Recorre todas las páginas y valida que no se repitan ni se pierdan preguntas
+    """
+    seen = []
+    after = None
+    pages = 0
+    while True:
+        questions, after = await get_all_questions(PAGE_LIMIT, after)
+        pages += 1
+        assert len(questions) <= PAGE_LIMIT
+        seen.extend(question.id for question in questions if question.question.startswith(TEST_TAG))
+        if after is None:
+            break
+    assert seen == sorted(question_ids), "Las páginas no entregan cada pregunta una vez y en orden"
+    assert pages >= TOTAL_QUESTIONS // PAGE_LIMIT
+
+    # Partir desde la mitad entrega solo las preguntas posteriores
+    questions, _ = await get_all_questions(PAGE_LIMIT, question_ids[TOTAL_QUESTIONS // 2])
+    assert questions[0].id == question_ids[TOTAL_QUESTIONS // 2 + 1]
+
+async def test_ndjson(question_ids: list):
+    """
+    Exporta todas las preguntas como NDJSON y valida cada linea
+    """
+    exported = []
+    async for line in stream_all_questions():
+        question = json.loads(line)
+        if question["question"].startswith(TEST_TAG):
+            exported.append(question["id"])
+    assert exported == sorted(question_ids)
+
+async def test_invalid_cursor():
+    """
+    Valida que un cursor invalido sea rechazado, también al exportar (antes de iniciar el stream)
+    """
+    for export in [False, True]:
+        try:
+            if export:
+                stream_all_questions("no-es-un-id")
+            else:
+                await get_all_questions(PAGE_LIMIT, "no-es-un-id")
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("El cursor invalido debía ser rechazado")
+
+async def test_pagination():
+    question_ids = await create_questions()
+    try:
+        await test_pages(question_ids)
+        await test_ndjson(question_ids)
+        await test_invalid_cursor()
+    finally:
+        await db["questions"].delete_many({"tag": TEST_TAG})
+
+if __name__ == "__main__":
+    asyncio.run(test_pagination())
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from fastapi import HTTPException
+from app.core.config import db
+from app.services.question_service import import_questions
+
+"""
+Test de la importación masiva de preguntas
+
+Importa archivos NDJSON y CSV entregados en bloques pequeños (que cortan lineas y caracteres UTF-8 a la mitad)
+con filas validas e invalidas. Valida que se inserten todas las filas validas y que cada fila invalida se
+informe con su numero de linea. Requiere MONGO_URI y TEST_MODE=1.
+"""
+
+TOTAL_QUESTIONS = 5_000
+TEST_PREFIX = "test_question_import"
+STREAM_CHUNK_BYTES = 7
+
+async def stream(content: str):
+    data = content.encode("utf-8")
+    for start in range(0, len(data), STREAM_CHUNK_BYTES):
+        yield data[start:start + STREAM_CHUNK_BYTES]
+
+def question_line(i: int) -> str:
+    return json.dumps({
+        "question": f"{TEST_PREFIX} ¿Pregunta número {i}?",
+        "distractors": ["Madrid", "Berlín", "Roma"],
+        "answer": "París",
+        "difficulty": i % 3 + 1,
+    }, ensure_ascii=False)
+
+async def count_imported() -> int:
+    return await db["questions"].count_documents({"question": {"$regex": f"^{TEST_PREFIX}"}})
+
+async def test_ndjson_import():
+    lines = [question_line(i) for i in range(TOTAL_QUESTIONS)]
+    lines[10] = "{esto no es json"
+    lines[20] = json.dumps({"question": f"{TEST_PREFIX} sin respuesta", "distractors": [], "difficulty": 1})
+    lines[30] = question_line(30).replace('"difficulty": 1', '"difficulty": 5')
+    lines.insert(40, "")
+
+    result = await import_questions(stream("\n".join(lines) + "\n"), "ndjson")
+    assert result.inserted == TOTAL_QUESTIONS - 3, f"Se importaron {result.inserted} preguntas"
+    assert result.failed == 3
+    assert [error.row for error in result.errors] == [11, 21, 31]
+    assert "JSON" in result.errors[0].error and "answer" in result.errors[1].error
+    assert "difficulty" in result.errors[2].error
+    assert await count_imported() == TOTAL_QUESTIONS - 3
+
+async def test_csv_import():
+    content = "\n".join([
+        "question,answer,difficulty,distractor_1,distractor_2,distractor_3",
+        f"{TEST_PREFIX} csv 1,París,1,Madrid,Berlín,Roma",
+        f'"{TEST_PREFIX} csv 2, con coma y ""comillas""",4,2,3,5,',
+        f'"{TEST_PREFIX} csv 3\ncon salto de linea",Sí,3,No,,',
+        f"{TEST_PREFIX} csv 4,París,9,Madrid,Berlín,Roma",
+        f"{TEST_PREFIX} csv 5,París,1",
+    ])
+    result = await import_questions(stream(content), "csv")
+    assert result.inserted == 3 and result.failed == 2, result
+    assert [error.row for error in result.errors] == [6, 7]
+
+    question = await db["questions"].find_one({"question": f'{TEST_PREFIX} csv 2, con coma y "comillas"'})
+    assert question["distractors"] == ["3", "5"] and question["difficulty"] == 2
+    question = await db["questions"].find_one({"question": f"{TEST_PREFIX} csv 3\ncon salto de linea"})
+    assert question["distractors"] == ["No"]
+
+    try:
+        await import_questions(stream("question,distractor_1\nhola,chao\n"), "csv")
+    except HTTPException as e:
+        assert e.status_code == 400 and "answer" in e.detail
+    else:
+        raise AssertionError("Un CSV sin las columnas requeridas debía ser rechazado")
+
+async def test_question_import():
+    try:
+        await test_ndjson_import()
+        await db["questions"].delete_many({"question": {"$regex": f"^{TEST_PREFIX}"}})
+        await test_csv_import()
+    finally:
+        await db["questions"].delete_many({"question": {"$regex": f"^{TEST_PREFIX}"}})
+
+if __name__ == "__main__":
+    asyncio.run(test_question_import())
@@ -0,0 +1,53 @@
+import asyncio
+from bson import ObjectId
+from fastapi import HTTPException
+from app.core.config import db
+from app.models.question import Question, QuestionUpdate
+from app.services.question_service import create_question, delete_question, update_question
+
+"""
+Test de las validaciones al editar y eliminar preguntas
+
+Valida que una pregunta incluida en una Trivia no se pueda editar ni eliminar, y que una pregunta sin Trivias
+(o cuya Trivia fue eliminada) si se pueda. Requiere MONGO_URI y TEST_MODE=1.
+"""
+
+def build_question(text: str) -> Question:
+    return Question(
+        question=text,
+        distractors=["1", "2", "3"],
+        answer="4",
+        difficulty=1
+    )
+
+async def rejected(action) -> HTTPException:
+    try:
+        await action
+    except HTTPException as e:
+        return e
+    raise AssertionError("La acción debía ser rechazada")
+
+async def test_question_guards():
+    used_question = await create_question(build_question("Pregunta en uso"))
+    free_question = await create_question(build_question("Pregunta libre"))
+    trivia = await db["trivias"].insert_one({
+        "name": "Test de preguntas",
+        "question_ids": [used_question.id],
+        "user_ids_invitations": [str(ObjectId())],
+        "status": "ended",
+    })
+
+    error = await rejected(delete_question(used_question.id))
+    assert error.status_code == 400 and str(trivia.inserted_id) in error.detail
+    error = await rejected(update_question(used_question.id, QuestionUpdate(question="Otra pregunta")))
+    assert error.status_code == 400
+
+    updated = await update_question(free_question.id, QuestionUpdate(question="Pregunta editada"))
+    assert updated["question"] == "Pregunta editada"
+    assert (await delete_question(free_question.id)).id == free_question.id
+
+    await db["trivias"].delete_one({"_id": trivia.inserted_id})
+    assert (await delete_question(used_question.id)).id == used_question.id
+
+if __name__ == "__main__":
+    asyncio.run(test_question_guards())
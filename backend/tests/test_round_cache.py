@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta
+from app.core.round_cache import ActiveRoundCache, build_entry
+
+CONCURRENT_POLLS = 5_000
+
+def build_trivia(round_count: int) -> dict:
+    return {
+        "status": "playing",
+        "user_ids_invitations": ["u1", "u2"],
+        "total_rounds": 3,
+        "rounds": [{
+            "id": f"q{round_count}",
+            "question": "¿Pregunta?",
+            "possible_answers": ["A", "B", "C", "D"],
+            "difficulty": 2,
+            "round_count": round_count,
+            "round_endtime": datetime.utcnow() + timedelta(seconds=10)
+        }]
+    }
+
+async def test_single_load():
+    """
+    Valida que muchas consultas simultaneas sin entrada generen una sola lectura a la DB
+    """
+    round_cache = ActiveRoundCache()
+    round_cache._initialize()
+    loads = {"count": 0}
+
+    async def loader(trivia_id):
+        loads["count"] += 1
+        await asyncio.sleep(0.01)
+        return build_entry(build_trivia(1), {"u1"})
+
+    entries = await asyncio.gather(*[round_cache.get("t1", loader) for _ in range(CONCURRENT_POLLS)])
+    assert loads["count"] == 1, f"Se hicieron {loads['count']} lecturas"
+    assert all(entry is entries[0] for entry in entries)
+    assert entries[0]["question"]["possible_answers"] == ["1) A", "2) B", "3) C", "4) D"]
+    assert entries[0]["answered"] == {"u1"}
+
+async def test_versioned_answers():
+    """
+    Valida que una respuesta solo se registre en la entrada de su misma ronda
+    """
+    round_cache = ActiveRoundCache()
+    round_cache._initialize()
+
+    async def loader(trivia_id):
+        return build_entry(build_trivia(2))
+
+    entry = await round_cache.get("t1", loader)
+    assert round_cache.add_answer("t1", 1, "u1") == 0
+    assert round_cache.add_answer("t1", 2, "u2") == 1
+    assert entry["answered"] == {"u2"}
+
+    # Una ronda ya cerrada no es la ronda activa
+    trivia = build_trivia(2)
+    trivia["rounds"][0]["correct_answer"] = "A"
+    assert build_entry(trivia)["question"] is None
+
+async def test_invalidate_while_loading():
+    """
+    Valida que una lectura iniciada antes de invalidar la entrada (ej: al abrir una ronda) no quede en el cache
+    """
+    round_cache = ActiveRoundCache()
+    round_cache._initialize()
+    round_counts = iter([1, 2])
+
+    async def loader(trivia_id):
+        trivia = build_trivia(next(round_counts))
+        await asyncio.sleep(0.01)
+        return build_entry(trivia)
+
+    polling = asyncio.create_task(round_cache.get("t1", loader))
+    await asyncio.sleep(0)
+    round_cache.invalidate("t1")
+    assert (await polling)["round_count"] == 1
+    assert (await round_cache.get("t1", loader))["round_count"] == 2
+
+async def test_round_cache():
+    await test_single_load()
+    await test_versioned_answers()
+    await test_invalidate_while_loading()
+
+if __name__ == "__main__":
+    asyncio.run(test_round_cache())
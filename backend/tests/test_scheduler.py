@@ -0,0 +1,111 @@
+import asyncio
+import time
+from app.core.scheduler import RoundScheduler
+
+TOTAL_TRIVIAS = 100_000
+SPREAD_SEC = 3
+
+async def run_scheduler(scheduler, handler, expected, timeout):
+    """
+    Ejecuta el scheduler hasta que el handler haya sido llamado "expected" veces
+    """
+    task = asyncio.create_task(scheduler.run(handler))
+    start = time.time()
+    while len(handler.calls) < expected and time.time() - start < timeout:
+        await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+def build_handler():
+    async def handler(key, token, data):
+        handler.calls.append((key, token, time.time()))
+    handler.calls = []
+    return handler
+
+async def test_concurrent_trivias():
+    """
+    Agenda 100k trivias con plazos repartidos en unos segundos y valida que todas se cierren,
+    en orden de plazo y con un retraso acotado
+    """
+    scheduler = RoundScheduler()
+    scheduler._initialize()
+    handler = build_handler()
+
+    now = time.time()
+    deadlines = {}
+    for i in range(TOTAL_TRIVIAS):
+        deadline = now + 0.5 + (i % 1000) * SPREAD_SEC / 1000
+        deadlines[f"trivia_{i}"] = deadline
+        scheduler.schedule(f"trivia_{i}", deadline, 1)
+    assert len(scheduler) == TOTAL_TRIVIAS
+
+    await run_scheduler(scheduler, handler, TOTAL_TRIVIAS, SPREAD_SEC + 30)
+
+    assert len(handler.calls) == TOTAL_TRIVIAS, f"Solo se cerraron {len(handler.calls)} trivias"
+    for key, token, fired_at in handler.calls:
+        assert fired_at >= deadlines[key], f"La trivia {key} se cerró antes de su plazo"
+
+    stats = scheduler.get_stats()
+    assert stats["fired"] == TOTAL_TRIVIAS
+    assert stats["pending"] == 0
+    print(f"Retraso de cierre (ms): {stats['lag_ms']}")
+    assert stats["lag_ms"]["p50"] < 1000, "El retraso mediano del scheduler es demasiado alto"
+
+async def test_reschedule_and_expedite():
+    """
+    Valida que re-agendar deje obsoleta la entrada anterior y que "expedite" solo adelante
+    el plazo si el token corresponde a la ronda agendada
+    """
+    scheduler = RoundScheduler()
+    scheduler._initialize()
+    handler = build_handler()
+
+    now = time.time()
+    scheduler.schedule("trivia_a", now + 60, 1)
+    scheduler.schedule("trivia_a", now + 60, 2)
+    scheduler.schedule("trivia_b", now + 60, 1)
+
+    assert scheduler.expedite("trivia_a", 1) is False
+    assert scheduler.expedite("trivia_a", 2) is True
+    scheduler.cancel("trivia_b")
+
+    await run_scheduler(scheduler, handler, 1, 5)
+    await asyncio.sleep(0.2)
+
+    assert [(key, token) for key, token, _ in handler.calls] == [("trivia_a", 2)]
+    assert len(scheduler) == 0
+
+async def test_retry_failed_handler():
+    """
+    Valida que una entrada cuyo handler falla se reintente (con espera creciente) hasta que el handler
+    termine bien, y que luego no quede pendiente
+    """
+    scheduler = RoundScheduler()
+    scheduler._initialize()
+
+    async def handler(key, token, data):
+        handler.calls.append((key, token, time.time()))
+        if len(handler.calls) < 3:
+            raise ConnectionError("Error transitorio de la DB")
+    handler.calls = []
+
+    scheduler.schedule("trivia_a", time.time(), 4, {"players": 1})
+    await run_scheduler(scheduler, handler, 3, 10)
+
+    assert [(key, token) for key, token, _ in handler.calls] == [("trivia_a", 4)] * 3
+    first_retry = handler.calls[1][2] - handler.calls[0][2]
+    second_retry = handler.calls[2][2] - handler.calls[1][2]
+    assert second_retry > first_retry, "La espera entre reintentos debía crecer"
+    stats = scheduler.get_stats()
+    assert stats["failed"] == 2 and stats["retrying"] == 0 and stats["pending"] == 0
+
+async def test_scheduler():
+    await test_reschedule_and_expedite()
+    await test_retry_failed_handler()
+    await test_concurrent_trivias()
+
+if __name__ == "__main__":
+    asyncio.run(test_scheduler())
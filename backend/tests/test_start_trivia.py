@@ -0,0 +1,68 @@
+import asyncio
+from bson import ObjectId
+from app.core.config import db
+from app.works.trivia_manager import start_trivia, trivia_lease, round_scheduler, lease_manager
+
+"""
+Test del inicio de una Trivia que falla después de quedar en "playing"
+
+Simula una falla al agendar la primera ronda, cuando la Trivia ya quedó en "playing" con su mazo. Valida que
+la Trivia vuelva a "waiting_start", sin mazo y sin lease, y que un nuevo intento (como el del ciclo de revisión)
+la inicie correctamente. Requiere MONGO_URI y TEST_MODE=1.
+"""
+
+async def create_trivia() -> str:
+    """
+    Crea una Trivia lista para iniciar, con 2 preguntas y todos sus jugadores unidos
+    """
+    result = await db["questions"].insert_many([
+        {"question": f"Pregunta {i}", "distractors": ["A", "B", "C"], "answer": "D", "difficulty": 1}
+        for i in range(2)
+    ])
+    user_ids = [str(ObjectId()) for _ in range(2)]
+    trivia = await db["trivias"].insert_one({
+        "name": "Test de inicio",
+        "description": "Inicio fallido",
+        "question_ids": [str(question_id) for question_id in result.inserted_ids],
+        "user_ids_invitations": user_ids,
+        "joined_users": user_ids,
+        "round_time_sec": 10,
+        "total_rounds": 2,
+        "status": "waiting_start",
+        "pending_joins": 0
+    })
+    return str(trivia.inserted_id)
+
+async def test_start_trivia():
+    trivia_id = await create_trivia()
+    try:
+        def failing_schedule(*args, **kwargs):
+            raise RuntimeError("Falla simulada al agendar la ronda")
+
+        round_scheduler.schedule = failing_schedule
+        try:
+            await start_trivia(trivia_id)
+        finally:
+            del round_scheduler.schedule
+
+        trivia = await db["trivias"].find_one({"_id": ObjectId(trivia_id)})
+        assert trivia["status"] == "waiting_start", "La Trivia quedó en juego sin rondas agendadas"
+        assert "deck" not in trivia, "La Trivia quedó con el mazo del inicio fallido"
+        assert not lease_manager.owns(trivia_lease(trivia_id)), "El proceso sigue a cargo de la Trivia"
+        assert not await db["leases"].find_one({"_id": trivia_lease(trivia_id)}), "El lease no fue liberado"
+
+        # Un nuevo intento inicia la Trivia
+        await start_trivia(trivia_id)
+        trivia = await db["trivias"].find_one({"_id": ObjectId(trivia_id)})
+        assert trivia["status"] == "playing" and len(trivia["deck"]) == 2, "La Trivia no se pudo volver a iniciar"
+        assert lease_manager.owns(trivia_lease(trivia_id)) and round_scheduler.get_token(trivia_id) == 0
+    finally:
+        round_scheduler.cancel(trivia_id)
+        await lease_manager.release(trivia_lease(trivia_id))
+        trivia = await db["trivias"].find_one_and_delete({"_id": ObjectId(trivia_id)})
+        question_ids = [ObjectId(question_id) for question_id in trivia["question_ids"]]
+        await db["questions"].delete_many({"_id": {"$in": question_ids}})
+
+
+if __name__ == "__main__":
+    asyncio.run(test_start_trivia())
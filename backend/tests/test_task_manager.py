@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from app.core.task_manager import TaskManager
+from app.core.constants import TASK_HISTORY_SIZE, TASK_CLASS_LIMITS
+
+TOTAL_TASKS = 200_000
+BATCH_SIZE = 5_000
+
+async def test_reaping():
+    """
+    Ejecuta muchas tareas cortas y valida que no queden retenidas: las tareas activas vuelven a
+    cero y el historial no supera TASK_HISTORY_SIZE
+    """
+    task_manager = TaskManager()
+    task_manager._initialize()
+
+    async def work():
+        await asyncio.sleep(0)
+
+    for batch in range(0, TOTAL_TASKS, BATCH_SIZE):
+        for i in range(batch, batch + BATCH_SIZE):
+            await task_manager.start_task(f"work_{i}", work, task_class="work")
+        while task_manager._tasks:
+            await asyncio.sleep(0.01)
+
+    tasks = await task_manager.list_tasks()
+    assert tasks["running"] == []
+    assert len(tasks["finished"]) == TASK_HISTORY_SIZE
+    status = await task_manager.get_task_status(f"work_{TOTAL_TASKS - 1}")
+    assert status["status"] == "completada"
+
+async def test_failed_task():
+    """
+    Valida que una tarea fallida quede en el historial con su error y duración
+    """
+    task_manager = TaskManager()
+    task_manager._initialize()
+
+    async def fail():
+        raise ValueError("error de prueba")
+
+    await task_manager.start_task("fail", fail)
+    await asyncio.sleep(0.05)
+    tasks = await task_manager.list_tasks()
+    assert [task["task_id"] for task in tasks["failed"]] == ["fail"]
+    assert tasks["failed"][0]["error"] == "error de prueba"
+    assert tasks["failed"][0]["duration_sec"] is not None
+
+async def test_class_limit():
+    """
+    Valida que una clase listada en TASK_CLASS_LIMITS no supere su máximo de tareas simultaneas
+    """
+    task_manager = TaskManager()
+    task_manager._initialize()
+    task_class, limit = next(iter(TASK_CLASS_LIMITS.items()))
+    running = {"now": 0, "max": 0}
+
+    async def work():
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+
+    for i in range(limit * 4):
+        await task_manager.start_task(f"limited_{i}", work, task_class=task_class)
+    queued = [task for task in (await task_manager.list_tasks())["running"] if task["status"] == "en cola"]
+    while task_manager._tasks:
+        await asyncio.sleep(0.01)
+
+    assert running["max"] == limit, f"Se ejecutaron {running['max']} tareas simultaneas (limite {limit})"
+    assert queued, "Ninguna tarea quedó en cola"
+
+async def test_task_manager():
+    logging.disable(logging.INFO)
+    await test_failed_task()
+    await test_class_limit()
+    await test_reaping()
+
+if __name__ == "__main__":
+    asyncio.run(test_task_manager())